@@ -0,0 +1,178 @@
+import json
+import os
+import random
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from logic.category_registry import category_key
+from logic.prompt_generator import PromptGenerator
+
+
+def normalize_category_key(name: str) -> str:
+    """'Vestuario general' -> 'vestuario_general' (formato de los JSON de personaje)."""
+    return category_key(name)
+
+
+class BatchAxis:
+    """Eje de combinación: una lista de opciones con nombre.
+
+    Cada opción es un dict {categoria: valor}; una variación o un preset aportan
+    varias categorías a la vez, una lista de tags aporta una sola."""
+
+    def __init__(self, name: str, options: List[Tuple[str, Dict[str, str]]]):
+        self.name = name
+        self.options = [
+            (label, {normalize_category_key(k): v for k, v in (values or {}).items()})
+            for label, values in options
+        ]
+
+    def __len__(self):
+        return len(self.options)
+
+    @classmethod
+    def from_tags(cls, category: str, tags: List[str], name: str = None):
+        return cls(name or category, [(tag, {category: tag}) for tag in tags])
+
+    @classmethod
+    def from_variations(cls, character_name: str, variation_names: List[str] = None, manager=None):
+        from logic.variations_manager import VariationsManager
+        manager = manager or VariationsManager()
+        variations = manager.get_character_variations(character_name).get("variations", {})
+        names = variation_names or list(variations.keys())
+        options = []
+        for var_name in names:
+            data = variations.get(var_name)
+            if data is None:
+                raise KeyError(f"Variación no encontrada: {character_name}/{var_name}")
+            options.append((var_name, data.get("categories", {})))
+        return cls("variation", options)
+
+    @classmethod
+    def from_presets(cls, refs: List[str], manager=None):
+        """`refs` con formato 'carpeta/nombre'."""
+        from logic.presets_manager import PresetsManager
+        manager = manager or PresetsManager()
+        options = []
+        for ref in refs:
+            folder, _, preset_name = ref.partition("/")
+            data = manager.load_preset(folder, preset_name)
+            if data is None:
+                raise KeyError(f"Preset no encontrado: {ref}")
+            options.append((ref, data.get("categories", {})))
+        return cls("preset", options)
+
+
+def load_character_categories(character_name: str) -> Dict[str, str]:
+    """Categorías base de un personaje desde data/characters/<nombre>/<nombre>.json."""
+    base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "characters")
+    folder = character_name.lower().replace(" ", "_")
+    path = os.path.join(base_dir, folder, f"{folder}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {normalize_category_key(k): v for k, v in data.get("categories", {}).items()}
+
+
+class BatchGenerator:
+    """Genera prompts para el producto cartesiano de varios ejes.
+
+    Las combinaciones se recorren de forma perezosa por índice (base mixta), así
+    que ni el producto ni la muestra aleatoria se materializan: memoria constante
+    aunque haya millones de combinaciones."""
+
+    def __init__(self, base_categories: Dict[str, str], axes: List[BatchAxis],
+                 generator: Optional[PromptGenerator] = None):
+        self.base_categories = {normalize_category_key(k): v for k, v in (base_categories or {}).items()}
+        self.axes = [axis for axis in axes if len(axis)]
+        self.generator = generator or PromptGenerator()
+
+    @property
+    def total(self) -> int:
+        total = 1
+        for axis in self.axes:
+            total *= len(axis)
+        return total
+
+    def decode(self, index: int) -> Tuple[int, ...]:
+        """Índice lineal -> índice de opción por eje (el último eje varía más rápido)."""
+        choice = []
+        for axis in reversed(self.axes):
+            index, digit = divmod(index, len(axis))
+            choice.append(digit)
+        return tuple(reversed(choice))
+
+    def iter_indices(self, limit: int = None, sample: int = None, seed: int = None,
+                     start: int = 0) -> Iterator[int]:
+        total = self.total
+        if sample is not None:
+            # random.sample sobre range no crea la lista completa
+            yield from random.Random(seed).sample(range(total), min(sample, total))
+            return
+        stop = total if limit is None else min(total, start + limit)
+        yield from range(start, stop)
+
+    def iter_prompts(self, limit: int = None, sample: int = None, seed: int = None,
+                     start: int = 0, wildcard_seed: int = None) -> Iterator[Dict[str, Any]]:
+        """Genera {"index", "choices", "prompt"} por combinación.
+
+        Con `wildcard_seed` la sintaxis dinámica se expande con la semilla
+        `wildcard_seed + index`, reproducible para cada combinación."""
+        gen = self.generator
+        gen.clear_all()
+        for category, value in self.base_categories.items():
+            gen.update_category(category, value)
+
+        applied: Dict[str, str] = {}
+        for index in self.iter_indices(limit=limit, sample=sample, seed=seed, start=start):
+            overrides: Dict[str, str] = {}
+            choices = {}
+            for axis, digit in zip(self.axes, self.decode(index)):
+                label, values = axis.options[digit]
+                choices[axis.name] = label
+                overrides.update(values)
+
+            # Solo se tocan las categorías que cambian respecto a la combinación anterior
+            for category in applied:
+                if category not in overrides:
+                    gen.update_category(category, self.base_categories.get(category, ""))
+            for category, value in overrides.items():
+                if applied.get(category) != value:
+                    gen.update_category(category, value)
+            applied = overrides
+
+            if wildcard_seed is None:
+                yield {"index": index, "choices": choices, "prompt": gen.generate_prompt()}
+            else:
+                prompt_seed = wildcard_seed + index
+                yield {"index": index, "choices": choices, "seed": prompt_seed,
+                       "prompt": gen.expand_prompt(prompt_seed)}
+
+
+def write_batch(records: Iterator[Dict[str, Any]], path: str, fmt: str = None,
+                total: int = None, progress: Callable[[int, Optional[int], float], None] = None,
+                progress_every: int = 1000) -> int:
+    """Escribe los prompts en streaming (JSONL o TXT, una línea por prompt).
+
+    `progress(hechos, total, prompts_por_segundo)` se llama cada `progress_every`
+    prompts y al terminar. Devuelve el número de prompts escritos."""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".") or "jsonl").lower()
+    if fmt not in ("jsonl", "txt"):
+        raise ValueError(f"Formato no soportado: {fmt}")
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+
+    started = time.perf_counter()
+    done = 0
+    with open(path, "w", encoding="utf-8", buffering=1024 * 1024) as f:
+        for record in records:
+            if fmt == "jsonl":
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            else:
+                f.write(record["prompt"] + "\n")
+            done += 1
+            if progress and done % progress_every == 0:
+                elapsed = time.perf_counter() - started
+                progress(done, total, done / elapsed if elapsed else 0.0)
+    if progress:
+        elapsed = time.perf_counter() - started
+        progress(done, total, done / elapsed if elapsed else 0.0)
+    return done
@@ -0,0 +1,301 @@
+import json
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+CATEGORIES_PATH = os.path.join(DATA_DIR, "categories.json")
+TAGS_PATH = os.path.join(DATA_DIR, "tags.json")
+CATEGORY_COLORS_PATH = os.path.join(DATA_DIR, "category_colors.json")
+
+# Orden por defecto si categories.json no se puede leer
+DEFAULT_ORDER = [
+    "angulo", "calidad_tecnica", "estilo_artistico", "composicion", "atmosfera_vibe",
+    "loras_estilos_artistico", "loras_detalles_mejoras", "loras_modelos_especificos",
+    "loras_personaje", "fondo", "personaje", "cabello_forma", "cabello_color",
+    "cabello_accesorios", "rostro_accesorios", "ojos", "expresion_facial_ojos",
+    "expresion_facial_mejillas", "expresion_facial_boca", "postura_cabeza",
+    "direccion_mirada_personaje", "vestuario_general", "vestuario_superior",
+    "vestuario_inferior", "vestuario_accesorios", "vestuariospies",
+    "ropa_interior_superior", "ropa_interior_inferior", "ropa_interior_accesorios",
+    "tipo_de_cuerpo", "rasgo_fisico_cuerpo", "rasgo_fisico_piernas",
+    "pose_actitud_global", "pose_brazos", "pose_piernas", "orientacion_personaje",
+    "actitud_emocion", "nsfw", "objetos_interaccion", "objetos_escenario",
+    "mirada_espectador",
+]
+
+
+# Claves antiguas o escritas a mano -> id actual
+LEGACY_ALIASES = {
+    "vestuario_pies": "vestuariospies",
+    "vestuario_calzado": "vestuariospies",
+    "calzado": "vestuariospies",
+}
+
+_KEY_SEPARATORS = re.compile(r"[\s\-]+")
+
+
+@lru_cache(maxsize=4096)
+def category_key(name: str) -> str:
+    """Clave de búsqueda de una categoría, sea cual sea el formato de entrada.
+
+    'Vestuario general', 'vestuario_general', 'Expresión facial ojos:' y los
+    alias de LEGACY_ALIASES dan el mismo id."""
+    key = str(name).strip().rstrip(":").strip().lower()
+    if not key.isascii():
+        key = unicodedata.normalize("NFKD", key).encode("ascii", "ignore").decode("ascii")
+    key = _KEY_SEPARATORS.sub("_", key)
+    return LEGACY_ALIASES.get(key, key)
+
+
+def canonical_id(name: str) -> str:
+    """'Vestuario general' -> 'vestuario_general'."""
+    return name.strip().lower().replace(" ", "_")
+
+
+def display_name(category_id: str) -> str:
+    """'vestuario_general' -> 'Vestuario general' (nombre que muestran las tarjetas)."""
+    return category_id.replace("_", " ").capitalize()
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_json(path: str, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except Exception as e:
+        print(f"Error leyendo {path}: {e}")
+        return default
+
+
+class CategoryRegistry:
+    """Registro de categorías en memoria para todo el proceso.
+
+    Carga una sola vez categories.json, tags.json y category_colors.json y
+    mantiene el orden (id -> rango), los nombres visibles en ambos sentidos, los
+    tags y los colores. Solo se invalida cuando el propio registro escribe o
+    cuando `reload_if_changed()` detecta (p. ej. desde un watcher) que un
+    archivo cambió por fuera. `version` cambia con cada modificación."""
+
+    def __init__(self, path: str = CATEGORIES_PATH, tags_path: str = TAGS_PATH,
+                 colors_path: str = CATEGORY_COLORS_PATH):
+        self.path = path
+        self.tags_path = tags_path
+        self.colors_path = colors_path
+        self.version = 0
+        self._order: List[str] = []
+        self._ranks: Dict[str, int] = {}
+        self._display: Dict[str, str] = {}
+        self._by_display: Dict[str, str] = {}
+        self._categories_data: Dict[str, Any] = {}
+        self._tags: Optional[Dict[str, List[str]]] = None
+        self._colors: Optional[Dict[str, str]] = None
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self.reload()
+
+    # --- carga ---
+
+    def reload(self):
+        """Relee categories.json; tags y colores se recargan al pedirlos."""
+        data = _read_json(self.path, None)
+        self._mtimes[self.path] = _mtime(self.path)
+        if not isinstance(data, dict) or not isinstance(data.get("categorias"), list):
+            if data is not None:
+                print("categories.json sin lista 'categorias'; usando orden por defecto")
+            data = {"categorias": list(DEFAULT_ORDER)}
+        self._categories_data = data
+        self._tags = None
+        self._colors = None
+        self.set_order(data["categorias"], force=True)
+
+    def reload_if_changed(self) -> bool:
+        """Recarga solo lo que haya cambiado en disco desde la última lectura/escritura."""
+        changed = False
+        if _mtime(self.path) != self._mtimes.get(self.path):
+            self.reload()
+            return True
+        if self._tags is not None and _mtime(self.tags_path) != self._mtimes.get(self.tags_path):
+            self._tags = None
+            changed = True
+        if self._colors is not None and _mtime(self.colors_path) != self._mtimes.get(self.colors_path):
+            self._colors = None
+            changed = True
+        if changed:
+            self.version += 1
+        return changed
+
+    def watched_paths(self) -> List[str]:
+        return [self.path, self.tags_path, self.colors_path]
+
+    def _load_tags(self) -> Dict[str, List[str]]:
+        if self._tags is None:
+            data = _read_json(self.tags_path, {})
+            self._mtimes[self.tags_path] = _mtime(self.tags_path)
+            self._tags = data if isinstance(data, dict) else {}
+        return self._tags
+
+    def _load_colors(self) -> Dict[str, str]:
+        if self._colors is None:
+            data = _read_json(self.colors_path, None)
+            self._mtimes[self.colors_path] = _mtime(self.colors_path)
+            if not isinstance(data, dict):
+                # Formato antiguo: colores dentro de categories.json
+                data = self._categories_data.get("colors")
+            self._colors = dict(data) if isinstance(data, dict) else {}
+        return self._colors
+
+    def _write_json(self, path: str, data):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        self._mtimes[path] = _mtime(path)
+
+    # --- orden ---
+
+    def set_order(self, order: List[str], force: bool = False):
+        """Reemplaza el orden en memoria (no escribe en disco)."""
+        order = list(dict.fromkeys(order))
+        if order == self._order and not force:
+            return
+        self._order = order
+        self._ranks = {name: i for i, name in enumerate(order)}
+        self._display = {name: display_name(name) for name in order}
+        self._by_display = {shown: name for name, shown in self._display.items()}
+        self.version += 1
+
+    @property
+    def order(self) -> List[str]:
+        return list(self._order)
+
+    @property
+    def ranks(self) -> Dict[str, int]:
+        return self._ranks
+
+    def rank(self, name: str) -> Optional[int]:
+        return self._ranks.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ranks
+
+    # --- nombres ---
+
+    def display_name(self, category_id: str) -> str:
+        return self._display.get(category_id) or display_name(category_id)
+
+    def id_for(self, name: str) -> str:
+        """Id canónico a partir del nombre visible, del propio id o de un alias."""
+        if name in self._ranks:
+            return name
+        return self._by_display.get(name) or category_key(name)
+
+    # --- tags y colores ---
+
+    def tags(self, category_id: str) -> List[str]:
+        return list(self._load_tags().get(category_id, []))
+
+    def all_tags(self) -> Dict[str, List[str]]:
+        return self._load_tags()
+
+    def colors(self) -> Dict[str, str]:
+        return dict(self._load_colors())
+
+    def color(self, category_id: str) -> Optional[str]:
+        return self._load_colors().get(category_id)
+
+    def categories(self) -> List[Dict[str, Any]]:
+        """Lista para construir las tarjetas: nombre visible, icono y tags."""
+        tags = self._load_tags()
+        return [
+            {"id": cat, "name": self._display[cat], "icon": None, "tags": tags.get(cat, [])}
+            for cat in self._order
+        ]
+
+    # --- escritura ---
+
+    def _save_categories(self):
+        self._categories_data["categorias"] = list(self._order)
+        self._write_json(self.path, self._categories_data)
+
+    def save_order(self, order: List[str]) -> bool:
+        self.set_order(order)
+        self._save_categories()
+        return True
+
+    def add_category(self, category_id: str) -> bool:
+        if category_id in self._ranks:
+            return False
+        self.set_order(self._order + [category_id])
+        self._save_categories()
+        return True
+
+    def rename_category(self, old_name: str, new_name: str):
+        old_id, new_id = self.id_for(old_name), canonical_id(new_name)
+        if old_id in self._ranks:
+            order = list(self._order)
+            order[self._ranks[old_id]] = new_id
+            self.set_order(order)
+            self._save_categories()
+        tags = self._load_tags()
+        if old_id in tags:
+            tags[new_id] = tags.pop(old_id)
+            self._write_json(self.tags_path, tags)
+            self.version += 1
+
+    def set_tags(self, category_id: str, tags: List[str]):
+        data = self._load_tags()
+        data[category_id] = list(tags)
+        self._write_json(self.tags_path, data)
+        self.version += 1
+
+    def set_color(self, category_id: str, color_hex: str) -> bool:
+        colors = self._load_colors()
+        colors[category_id] = color_hex
+        self.version += 1
+        try:
+            self._write_json(self.colors_path, colors)
+            return True
+        except Exception:
+            try:
+                self._categories_data.setdefault("colors", {})[category_id] = color_hex
+                self._save_categories()
+                return True
+            except Exception:
+                return False
+
+    def rename_color(self, old_name: str, new_name: str) -> bool:
+        old_id, new_id = canonical_id(old_name), canonical_id(new_name)
+        colors = self._load_colors()
+        if old_id not in colors:
+            return False
+        colors[new_id] = colors.pop(old_id)
+        self.version += 1
+        try:
+            self._write_json(self.colors_path, colors)
+        except Exception:
+            embedded = self._categories_data.get("colors")
+            if not isinstance(embedded, dict) or old_id not in embedded:
+                return False
+            embedded[new_id] = embedded.pop(old_id)
+            self._save_categories()
+        return True
+
+
+_registry = None
+
+
+def get_registry() -> CategoryRegistry:
+    global _registry
+    if _registry is None:
+        _registry = CategoryRegistry()
+    return _registry
@@ -0,0 +1,218 @@
+"""Línea de comandos sin Qt.
+
+Ejemplos:
+    python -m logic.cli build --character frieren --variation frieren_var2 \\
+        --preset vestuarios/uniforme_escolar --no-lora
+    python -m logic.cli list variations --character frieren
+    python -m logic.cli batch --character frieren --variations all \\
+        --tags "ojos=blue eyes|red eyes" --out salida.jsonl --sample 1000 --seed 7
+    python -m logic.cli optimize-images --dry-run
+    python -m logic.cli dedup-images --dry-run --threshold 4
+"""
+import argparse
+import json
+import sys
+
+from logic.prompt_library import PromptSession, list_characters, CATEGORY_GROUPS
+
+
+def _parse_assignments(items):
+    values = {}
+    for item in items or []:
+        category, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Formato esperado categoria=valor: {item}")
+        values[category.strip()] = value
+    return values
+
+
+def _session_from_args(args) -> PromptSession:
+    session = PromptSession()
+    if args.character:
+        session.load_character(args.character)
+    for variation in args.variation or []:
+        session.apply_variation(variation)
+    for preset in args.preset or []:
+        session.apply_preset(preset)
+    session.apply_categories(_parse_assignments(args.set))
+    return session
+
+
+def cmd_build(args):
+    session = _session_from_args(args)
+    options = {"no_lora": args.no_lora, "only": args.only, "seed": args.seed}
+    prompt = session.build(**options)
+    if args.json:
+        print(json.dumps({"prompt": prompt, "stats": session.statistics(**options)}, ensure_ascii=False))
+    else:
+        print(prompt)
+    return 0
+
+
+def cmd_list(args):
+    if args.what == "characters":
+        names = list_characters()
+    elif args.what == "variations":
+        if not args.character:
+            raise ValueError("--character es obligatorio para listar variaciones")
+        session = PromptSession()
+        names = sorted(session.variations.get_character_variations(args.character)["variations"])
+    else:
+        session = PromptSession()
+        names = []
+        for folder_id in sorted(session.presets.get_all_preset_folders()):
+            presets = session.presets.get_presets_by_category(folder_id)
+            names.extend(f"{folder_id}/{name}" for name in sorted(presets))
+    for name in names:
+        print(name)
+    return 0
+
+
+def cmd_batch(args):
+    from logic.batch_generator import (BatchAxis, BatchGenerator, load_character_categories,
+                                       write_batch)
+    base = load_character_categories(args.character) if args.character else {}
+    axes = []
+    if args.variations:
+        names = None if args.variations == "all" else [v.strip() for v in args.variations.split(",")]
+        axes.append(BatchAxis.from_variations(args.character, names))
+    if args.presets:
+        axes.append(BatchAxis.from_presets([p.strip() for p in args.presets.split(",")]))
+    for category, value in _parse_assignments(args.tags).items():
+        axes.append(BatchAxis.from_tags(category, [t.strip() for t in value.split("|") if t.strip()]))
+
+    batch = BatchGenerator(base, axes)
+    total = min(batch.total, args.sample) if args.sample else batch.total
+    if args.limit:
+        total = min(total, args.limit)
+
+    def report(done, expected, rate):
+        print(f"\r{done}/{expected} prompts ({rate:.0f}/s)", end="", file=sys.stderr, flush=True)
+
+    records = batch.iter_prompts(limit=args.limit, sample=args.sample, seed=args.seed,
+                                 wildcard_seed=args.wildcard_seed)
+    written = write_batch(records, args.out, fmt=args.format, total=total, progress=report)
+    print(f"\n{written} prompts escritos en {args.out}", file=sys.stderr)
+    return 0
+
+
+def cmd_optimize_images(args):
+    from logic.image_optimizer import ImageOptimizationJob
+    kwargs = {"workers": args.workers}
+    if args.min_kb is not None:
+        kwargs["min_bytes"] = args.min_kb * 1024
+    job = ImageOptimizationJob(**kwargs)
+
+    def report(done, total, saved, path):
+        print(f"\r{done}/{total} imágenes, {saved / 1024 / 1024:.1f} MB ahorrados", end="", file=sys.stderr, flush=True)
+
+    summary = job.run(dry_run=args.dry_run, progress=report)
+    if summary["total"]:
+        print(file=sys.stderr)
+    verb = "se ahorrarían" if args.dry_run else "ahorrados"
+    print(f"{summary['optimized']} de {summary['total']} imágenes optimizables, "
+          f"{summary['saved_bytes'] / 1024 / 1024:.1f} MB {verb}"
+          + (" (interrumpido)" if summary["cancelled"] else ""), file=sys.stderr)
+    if args.json:
+        print(json.dumps(summary))
+    return 1 if summary["errors"] else 0
+
+
+def cmd_dedup_images(args):
+    from logic.image_store import ImageDedupJob
+    job = ImageDedupJob(workers=args.workers, threshold=args.threshold if args.threshold is not None else -1)
+
+    def report(done, total):
+        print(f"\r{done}/{total} imágenes analizadas", end="", file=sys.stderr, flush=True)
+
+    def confirm(groups):
+        # Los casi-duplicados no son iguales byte a byte: se muestran antes de borrar nada
+        print(file=sys.stderr)
+        for group in groups:
+            print(f"{group[0]} <- " + ", ".join(group[1:]), file=sys.stderr)
+        if args.yes:
+            return True
+        if not sys.stdin.isatty():
+            print(f"{len(groups)} grupos de imágenes parecidas sin confirmar (usa --yes); "
+                  "no se escribió nada", file=sys.stderr)
+            return False
+        answer = input(f"¿Juntar estos {len(groups)} grupos de imágenes parecidas? [s/N] ")
+        return answer.strip().lower() in ("s", "si", "sí", "y", "yes")
+
+    summary = job.run(dry_run=args.dry_run, progress=report, confirm=confirm)
+    print(file=sys.stderr)
+    verb = "liberados" if summary["applied"] else "se liberarían"
+    print(f"{summary['duplicates']} copias repetidas en {summary['groups']} grupos "
+          f"({summary['images']} imágenes), {summary['freed_bytes'] / 1024 / 1024:.1f} MB {verb}", file=sys.stderr)
+    if args.json:
+        print(json.dumps(summary))
+    return 1 if summary["errors"] else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="prompts", description="Generador de prompts sin interfaz")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Genera un prompt")
+    build.add_argument("--character")
+    build.add_argument("--variation", action="append", help="Se puede repetir")
+    build.add_argument("--preset", action="append", help="carpeta/nombre; se puede repetir")
+    build.add_argument("--set", action="append", metavar="CATEGORIA=VALOR")
+    build.add_argument("--no-lora", action="store_true")
+    build.add_argument("--only", choices=sorted(CATEGORY_GROUPS))
+    build.add_argument("--seed", type=int, help="Expande {a|b} y __wildcards__")
+    build.add_argument("--json", action="store_true", help="Incluye estadísticas")
+    build.set_defaults(func=cmd_build)
+
+    lst = sub.add_parser("list", help="Lista personajes, variaciones o presets")
+    lst.add_argument("what", choices=["characters", "variations", "presets"])
+    lst.add_argument("--character")
+    lst.set_defaults(func=cmd_list)
+
+    batch = sub.add_parser("batch", help="Genera combinaciones en lote")
+    batch.add_argument("--character")
+    batch.add_argument("--variations", help="'all' o lista separada por comas")
+    batch.add_argument("--presets", help="carpeta/nombre separados por comas")
+    batch.add_argument("--tags", action="append", metavar="CATEGORIA=a|b|c")
+    batch.add_argument("--out", required=True)
+    batch.add_argument("--format", choices=["jsonl", "txt"])
+    batch.add_argument("--limit", type=int)
+    batch.add_argument("--sample", type=int)
+    batch.add_argument("--seed", type=int)
+    batch.add_argument("--wildcard-seed", type=int)
+    batch.set_defaults(func=cmd_batch)
+
+    optimize = sub.add_parser("optimize-images", help="Optimiza las imágenes de los presets en paralelo")
+    optimize.add_argument("--dry-run", action="store_true", help="Solo estima el ahorro, no escribe")
+    optimize.add_argument("--workers", type=int, help="Procesos (por defecto, todos los núcleos)")
+    optimize.add_argument("--min-kb", type=int, help="Tamaño mínimo para optimizar (KB)")
+    optimize.add_argument("--json", action="store_true", help="Imprime el resumen en JSON")
+    optimize.set_defaults(func=cmd_optimize_images)
+
+    dedup = sub.add_parser("dedup-images", help="Junta las imágenes repetidas de presets y tags")
+    dedup.add_argument("--dry-run", action="store_true", help="Solo muestra lo que se juntaría")
+    dedup.add_argument("--workers", type=int, help="Procesos (por defecto, todos los núcleos)")
+    dedup.add_argument("--threshold", type=int,
+                       help="Junta también imágenes parecidas: bits distintos del hash perceptual "
+                            "(por defecto solo copias idénticas)")
+    dedup.add_argument("--yes", action="store_true", help="No pide confirmación para juntar imágenes parecidas")
+    dedup.add_argument("--json", action="store_true", help="Imprime el resumen en JSON")
+    dedup.set_defaults(func=cmd_dedup_images)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Salida cortada por un pipe (p. ej. `| head`): no es un error
+        sys.stderr.close()
+        return 0
+    except (KeyError, ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import gzip
+import html
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from logic.prompt_parser import parse_prompt
+
+CHUNK_SIZE = 75
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "clip")
+VOCAB_PATH = os.path.join(_DATA_DIR, "bpe_simple_vocab_16e6.txt.gz")
+
+# Equivalente con `re` del patrón de CLIP (\p{L}+ | \p{N} | [^\s\p{L}\p{N}]+)
+_PAT = re.compile(
+    r"<\|startoftext\|>|<\|endoftext\|>|'s|'t|'re|'ve|'m|'ll|'d|[^\W\d_]+|\d|(?:[^\s\w]|_)+",
+    re.IGNORECASE,
+)
+_SPACES_RE = re.compile(r"\s+")
+# Sintaxis de énfasis que la webui quita antes de tokenizar: pesos "(x:1.2)", paréntesis y escapes
+_INNER_WEIGHT_RE = re.compile(r"(?<!\\):\s*-?\d+(?:\.\d+)?\s*(?=\))")
+_BRACKETS_RE = re.compile(r"(?<!\\)[()\[\]]")
+_ESCAPE_RE = re.compile(r"\\(.)")
+
+
+def _get_pairs(word):
+    return {(word[i], word[i + 1]) for i in range(len(word) - 1)}
+
+
+class ClipTokenizer:
+    """Contador de tokens BPE de CLIP (sin dependencias).
+
+    Usa el vocabulario oficial `bpe_simple_vocab_16e6.txt.gz` si está en
+    data/clip/; si no, recurre a una estimación por palabra (`exact` = False)."""
+
+    def __init__(self, vocab_path: str = VOCAB_PATH):
+        self.vocab_path = vocab_path
+        self._ranks: Optional[Dict] = None
+        self._loaded = False
+
+    @property
+    def exact(self) -> bool:
+        self._load()
+        return self._ranks is not None
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.vocab_path):
+            return
+        try:
+            with gzip.open(self.vocab_path, "rt", encoding="utf-8") as f:
+                merges = f.read().split("\n")
+            merges = merges[1:49152 - 256 - 2 + 1]
+            self._ranks = {tuple(m.split()): i for i, m in enumerate(merges)}
+        except Exception as e:
+            print(f"Error cargando vocabulario CLIP: {e}")
+            self._ranks = None
+
+    def _bpe_len(self, token: str) -> int:
+        word = tuple(token[:-1]) + (token[-1] + "</w>",)
+        pairs = _get_pairs(word)
+        ranks = self._ranks
+        while pairs:
+            bigram = min(pairs, key=lambda pair: ranks.get(pair, float("inf")))
+            if bigram not in ranks:
+                break
+            first, second = bigram
+            new_word = []
+            i = 0
+            while i < len(word):
+                try:
+                    j = word.index(first, i)
+                except ValueError:
+                    new_word.extend(word[i:])
+                    break
+                new_word.extend(word[i:j])
+                i = j
+                if word[i] == first and i < len(word) - 1 and word[i + 1] == second:
+                    new_word.append(first + second)
+                    i += 2
+                else:
+                    new_word.append(word[i])
+                    i += 1
+            word = tuple(new_word)
+            if len(word) == 1:
+                break
+            pairs = _get_pairs(word)
+        return len(word)
+
+    def _estimate_len(self, token: str) -> int:
+        if token.isalpha():
+            # Las palabras comunes de hasta ~7 letras suelen ser un único token
+            return max(1, math.ceil(len(token) / 7))
+        return len(token) if not token.isdigit() else 1
+
+    def count(self, text: str) -> int:
+        """Número de tokens de `text` (sin los tokens de inicio/fin)."""
+        return _count_cached(self, text)
+
+    def _count(self, text: str) -> int:
+        self._load()
+        text = _SPACES_RE.sub(" ", html.unescape(text)).strip().lower()
+        measure = self._bpe_len if self._ranks is not None else self._estimate_len
+        # bytes_to_unicode de CLIP es 1:1 por byte: contar sobre bytes UTF-8 decodificados en latin-1
+        return sum(measure(tok.encode("utf-8").decode("latin-1")) for tok in _PAT.findall(text))
+
+
+@lru_cache(maxsize=8192)
+def _count_cached(tokenizer: ClipTokenizer, text: str) -> int:
+    return tokenizer._count(text)
+
+
+_default_tokenizer = None
+
+
+def get_tokenizer() -> ClipTokenizer:
+    global _default_tokenizer
+    if _default_tokenizer is None:
+        _default_tokenizer = ClipTokenizer()
+    return _default_tokenizer
+
+
+@lru_cache(maxsize=256)
+def analyze_prompt(text: str) -> Dict:
+    """Tokens totales y cortes de chunk (75 tokens) de un prompt.
+
+    Cada término se cuenta una sola vez gracias a la caché por término, así que
+    al cambiar una categoría solo se tokenizan los términos nuevos. Los cortes
+    caen entre términos, como hace el backtracking por comas de la webui."""
+    return analyze_terms(parse_prompt(text))
+
+
+def plain_text(term) -> str:
+    """Texto de un término tal como llega al tokenizador, sin la sintaxis de énfasis."""
+    text = _BRACKETS_RE.sub("", _INNER_WEIGHT_RE.sub("", term.text))
+    return _ESCAPE_RE.sub(r"\1", text)
+
+
+def analyze_terms(terms) -> Dict:
+    """Como `analyze_prompt`, pero sobre términos ya parseados.
+
+    Los LoRA no cuentan (la webui los quita del prompt) ni tampoco su coma."""
+    tokenizer = get_tokenizer()
+    comma = 1
+    chunks: List[int] = []
+    boundaries: List[int] = []
+    current = 0
+    total = 0
+    counted = False
+    for index, term in enumerate(terms):
+        if term.kind == "lora" or (term.loras and not term.text):
+            continue
+        size = tokenizer.count(plain_text(term))
+        cost = size + (comma if counted else 0)
+        counted = True
+        if current and current + cost > CHUNK_SIZE:
+            chunks.append(current)
+            boundaries.append(index)
+            current = 0
+            cost = size
+        total += cost
+        current += cost
+        while current > CHUNK_SIZE:
+            # Término más largo que un chunk: se parte en trozos de 75
+            chunks.append(CHUNK_SIZE)
+            current -= CHUNK_SIZE
+    if current or not chunks:
+        chunks.append(current)
+    return {
+        "total_tokens": total,
+        "chunks": chunks,
+        "boundaries": boundaries,
+        "exact": tokenizer.exact,
+    }
@@ -0,0 +1,110 @@
+import sys
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+# Presupuesto por defecto para todo el historial (deshacer + rehacer)
+DEFAULT_MAX_BYTES = 1024 * 1024
+# Cambios seguidos en la misma categoría dentro de esta ventana forman un solo paso
+MERGE_WINDOW = 1.0
+
+_ENTRY_OVERHEAD = 120
+_STEP_OVERHEAD = 200
+
+Changes = Dict[str, Tuple[str, str]]
+
+
+class _Step:
+    __slots__ = ("changes", "size", "time", "mergeable")
+
+    def __init__(self, changes: Changes, mergeable: bool):
+        self.changes = changes
+        self.time = time.monotonic()
+        self.mergeable = mergeable
+        self.size = _step_size(changes)
+
+
+def _step_size(changes: Changes) -> int:
+    size = _STEP_OVERHEAD
+    for name, (old, new) in changes.items():
+        size += _ENTRY_OVERHEAD + sys.getsizeof(name) + sys.getsizeof(old) + sys.getsizeof(new)
+    return size
+
+
+class GridHistory:
+    """Historial deshacer/rehacer de los valores del grid.
+
+    Cada paso guarda solo las categorías que cambió ({categoria: (antes,
+    después)}); el estado completo de cualquier punto es el actual más los
+    pasos intermedios, así que los pasos comparten todo lo demás y deshacer o
+    rehacer cuesta O(categorías cambiadas). Cuando el total pasa de
+    `max_bytes` se descartan los pasos más antiguos."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, merge_window: float = MERGE_WINDOW):
+        self.max_bytes = max_bytes
+        self.merge_window = merge_window
+        self._undo = deque()
+        self._redo = []
+        self.bytes_used = 0
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def __len__(self):
+        return len(self._undo)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self.bytes_used = 0
+
+    def record(self, changes: Changes, mergeable: bool = False):
+        """Añade un paso. Con `mergeable`, si el paso anterior tocó las mismas
+        categorías hace menos de `merge_window` segundos, se funden (tecleo)."""
+        if not changes:
+            return
+        for step in self._redo:
+            self.bytes_used -= step.size
+        self._redo.clear()
+
+        last = self._undo[-1] if self._undo else None
+        if (mergeable and last is not None and last.mergeable
+                and last.changes.keys() == changes.keys()
+                and time.monotonic() - last.time <= self.merge_window):
+            self.bytes_used -= last.size
+            merged = {name: (last.changes[name][0], new) for name, (old, new) in changes.items()}
+            merged = {name: pair for name, pair in merged.items() if pair[0] != pair[1]}
+            self._undo.pop()
+            if not merged:
+                return
+            step = _Step(merged, True)
+        else:
+            step = _Step(dict(changes), mergeable)
+
+        self._undo.append(step)
+        self.bytes_used += step.size
+        self._evict()
+
+    def _evict(self):
+        # Siempre se conserva al menos el último paso
+        while self.bytes_used > self.max_bytes and len(self._undo) > 1:
+            self.bytes_used -= self._undo.popleft().size
+
+    def undo(self) -> Optional[Dict[str, str]]:
+        """Valores a escribir para deshacer el último paso, o None."""
+        if not self._undo:
+            return None
+        step = self._undo.pop()
+        step.mergeable = False
+        self._redo.append(step)
+        return {name: old for name, (old, new) in step.changes.items()}
+
+    def redo(self) -> Optional[Dict[str, str]]:
+        if not self._redo:
+            return None
+        step = self._redo.pop()
+        self._undo.append(step)
+        return {name: new for name, (old, new) in step.changes.items()}
@@ -0,0 +1,256 @@
+import hashlib
+import io
+import json
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+PRESETS_DIR = os.path.join(DATA_DIR, "presets")
+MANIFEST_PATH = os.path.join(DATA_DIR, "cache", "optimized_images.json")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+# Imágenes por debajo de este tamaño no se tocan
+MIN_BYTES = 200 * 1024
+MAX_SIZE = (512, 512)
+QUALITY = 85
+# El manifiesto se guarda cada tantos resultados para poder retomar tras una interrupción
+SAVE_EVERY = 20
+# Cada cuánto se revisa si se pidió cancelar mientras se espera a los procesos
+POLL_SECONDS = 0.5
+_TEMP_MARK = ".optimizing"
+
+Progress = Callable[[int, int, int, str], None]
+
+
+def _save_optimized(img, target, ext, quality):
+    """Guarda `img` ya reducida en `target` (ruta o buffer) según la extensión."""
+    if ext in (".jpg", ".jpeg"):
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGB")
+        img.save(target, "JPEG", quality=quality, optimize=True)
+    elif ext == ".png":
+        img.save(target, "PNG", optimize=True)
+    elif ext == ".webp":
+        img.save(target, "WEBP", quality=quality)
+    else:
+        img.save(target)
+
+
+def optimize_image(source_path, dest, ext=None, max_size=MAX_SIZE, quality=QUALITY):
+    """Redimensiona y comprime `source_path` hacia `dest` (ruta o buffer)."""
+    # Import diferido: cargar presets (p. ej. desde la CLI) no necesita Pillow
+    from PIL import Image, ImageOps
+    ext = (ext or os.path.splitext(dest)[1]).lower()
+    with Image.open(source_path) as img:
+        try:
+            # Corregir orientación EXIF si existe
+            img = ImageOps.exif_transpose(img)
+        except Exception:
+            pass
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        _save_optimized(img, dest, ext, quality)
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _ignore_interrupt():
+    """Inicializador del pool: Ctrl+C lo atiende solo el proceso principal."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _process(path, dry_run, min_bytes, max_size, quality):
+    """Optimiza una imagen en un proceso del pool; retorna el registro para el manifiesto."""
+    result = {"path": path, "before": 0, "after": 0, "status": "error"}
+    try:
+        before = os.path.getsize(path)
+        result["before"] = result["after"] = before
+        if before < min_bytes:
+            result["status"] = "small"
+        else:
+            ext = os.path.splitext(path)[1].lower()
+            if dry_run:
+                buffer = io.BytesIO()
+                optimize_image(path, buffer, ext, max_size, quality)
+                after = buffer.tell()
+            else:
+                folder, name = os.path.split(path)
+                temp_path = os.path.join(folder, f".{name}{_TEMP_MARK}{ext}")
+                try:
+                    optimize_image(path, temp_path, ext, max_size, quality)
+                    after = os.path.getsize(temp_path)
+                    if after < before:
+                        # Reemplazo atómico: una interrupción deja la original o la nueva, nunca media
+                        os.replace(temp_path, path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+            if after < before:
+                result["after"] = after
+                result["status"] = "optimized"
+            else:
+                result["status"] = "kept"
+        st = os.stat(path)
+        result["size"] = st.st_size
+        result["mtime"] = st.st_mtime_ns
+        result["hash"] = file_hash(path)
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+
+def iter_preset_images(presets_dir=PRESETS_DIR):
+    """Imágenes de las carpetas <preset>_images de cada carpeta de presets."""
+    if not os.path.isdir(presets_dir):
+        return
+    for category in sorted(os.listdir(presets_dir)):
+        category_path = os.path.join(presets_dir, category)
+        if not os.path.isdir(category_path):
+            continue
+        for item in sorted(os.listdir(category_path)):
+            images_dir = os.path.join(category_path, item)
+            if not item.endswith("_images") or not os.path.isdir(images_dir):
+                continue
+            for img_file in sorted(os.listdir(images_dir)):
+                if img_file.startswith(".") and _TEMP_MARK in img_file:
+                    # Resto de una ejecución interrumpida
+                    try:
+                        os.remove(os.path.join(images_dir, img_file))
+                    except OSError:
+                        pass
+                elif img_file.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(images_dir, img_file)
+
+
+class ImageOptimizationJob:
+    """Optimiza las imágenes de los presets en un pool de procesos.
+
+    Un manifiesto (ruta -> tamaño, mtime, hash) recuerda lo ya procesado: en
+    la siguiente ejecución se saltan las imágenes que no cambiaron, y si solo
+    cambió el mtime se compara el hash antes de volver a procesarlas. Cada
+    imagen se reemplaza de forma atómica y el manifiesto se guarda cada
+    SAVE_EVERY resultados, así que se puede interrumpir y retomar.
+    `dry_run` comprime en memoria para estimar el ahorro sin escribir nada."""
+
+    def __init__(self, presets_dir: str = PRESETS_DIR, manifest_path: str = MANIFEST_PATH,
+                 workers: int = None, min_bytes: int = MIN_BYTES, max_size=MAX_SIZE, quality: int = QUALITY):
+        self.presets_dir = presets_dir
+        self.manifest_path = manifest_path
+        self.workers = workers or os.cpu_count() or 1
+        self.min_bytes = min_bytes
+        self.max_size = max_size
+        self.quality = quality
+        self._cancelled = False
+
+    def cancel(self):
+        """Pide detener el trabajo; lo ya hecho queda en el manifiesto."""
+        self._cancelled = True
+
+    def _key(self, path):
+        return os.path.relpath(path, self.presets_dir).replace("\\", "/")
+
+    def load_manifest(self) -> Dict[str, Dict]:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Error leyendo manifiesto de imágenes: {e}")
+            return {}
+
+    def save_manifest(self, manifest: Dict[str, Dict]):
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def pending(self, manifest: Dict[str, Dict]) -> List[str]:
+        """Imágenes que cambiaron desde la última ejecución (o que nunca se procesaron)."""
+        paths = []
+        for path in iter_preset_images(self.presets_dir):
+            entry = manifest.get(self._key(path))
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if entry and entry.get("size") == st.st_size:
+                if entry.get("mtime") == st.st_mtime_ns:
+                    continue
+                try:
+                    if entry.get("hash") == file_hash(path):
+                        # Mismo contenido (p. ej. copiado encima): basta con actualizar el mtime
+                        entry["mtime"] = st.st_mtime_ns
+                        continue
+                except OSError:
+                    pass
+            paths.append(path)
+        return paths
+
+    def _record(self, future, path, manifest, summary, dry_run):
+        try:
+            result = future.result()
+        except Exception as e:
+            # Un proceso del pool murió: la imagen queda pendiente para la próxima vez
+            result = {"path": path, "before": 0, "after": 0, "status": "error", "error": str(e)}
+        status = result["status"]
+        summary["processed"] += 1
+        summary["errors" if status == "error" else status] += 1
+        summary["saved_bytes"] += result["before"] - result["after"]
+        if status == "error":
+            print(f"Error procesando {path}: {result.get('error')}")
+        elif not dry_run:
+            manifest[self._key(path)] = {
+                "size": result["size"], "mtime": result["mtime"], "hash": result["hash"],
+                "status": status, "saved": result["before"] - result["after"],
+            }
+            if summary["processed"] % SAVE_EVERY == 0:
+                self.save_manifest(manifest)
+
+    def run(self, dry_run: bool = False, progress: Optional[Progress] = None) -> Dict[str, int]:
+        """Procesa lo pendiente. `progress(hechas, total, bytes_ahorrados, ruta)` se
+        llama tras cada imagen. Retorna un resumen con los contadores."""
+        self._cancelled = False
+        manifest = self.load_manifest()
+        paths = self.pending(manifest)
+        summary = {"total": len(paths), "processed": 0, "optimized": 0, "kept": 0,
+                   "small": 0, "errors": 0, "saved_bytes": 0, "cancelled": 0}
+        if not paths:
+            return summary
+
+        started = time.perf_counter()
+        executor = ProcessPoolExecutor(max_workers=min(self.workers, len(paths)), initializer=_ignore_interrupt)
+        try:
+            futures = {
+                executor.submit(_process, path, dry_run, self.min_bytes, self.max_size, self.quality): path
+                for path in paths
+            }
+            waiting = set(futures)
+            while waiting and not self._cancelled:
+                # Espera con timeout para atender cancel() y Ctrl+C sin esperar a una imagen grande
+                done, waiting = wait(waiting, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._record(future, futures[future], manifest, summary, dry_run)
+                    if progress:
+                        progress(summary["processed"], len(paths), summary["saved_bytes"], futures[future])
+            if self._cancelled:
+                summary["cancelled"] = 1
+        except KeyboardInterrupt:
+            summary["cancelled"] = 1
+        finally:
+            # Lo que ya está en marcha termina (el reemplazo es atómico); lo encolado se descarta
+            executor.shutdown(wait=summary["cancelled"] == 0, cancel_futures=True)
+            if not dry_run:
+                self.save_manifest(manifest)
+        summary["seconds"] = round(time.perf_counter() - started, 2)
+        return summary
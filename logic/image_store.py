@@ -0,0 +1,547 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from logic.image_optimizer import IMAGE_EXTENSIONS, file_hash
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+PRESETS_DIR = os.path.join(DATA_DIR, "presets")
+TAG_IMAGES_DIR = os.path.join(DATA_DIR, "tag_images")
+TAG_INDEX_PATH = os.path.join(TAG_IMAGES_DIR, "tag_images_index.json")
+STORE_FOLDER = "image_store"
+STORE_DIR = os.path.join(DATA_DIR, STORE_FOLDER)
+STORE_PREFIX = STORE_FOLDER + "/"
+HASHES_PATH = os.path.join(DATA_DIR, "cache", "image_hashes.json")
+
+# Bits distintos (de 64) entre dos hashes perceptuales para tratarlas como casi la misma imagen
+NEAR_THRESHOLD = 4
+# Diferencia relativa de proporción permitida entre dos casi-duplicados
+ASPECT_TOLERANCE = 0.02
+# Diferencia máxima por canal del color medio: el hash va en grises y no ve un cambio de color
+COLOR_TOLERANCE = 12
+# ImageDedupJob no borra imágenes del almacén usadas hace menos de esto: un guardado en curso puede usarlas
+GC_GRACE_SECONDS = 15 * 60
+
+_TAG_FILE_STEM = re.compile(r"[a-z0-9_\-]+")
+
+Progress = Callable[[int, int], None]
+
+# La GUI y el hilo de guardado tienen cada uno su ImageHashIndex: los guardados del archivo van de a uno
+_HASHES_LOCK = threading.Lock()
+
+
+def data_rel(path):
+    """Ruta relativa a data/ con '/'."""
+    return os.path.relpath(os.path.abspath(path), DATA_DIR).replace("\\", "/")
+
+
+def is_stored(path):
+    return data_rel(path).startswith(STORE_PREFIX)
+
+
+def resolve_image(images_dir, name):
+    """Ruta absoluta de una entrada de la lista `images` de un preset.
+
+    Las entradas son un nombre dentro de <preset>_images o, si la imagen está
+    compartida, una ruta 'image_store/..' relativa a data/."""
+    name = name.replace("\\", "/")
+    if name.startswith(STORE_PREFIX):
+        return os.path.join(DATA_DIR, name)
+    return os.path.join(images_dir, name)
+
+
+def perceptual_hash(img):
+    """dHash de 64 bits: en una versión 8x9 en grises, cada píxel contra el de su derecha."""
+    from PIL import Image
+    small = img.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            i = row * 9 + col
+            value = (value << 1) | (pixels[i] > pixels[i + 1])
+    return value
+
+
+def hash_image(path):
+    """Entrada del índice de hashes (tamaño, mtime, sha1, hash perceptual, color medio, dimensiones)."""
+    from PIL import Image
+    st = os.stat(path)
+    with Image.open(path) as img:
+        width, height = img.size
+        # JPEG: decodificar ya reducido, los hashes solo necesitan unos pocos píxeles
+        img.draft("RGB", (64, 64))
+        phash = perceptual_hash(img)
+        color = img.convert("RGB").resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    return {"size": st.st_size, "mtime": st.st_mtime_ns, "sha1": file_hash(path),
+            "phash": f"{phash:016x}", "color": list(color), "width": width, "height": height}
+
+
+def _hash_job(path):
+    """Para el pool de procesos: (ruta, entrada o None, error)."""
+    try:
+        return path, hash_image(path), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def is_similar(a, b, threshold=NEAR_THRESHOLD):
+    """Mismo contenido, o hash perceptual a `threshold` bits o menos con la misma
+    proporción y color medio. Con threshold < 0 solo cuentan las copias exactas."""
+    if a["sha1"] == b["sha1"]:
+        return True
+    if threshold < 0 or (int(a["phash"], 16) ^ int(b["phash"], 16)).bit_count() > threshold:
+        return False
+    if any(abs(x - y) > COLOR_TOLERANCE for x, y in zip(a["color"], b["color"])):
+        return False
+    ratio_a = a["width"] / max(a["height"], 1)
+    ratio_b = b["width"] / max(b["height"], 1)
+    return abs(ratio_a - ratio_b) <= ASPECT_TOLERANCE * max(ratio_a, ratio_b)
+
+
+def _quality(path, entry):
+    # Entre casi-duplicados se conserva la de más resolución (y, a igualdad, la ya guardada)
+    return (entry["width"] * entry["height"], is_stored(path), entry["size"])
+
+
+def _write_json(path, data, indent=2):
+    # Nombre temporal propio: la GUI y un guardado en segundo plano pueden escribir a la vez
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp, path)
+
+
+class ImageHashIndex:
+    """Caché ruta -> hashes en data/cache/image_hashes.json.
+
+    Una entrada vale mientras el tamaño y el mtime del archivo no cambien; las
+    que faltan se calculan en un pool de procesos. Puede haber varias
+    instancias a la vez (GUI, guardado en segundo plano, CLI): `save()` relee el
+    archivo y solo aplica los cambios propios."""
+
+    def __init__(self, path=HASHES_PATH):
+        self.path = path
+        self.entries: Dict[str, Dict] = self._load()
+        self._changed = set()
+        self._removed = set()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error leyendo índice de hashes de imágenes: {e}")
+        return {}
+
+    def get(self, path) -> Optional[Dict]:
+        """Entrada vigente de `path` o None si no está o el archivo cambió."""
+        entry = self.entries.get(data_rel(path))
+        if entry is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if entry["size"] != st.st_size or entry["mtime"] != st.st_mtime_ns:
+            return None
+        return entry
+
+    def put(self, path, entry):
+        rel = data_rel(path)
+        self.entries[rel] = entry
+        self._changed.add(rel)
+        self._removed.discard(rel)
+
+    def _forget(self, rel):
+        del self.entries[rel]
+        self._changed.discard(rel)
+        self._removed.add(rel)
+
+    def update(self, paths, workers=None, progress: Optional[Progress] = None) -> Dict[str, Dict]:
+        """Hashes de `paths` (ruta -> entrada); calcula en paralelo los que falten."""
+        result, missing = {}, []
+        for path in paths:
+            entry = self.get(path)
+            if entry is None:
+                missing.append(path)
+            else:
+                result[path] = entry
+        if len(missing) > 1 and (workers or os.cpu_count() or 1) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count(), len(missing))) as executor:
+                outcomes = executor.map(_hash_job, missing, chunksize=8)
+                self._collect(outcomes, result, len(missing), progress)
+        else:
+            self._collect(map(_hash_job, missing), result, len(missing), progress)
+        return result
+
+    def _collect(self, outcomes, result, total, progress):
+        for done, (path, entry, error) in enumerate(outcomes, 1):
+            if entry is None:
+                print(f"Error calculando hash de {path}: {error}")
+            else:
+                self.put(path, entry)
+                result[path] = entry
+            if progress:
+                progress(done, total)
+
+    def move_folder(self, old_dir, new_dir):
+        """Actualiza las claves tras renombrar una carpeta (el rename conserva el mtime)."""
+        old_prefix, new_prefix = data_rel(old_dir) + "/", data_rel(new_dir) + "/"
+        for rel in [rel for rel in self.entries if rel.startswith(old_prefix)]:
+            entry = self.entries[rel]
+            self._forget(rel)
+            self.entries[new_prefix + rel[len(old_prefix):]] = entry
+            self._changed.add(new_prefix + rel[len(old_prefix):])
+
+    def prune(self):
+        """Olvida las rutas que ya no existen."""
+        for rel in [rel for rel in self.entries if not os.path.isfile(os.path.join(DATA_DIR, rel))]:
+            self._forget(rel)
+
+    def save(self):
+        """Mezcla los cambios propios con lo que haya en disco y lo escribe."""
+        if not self._changed and not self._removed:
+            return
+        try:
+            with _HASHES_LOCK:
+                entries = self._load()
+                for rel in self._removed:
+                    entries.pop(rel, None)
+                for rel in self._changed:
+                    entries[rel] = self.entries[rel]
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                _write_json(self.path, entries, indent=None)
+            self.entries = entries
+            self._changed.clear()
+            self._removed.clear()
+        except Exception as e:
+            print(f"Error guardando índice de hashes de imágenes: {e}")
+
+
+class ImageStore:
+    """Imágenes compartidas en data/image_store, una copia por contenido.
+
+    Cada archivo se llama <sha1>.<ext> y no se modifica nunca, así que varios
+    presets y tags pueden apuntar al mismo. `add()` deduplica al guardar solo
+    copias idénticas (mismo sha1): si la imagen nueva ya está en el almacén o
+    como imagen suelta conocida por el índice de hashes, se usa esa; si no, la
+    imagen se queda donde estaba. Los casi-duplicados solo los junta
+    ImageDedupJob, y únicamente con confirmación."""
+
+    def __init__(self, store_dir=STORE_DIR, hashes: ImageHashIndex = None):
+        self.store_dir = store_dir
+        self.hashes = hashes or ImageHashIndex()
+
+    def blobs(self) -> List[str]:
+        paths = []
+        if os.path.isdir(self.store_dir):
+            for root, _dirs, files in os.walk(self.store_dir):
+                paths.extend(os.path.join(root, name) for name in files
+                             if name.lower().endswith(IMAGE_EXTENSIONS))
+        return paths
+
+    def blob_path(self, entry, ext):
+        sha1 = entry["sha1"]
+        return os.path.join(self.store_dir, sha1[:2], f"{sha1}{ext.lower()}")
+
+    def put(self, path, entry=None) -> str:
+        """Copia `path` al almacén (si no estaba) y retorna su ruta relativa a data/.
+
+        La copia queda con el mtime actual: así ImageDedupJob no la borra
+        mientras el preset que la va a usar todavía se está guardando."""
+        entry = entry or self.hashes.update([path]).get(path)
+        if entry is None:
+            raise ValueError(f"No se pudo leer la imagen {path}")
+        dest = path if is_stored(path) else self.blob_path(entry, os.path.splitext(path)[1])
+        if os.path.isfile(dest):
+            os.utime(dest)
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            tmp = dest + ".tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, dest)
+        self.hashes.put(dest, dict(entry, mtime=os.stat(dest).st_mtime_ns))
+        return data_rel(dest)
+
+    def find(self, path, entry) -> Optional[str]:
+        """Ruta de una imagen conocida con el mismo contenido que `path` (las del almacén primero)."""
+        own = data_rel(path)
+        candidates = [os.path.join(DATA_DIR, rel) for rel, known in self.hashes.entries.items()
+                      if rel != own and known.get("sha1") == entry["sha1"]]
+        candidates.sort(key=is_stored, reverse=True)
+        for candidate in candidates:
+            if self.hashes.get(candidate) is not None:
+                return candidate
+        return None
+
+    def find_similar(self, path, entry, threshold=NEAR_THRESHOLD) -> Optional[str]:
+        """Ruta de una imagen conocida parecida a `path` (mismo criterio que ImageDedupJob)."""
+        own = data_rel(path)
+        for rel, known in self.hashes.entries.items():
+            if (rel != own and "phash" in known and is_similar(entry, known, threshold)
+                    and self.hashes.get(os.path.join(DATA_DIR, rel)) is not None):
+                return rel
+        return None
+
+    def add(self, path) -> str:
+        """Deduplica una imagen recién guardada.
+
+        Retorna la ruta relativa a data/ que debe quedar en el preset o en el
+        índice de tags: la de la copia compartida si había una idéntica (y
+        entonces `path` se borra) o la de `path` tal cual si es nueva. Un
+        casi-duplicado no se junta aquí (borraría una imagen distinta sin
+        preguntar): solo se avisa para pasar `dedup-images --threshold`."""
+        try:
+            if is_stored(path):
+                # Ya compartida: solo se marca como usada
+                return self.put(path)
+            entry = self.hashes.update([path]).get(path)
+            match = self.find(path, entry) if entry else None
+            if match is None:
+                similar = self.find_similar(path, entry) if entry else None
+                if similar is not None:
+                    print(f"{data_rel(path)} se parece a {similar}; "
+                          f"se puede juntar con: python -m logic.cli dedup-images --threshold {NEAR_THRESHOLD}")
+                return data_rel(path)
+            rel = self.put(match)
+            os.remove(path)
+            return rel
+        except Exception as e:
+            print(f"Error deduplicando {path}: {e}")
+            return data_rel(path)
+        finally:
+            self.hashes.save()
+
+
+# --- referencias ---
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Error leyendo {path}: {e}")
+        return None
+
+
+def _stamp(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _preset_references(presets_dir, refs, documents, stamps):
+    """Añade a `refs` (ruta -> [referencias]) las imágenes de cada preset."""
+    if not os.path.isdir(presets_dir):
+        return
+    for category in sorted(os.listdir(presets_dir)):
+        category_dir = os.path.join(presets_dir, category)
+        if not os.path.isdir(category_dir):
+            continue
+        for file_name in sorted(os.listdir(category_dir)):
+            if not file_name.endswith(".json"):
+                continue
+            json_path = os.path.join(category_dir, file_name)
+            stamps[json_path] = _stamp(json_path)
+            data = _read_json(json_path)
+            presets = data.get("presets") if isinstance(data, dict) else None
+            if not isinstance(presets, dict):
+                continue
+            documents[json_path] = data
+            for preset_id, preset in presets.items():
+                images = preset.get("images") if isinstance(preset, dict) else None
+                if not isinstance(images, list):
+                    continue
+                images_dir = os.path.join(category_dir, f"{preset_id}_images")
+                for i, name in enumerate(images):
+                    if isinstance(name, str):
+                        path = os.path.normpath(resolve_image(images_dir, name))
+                        refs.setdefault(path, []).append(("preset", json_path, preset_id, i))
+
+
+def _tag_references(tag_images_dir, tag_index, refs):
+    """Imágenes de tags: las del índice y las copiadas a mano en tag_images/<categoria>."""
+    for key, rel in tag_index.items():
+        if isinstance(rel, str):
+            refs.setdefault(os.path.normpath(os.path.join(DATA_DIR, rel)), []).append(("tag", key))
+    if not os.path.isdir(tag_images_dir):
+        return
+    for category in sorted(os.listdir(tag_images_dir)):
+        folder = os.path.join(tag_images_dir, category)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            stem, ext = os.path.splitext(name)
+            key = f"{category}/{stem}"
+            # El índice las encuentra por nombre: <tag normalizado><ext>
+            if ext.lower() in IMAGE_EXTENSIONS and _TAG_FILE_STEM.fullmatch(stem) and key not in tag_index:
+                refs.setdefault(os.path.normpath(os.path.join(folder, name)), []).append(("tag", key))
+
+
+def group_similar(entries: Dict[str, Dict], threshold=NEAR_THRESHOLD) -> List[List[str]]:
+    """Grupos de rutas con la misma imagen (solo los de dos o más)."""
+    parent = {path: path for path in entries}
+
+    def find(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    # Copias exactas: una sola representante por contenido para la comparación perceptual
+    by_sha1 = {}
+    for path, entry in entries.items():
+        first = by_sha1.setdefault(entry["sha1"], path)
+        if first != path:
+            parent[find(path)] = find(first)
+    if threshold >= 0:
+        representatives = list(by_sha1.values())
+        for i, a in enumerate(representatives):
+            for b in representatives[i + 1:]:
+                if is_similar(entries[a], entries[b], threshold):
+                    parent[find(b)] = find(a)
+    groups = {}
+    for path in entries:
+        groups.setdefault(find(path), []).append(path)
+    return [sorted(group) for group in groups.values() if len(group) > 1]
+
+
+class ImageDedupJob:
+    """Junta las imágenes repetidas de presets y tags en el almacén compartido.
+
+    Calcula en paralelo el sha1 y el hash perceptual de cada imagen referenciada
+    (con caché por tamaño y mtime), agrupa las iguales, deja una sola copia en
+    data/image_store y reescribe las listas `images` de los presets y el índice
+    de imágenes de tags para que apunten a ella. Después borra las copias
+    sueltas y las imágenes del almacén que nadie usa.
+
+    Por defecto solo junta copias idénticas. Con `threshold` >= 0 también junta
+    casi-duplicados (hash perceptual parecido), pero eso borra imágenes que no
+    son iguales byte a byte: `run()` solo escribe si `confirm(grupos)` acepta
+    los grupos que se van a juntar.
+
+    Puede correr mientras la app guarda presets o imágenes de tags: un JSON que
+    cambió desde que se leyó no se reescribe (y sus copias sueltas se quedan),
+    y no se borra ninguna imagen del almacén usada en los últimos GC_GRACE_SECONDS."""
+
+    def __init__(self, presets_dir: str = PRESETS_DIR, tag_images_dir: str = TAG_IMAGES_DIR,
+                 store: ImageStore = None, workers: int = None, threshold: int = -1):
+        self.presets_dir = presets_dir
+        self.tag_images_dir = tag_images_dir
+        self.tag_index_path = os.path.join(tag_images_dir, os.path.basename(TAG_INDEX_PATH))
+        self.store = store or ImageStore()
+        self.workers = workers
+        self.threshold = threshold
+
+    def run(self, dry_run: bool = False, progress: Optional[Progress] = None,
+            confirm: Optional[Callable[[List[List[str]]], bool]] = None) -> Dict[str, int]:
+        """`progress(hechas, total)` se llama mientras se calculan los hashes.
+
+        `confirm` recibe los grupos con casi-duplicados (rutas relativas a data/,
+        la primera es la que se conserva) antes de escribir nada; si no está o
+        retorna False, la pasada queda como simulación."""
+        started = time.time()
+        documents, stamps = {}, {self.tag_index_path: _stamp(self.tag_index_path)}
+        tag_index = _read_json(self.tag_index_path)
+        tag_index = tag_index if isinstance(tag_index, dict) else {}
+        refs: Dict[str, List] = {}
+        _preset_references(self.presets_dir, refs, documents, stamps)
+        _tag_references(self.tag_images_dir, tag_index, refs)
+        existing = [path for path in refs if os.path.isfile(path)]
+        blobs = [os.path.normpath(path) for path in self.store.blobs()]
+
+        hashes = self.store.hashes
+        entries = hashes.update(existing + [p for p in blobs if p not in refs], self.workers, progress)
+        groups = group_similar({path: entries[path] for path in existing if path in entries}, self.threshold)
+        summary = {"images": len(existing), "groups": len(groups), "duplicates": 0,
+                   "freed_bytes": 0, "removed_blobs": 0, "errors": len(existing) - sum(p in entries for p in existing)}
+
+        keepers = {}
+        for group in groups:
+            keep = max(group, key=lambda path: _quality(path, entries[path]))
+            keepers[keep] = group
+        near = [[data_rel(keep)] + [data_rel(path) for path in group if path != keep]
+                for keep, group in keepers.items() if len({entries[path]["sha1"] for path in group}) > 1]
+        if near and not dry_run and (confirm is None or not confirm(near)):
+            dry_run = True
+        summary["near_groups"] = len(near)
+        summary["applied"] = not dry_run
+
+        changed_documents, loose = set(), {}
+        for keep, group in keepers.items():
+            summary["duplicates"] += len(group) - 1
+            summary["freed_bytes"] += sum(entries[path]["size"] for path in group if path != keep)
+            if dry_run:
+                continue
+            target = self.store.put(keep, entries[keep])
+            for path in group:
+                sources = set()
+                for ref in refs.pop(path):
+                    if ref[0] == "preset":
+                        _, json_path, preset_id, i = ref
+                        documents[json_path]["presets"][preset_id]["images"][i] = target
+                        sources.add(json_path)
+                    else:
+                        tag_index[ref[1]] = target
+                        sources.add(self.tag_index_path)
+                changed_documents |= sources
+                if not is_stored(path):
+                    loose[path] = sources
+            refs.setdefault(os.path.normpath(os.path.join(DATA_DIR, target)), []).append(("store",))
+
+        recent = started - GC_GRACE_SECONDS
+        if dry_run:
+            summary["removed_blobs"] = sum(1 for path in blobs if path not in refs and not self._in_use(path, recent))
+            hashes.save()
+            return summary
+
+        # Primero las referencias nuevas; solo después se borran los archivos
+        skipped = set()
+        for json_path in sorted(changed_documents):
+            if _stamp(json_path) != stamps[json_path]:
+                print(f"{json_path} cambió durante la deduplicación; se deja como está")
+                skipped.add(json_path)
+                continue
+            _write_json(json_path, tag_index if json_path == self.tag_index_path else documents[json_path])
+        for path, sources in loose.items():
+            # Las sueltas solo las usa su JSON (ya revisado): basta con que no sean de después de empezar
+            if not sources & skipped and not self._in_use(path, started):
+                self._remove(path)
+        for path in blobs:
+            if path not in refs and not self._in_use(path, recent):
+                summary["removed_blobs"] += 1
+                self._remove(path)
+        hashes.prune()
+        hashes.save()
+        return summary
+
+    @staticmethod
+    def _in_use(path, recent):
+        # Un guardado en curso pudo crearla o reusarla (ImageStore.put actualiza el mtime)
+        try:
+            return os.stat(path).st_mtime > recent
+        except OSError:
+            return False
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            folder = os.path.dirname(path)
+            if os.path.basename(folder).endswith("_images") and not os.listdir(folder):
+                # Carpeta de imágenes de un preset que quedó vacía
+                os.rmdir(folder)
+        except OSError as e:
+            print(f"No se pudo borrar {path}: {e}")
@@ -2,9 +2,23 @@ import json
 import os
 import re
 import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 from datetime import datetime
-from PIL import Image
+
+from logic.image_optimizer import ImageOptimizationJob, optimize_image
+from logic.image_store import STORE_PREFIX, ImageDedupJob, ImageHashIndex, ImageStore, is_stored, resolve_image
+
+# Imágenes que se optimizan a la vez al guardar un preset
+SAVE_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def _link_or_copy(source, dest):
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
 
 class PresetsManager:
     """Gestor de presets organizados por categorías"""
@@ -75,36 +89,7 @@ class PresetsManager:
     def _optimize_image(self, source_path, dest_path, max_size=(512, 512), quality=85):
         """Optimiza una imagen: redimensiona y comprime"""
         try:
-            with Image.open(source_path) as img:
-                # Corregir orientación EXIF si existe
-                try:
-                    from PIL import ExifTags, ImageOps
-                    img = ImageOps.exif_transpose(img)
-                except Exception:
-                    pass
-
-                # Calcular nuevo tamaño manteniendo ratio
-                img.thumbnail(max_size, Image.Resampling.LANCZOS)
-                
-                file_ext = os.path.splitext(dest_path)[1].lower()
-                
-                if file_ext in ['.jpg', '.jpeg']:
-                    # Convertir a RGB si es necesario
-                    if img.mode in ('RGBA', 'LA', 'P'):
-                        img = img.convert('RGB')
-                    img.save(dest_path, 'JPEG', quality=quality, optimize=True)
-                    
-                elif file_ext == '.png':
-                    # Para PNG, intentar optimizar
-                    # Si no tiene transparencia, convertir a JPG podría ser mejor, pero mantendremos formato
-                    img.save(dest_path, 'PNG', optimize=True)
-                    
-                elif file_ext == '.webp':
-                    img.save(dest_path, 'WEBP', quality=quality)
-                    
-                else:
-                    img.save(dest_path)
-                    
+            optimize_image(source_path, dest_path, max_size=max_size, quality=quality)
         except Exception as e:
             print(f"Error optimizando imagen {source_path}: {e}")
             # Fallback: copia simple si falla la optimización
@@ -113,57 +98,66 @@ class PresetsManager:
             except shutil.SameFileError:
                 pass
 
+    def preset_id(self, preset_name):
+        """Nombre de archivo (e id) de un preset a partir de su nombre visible"""
+        safe_filename = re.sub(r'[^\w\s-]', '', preset_name).strip()
+        return re.sub(r'[-\s]+', '_', safe_filename).lower()
+
     def save_preset(self, preset_type, preset_name, preset_data):
         """Guarda un preset con las categorías seleccionadas y las imágenes"""
+        self.commit_preset(self.stage_preset(preset_type, preset_name, preset_data))
+        return True
+
+    def stage_preset(self, preset_type, preset_name, preset_data, workers=None):
+        """Primera fase del guardado: prepara las imágenes sin tocar el preset actual.
+
+        Las imágenes nuevas se optimizan en paralelo (hilos: Pillow suelta el GIL
+        al decodificar, escalar y comprimir) dentro de una carpeta temporal junto
+        a la del preset; las que ya estaban en data/presets se copian tal cual.
+        Retorna lo que necesita `commit_preset`. Es seguro llamarla fuera del
+        hilo de la GUI."""
         category_dir = os.path.join(self.presets_dir, preset_type)
         os.makedirs(category_dir, exist_ok=True)
-        
-        # Sanitizar nombre de archivo
-        safe_filename = re.sub(r'[^\w\s-]', '', preset_name).strip()
-        safe_filename = re.sub(r'[-\s]+', '_', safe_filename).lower()
-        
-        # Gestionar imágenes
-        images_data = []
-        images_dir = os.path.join(category_dir, f"{safe_filename}_images")
-        selected_images = preset_data.get('images') or []
-
-        if selected_images:
-            os.makedirs(images_dir, exist_ok=True)
+        preset_id = self.preset_id(preset_name)
+        images_dir = os.path.join(category_dir, f"{preset_id}_images")
+        self._remove_leftovers(category_dir, preset_id)
+        staging_dir = tempfile.mkdtemp(prefix=f".{preset_id}_images.staging.", dir=category_dir)
 
-            desired_names = []
-            for i, image_path in enumerate(selected_images):
+        try:
+            store = ImageStore()
+            presets_root = os.path.abspath(self.presets_dir) + os.sep
+            images_data, encode = [], []
+            for i, image_path in enumerate(preset_data.get('images') or []):
                 if not os.path.exists(image_path):
                     continue
-                file_extension = os.path.splitext(image_path)[1]
-                new_image_name = f"image_{i+1}{file_extension}"
-                new_image_path = os.path.join(images_dir, new_image_name)
-
-                # Optimizar imagen al guardar
-                if os.path.abspath(image_path) != os.path.abspath(new_image_path):
-                    self._optimize_image(image_path, new_image_path)
+                if is_stored(image_path):
+                    # Imagen compartida: el preset solo guarda la referencia
+                    images_data.append(store.add(image_path))
+                    continue
+                new_image_name = f"image_{i+1}{os.path.splitext(image_path)[1]}"
+                staged_path = os.path.join(staging_dir, new_image_name)
+                if os.path.abspath(image_path).startswith(presets_root):
+                    # Ya se optimizó al guardarla la primera vez
+                    _link_or_copy(image_path, staged_path)
                 else:
-                    # Si es el mismo archivo (re-guardado), podríamos intentar re-optimizar 
-                    # si es muy grande, pero por ahora asumimos que ya está bien o se optimizará con el script global
-                    pass
-
-                desired_names.append(new_image_name)
+                    encode.append((image_path, staged_path))
                 images_data.append(new_image_name)
 
-            # Limpiar imágenes obsoletas
-            if os.path.isdir(images_dir):
-                for fname in os.listdir(images_dir):
-                    if fname not in set(desired_names):
-                        try:
-                            os.remove(os.path.join(images_dir, fname))
-                        except Exception:
-                            pass
-        else:
-            if os.path.isdir(images_dir):
-                shutil.rmtree(images_dir, ignore_errors=True)
-        
+            if encode:
+                with ThreadPoolExecutor(max_workers=min(len(encode), workers or SAVE_WORKERS)) as executor:
+                    list(executor.map(lambda job: self._optimize_image(*job), encode))
+                for image_path, staged_path in encode:
+                    # Si ya hay una copia igual (en el almacén o en otro preset) se usa esa
+                    stored = store.add(staged_path)
+                    if stored.startswith(STORE_PREFIX):
+                        images_data[images_data.index(os.path.basename(staged_path))] = stored
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
         preset_structure = {
             "presets": {
-                safe_filename: {
+                preset_id: {
                     "name": preset_name,
                     "categories": preset_data['categories'],
                     "images": images_data,
@@ -171,63 +165,87 @@ class PresetsManager:
                 }
             }
         }
-        
-        file_path = os.path.join(category_dir, f"{safe_filename}.json")
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(preset_structure, f, indent=2, ensure_ascii=False)
-        
-        return True
+        return {
+            "preset_type": preset_type,
+            "preset_id": preset_id,
+            "json_path": os.path.join(category_dir, f"{preset_id}.json"),
+            "images_dir": images_dir,
+            "staging_dir": staging_dir,
+            "data": preset_structure,
+        }
 
-    def optimize_all_existing_images(self):
-        """Recorre todos los presets y optimiza sus imágenes existentes"""
-        count = 0
-        total_saved_bytes = 0
-        
-        if not os.path.exists(self.presets_dir):
-            return 0, 0
-            
-        # Recorrer categorías
-        for category in os.listdir(self.presets_dir):
-            category_path = os.path.join(self.presets_dir, category)
-            if not os.path.isdir(category_path):
-                continue
-                
-            # Buscar carpetas de imágenes
-            for item in os.listdir(category_path):
-                if item.endswith('_images') and os.path.isdir(os.path.join(category_path, item)):
-                    images_dir = os.path.join(category_path, item)
-                    
-                    for img_file in os.listdir(images_dir):
-                        if img_file.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                            img_path = os.path.join(images_dir, img_file)
-                            
-                            try:
-                                initial_size = os.path.getsize(img_path)
-                                # Si la imagen es pequeña (< 200KB), saltar
-                                if initial_size < 200 * 1024:
-                                    continue
-                                    
-                                # Optimizar sobreescribiendo
-                                # Usamos un archivo temporal con la misma extensión para que PIL detecte el formato
-                                file_name, file_ext = os.path.splitext(img_file)
-                                temp_path = os.path.join(images_dir, f"temp_{file_name}{file_ext}")
-                                
-                                self._optimize_image(img_path, temp_path)
-                                
-                                if os.path.exists(temp_path):
-                                    final_size = os.path.getsize(temp_path)
-                                    if final_size < initial_size:
-                                        os.replace(temp_path, img_path)
-                                        saved = initial_size - final_size
-                                        total_saved_bytes += saved
-                                        count += 1
-                                        print(f"Optimizado: {img_file} ({initial_size/1024:.1f}KB -> {final_size/1024:.1f}KB)")
-                                    else:
-                                        os.remove(temp_path)
-                            except Exception as e:
-                                print(f"Error procesando {img_file}: {e}")
-                                
-        return count, total_saved_bytes
+    def commit_preset(self, staged):
+        """Segunda fase: cambia la carpeta de imágenes y el JSON.
+
+        La carpeta temporal reemplaza a la de imágenes con renames y el JSON se
+        escribe aparte y se reemplaza con os.replace. Entre los dos renames un
+        lector puede no encontrar la carpeta de imágenes (el preset se ve sin
+        imágenes un instante); si algo falla se restaura la carpeta anterior y el
+        preset queda como estaba."""
+        category_dir = os.path.dirname(staged["json_path"])
+        images_dir, staging_dir = staged["images_dir"], staged["staging_dir"]
+        # No termina en .json: get_presets_by_category no lo confunde con un preset
+        tmp_json = os.path.join(category_dir, f".{staged['preset_id']}.json.tmp")
+        with open(tmp_json, 'w', encoding='utf-8') as f:
+            json.dump(staged["data"], f, indent=2, ensure_ascii=False)
+
+        old_dir = None
+        moved_in = False
+        try:
+            if os.path.isdir(images_dir):
+                old_dir = os.path.join(category_dir, os.path.basename(staging_dir).replace("_images.staging.", "_images.old."))
+                os.rename(images_dir, old_dir)
+            if os.listdir(staging_dir):
+                os.rename(staging_dir, images_dir)
+                moved_in = True
+            os.replace(tmp_json, staged["json_path"])
+        except Exception:
+            # Deja el preset como estaba: la carpeta nueva vuelve a la temporal y la anterior a su sitio
+            if moved_in and os.path.isdir(images_dir):
+                os.rename(images_dir, staging_dir)
+            if old_dir and os.path.isdir(old_dir):
+                os.rename(old_dir, images_dir)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            if os.path.exists(tmp_json):
+                os.remove(tmp_json)
+            raise
+
+        # El JSON nuevo ya está en su sitio: recién ahora se descarta lo anterior
+        if old_dir:
+            shutil.rmtree(old_dir, ignore_errors=True)
+        if moved_in:
+            # Los hashes de las imágenes nuevas se calcularon en la carpeta temporal
+            hashes = ImageHashIndex()
+            hashes.move_folder(staging_dir, images_dir)
+            hashes.save()
+        else:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+        return staged["data"]["presets"][staged["preset_id"]]
+
+    def _remove_leftovers(self, category_dir, preset_id):
+        """Borra carpetas temporales de un guardado anterior que se cortó"""
+        prefixes = (f".{preset_id}_images.staging.", f".{preset_id}_images.old.")
+        for name in os.listdir(category_dir):
+            if name.startswith(prefixes):
+                shutil.rmtree(os.path.join(category_dir, name), ignore_errors=True)
+
+    def optimize_all_existing_images(self, dry_run=False, progress=None, workers=None):
+        """Optimiza las imágenes de todos los presets en paralelo (ver logic/image_optimizer.py).
+
+        Retorna (imágenes optimizadas, bytes ahorrados); con `dry_run` es una estimación."""
+        job = ImageOptimizationJob(self.presets_dir, workers=workers)
+        summary = job.run(dry_run=dry_run, progress=progress)
+        return summary["optimized"], summary["saved_bytes"]
+
+    def deduplicate_images(self, dry_run=False, progress=None, workers=None, threshold=-1, confirm=None):
+        """Junta las imágenes repetidas de presets y tags (ver logic/image_store.py).
+
+        Por defecto solo las copias idénticas; con `threshold` >= 0 también las
+        parecidas, si `confirm(grupos)` lo acepta. Retorna (duplicadas, bytes
+        liberados); con `dry_run` es una estimación."""
+        job = ImageDedupJob(self.presets_dir, workers=workers, threshold=threshold)
+        summary = job.run(dry_run=dry_run, progress=progress, confirm=confirm)
+        return summary["duplicates"], summary["freed_bytes"]
     
     def get_all_preset_folders(self):
         """Obtiene todas las carpetas de presets (solo personalizadas)"""
@@ -288,7 +306,7 @@ class PresetsManager:
                 images_dir = os.path.join(self.presets_dir, preset_type, f"{safe_filename}_images")
                 full_image_paths = []
                 for image_name in preset_data['images']:
-                    full_path = os.path.join(images_dir, image_name)
+                    full_path = resolve_image(images_dir, image_name)
                     if os.path.exists(full_path):
                         full_image_paths.append(full_path)
                 preset_data['images'] = full_image_paths
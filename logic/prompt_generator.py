@@ -1,70 +1,103 @@
 import re
-from typing import Dict, List, Set
+import random
+from typing import Dict, List, Optional, Tuple
+from logic.prompt_parser import Term, parse_prompt, dedupe_terms, join_terms
+from logic.wildcards import is_dynamic, compile_template, expand_plan
+from logic.category_registry import CategoryRegistry, get_registry
 
 class PromptGenerator:
     """Generador de prompts dinámico."""
     
-    def __init__(self):
-        self.category_order = [
-            "angulo",
-            "calidad_tecnica", 
-            "estilo_artistico",
-            "composicion",
-            "atmosfera_vibe",
-            "loras_estilos_artistico",
-            "loras_detalles_mejoras",
-            "loras_modelos_especificos",
-            "loras_personaje",
-            "fondo",
-            "personaje",
-            "cabello_forma",
-            "cabello_color",
-            "cabello_accesorios",
-            "rostro_accesorios",
-            "ojos",
-            "expresion_facial_ojos",
-            "expresion_facial_mejillas",
-            "expresion_facial_boca",
-            "postura_cabeza",
-            "direccion_mirada_personaje",
-            "vestuario_general",
-            "vestuario_superior",
-            "vestuario_inferior",
-            "vestuario_accesorios",
-            "ropa_interior_superior",
-            "ropa_interior_inferior",
-            "ropa_interior_accesorios",
-            "tipo_de_cuerpo",
-            "rasgo_fisico_cuerpo",
-            "rasgo_fisico_piernas",
-            "pose_actitud_global",
-            "pose_brazos",
-            "pose_piernas",
-            "orientacion_personaje",
-            "actitud_emocion",
-            "nsfw",
-            "objetos_interaccion",
-            "objetos_escenario",
-            "mirada_espectador"
-        ]
+    def __init__(self, registry: CategoryRegistry = None):
+        # El orden sale del registro de categorías (nombre -> rango)
+        self.registry = registry or get_registry()
+        self._order_override: Optional[Dict[str, int]] = None
+        self._registry_version = -1
+        self._ranks: Dict[str, int] = {}
         
         self.active_categories: Dict[str, str] = {}
-        self.duplicate_terms: Set[str] = set()
-        
+
+        # Segmentos ya limpios por categoría y memo del prompt/estadísticas
+        self._segments: Dict[str, str] = {}
+        self._version = 0
+        self._cache_version = -1
+        self._cached_prompt = ""
+        self._cached_terms: Tuple[Term, ...] = ()
+        self._cached_stats: Dict[str, int] = {}
+        self._wildcard_seed: Optional[int] = None
+
+    @property
+    def wildcard_seed(self) -> Optional[int]:
+        """Semilla para expandir {a|b} y __wildcards__; None deja la plantilla tal cual."""
+        return self._wildcard_seed
+
+    @wildcard_seed.setter
+    def wildcard_seed(self, seed: Optional[int]):
+        if seed != self._wildcard_seed:
+            self._wildcard_seed = seed
+            self._version += 1
+
+    def reroll_wildcards(self) -> int:
+        """Nueva semilla al azar para los valores dinámicos; retorna la semilla."""
+        self.wildcard_seed = random.randrange(2 ** 31)
+        return self._wildcard_seed
+
+    def has_dynamic_values(self) -> bool:
+        """True si alguna categoría usa {a|b} o __wildcards__."""
+        return any(is_dynamic(segment) for segment in self._segments.values())
+
+    @property
+    def category_order(self) -> List[str]:
+        ranks = self._current_ranks()
+        return sorted(ranks, key=ranks.get)
+
+    @category_order.setter
+    def category_order(self, order: List[str]):
+        """Fija un orden propio para este generador, ignorando el registro."""
+        self._order_override = {name: i for i, name in enumerate(order)}
+        self._ranks = self._order_override
+        self._version += 1
+
+    def _current_ranks(self) -> Dict[str, int]:
+        if self._order_override is None and self._registry_version != self.registry.version:
+            self._ranks = self.registry.ranks
+            self._registry_version = self.registry.version
+            self._version += 1
+        return self._ranks
+
+    @property
+    def version(self) -> int:
+        """Contador que cambia con cada modificación efectiva."""
+        return self._version
+
+    def _clean_segment(self, value: str) -> str:
+        cleaned = value.rstrip(', ').strip()
+        return re.sub(r'\s+', ' ', cleaned)
+
     def update_category(self, category_name: str, value: str):
         """Actualiza categoría."""
         if value and value.strip():
-            self.active_categories[category_name] = value.strip()
+            value = value.strip()
+            if self.active_categories.get(category_name) == value:
+                return
+            self.active_categories[category_name] = value
+            self._segments[category_name] = self._clean_segment(value)
+            self._version += 1
         else:
-            self.active_categories.pop(category_name, None)
+            self.clear_category(category_name)
     
     def clear_category(self, category_name: str):
         """Limpia categoría."""
-        self.active_categories.pop(category_name, None)
+        if self.active_categories.pop(category_name, None) is not None:
+            self._segments.pop(category_name, None)
+            self._version += 1
     
     def clear_all(self):
         """Limpia todo."""
-        self.active_categories.clear()
+        if self.active_categories:
+            self.active_categories.clear()
+            self._segments.clear()
+            self._version += 1
     
     def validate_input(self, text: str) -> str:
         """Valida input."""
@@ -76,47 +109,64 @@ class PromptGenerator:
         
         return cleaned
     
-    def remove_duplicates(self, prompt_parts: List[str]) -> List[str]:
-        """Elimina duplicados."""
-        seen = set()
-        unique_parts = []
-        
-        for part in prompt_parts:
-            normalized = part.lower().strip()
-            if normalized and normalized not in seen:
-                seen.add(normalized)
-                unique_parts.append(part)
-        
-        return unique_parts
-    
+    def _ordered_segments(self) -> List[str]:
+        # Solo se recorren las categorías activas, no todo category_order
+        known = []
+        extra = []
+        ranks = self._ranks
+        for category, segment in self._segments.items():
+            if not segment:
+                continue
+            rank = ranks.get(category)
+            if rank is None:
+                extra.append(segment)
+            else:
+                known.append((rank, segment))
+        known.sort(key=lambda item: item[0])
+        return [segment for _, segment in known] + extra
+
+    def _expanded_segments(self, seed) -> List[str]:
+        self._current_ranks()
+        segments = self._ordered_segments()
+        if seed is None:
+            return segments
+        # Un único generador por prompt: el resultado depende solo de la semilla
+        rng = random.Random(seed)
+        return [expand_plan(compile_template(seg), rng) if is_dynamic(seg) else seg
+                for seg in segments]
+
+    def _assemble(self, segments: List[str]) -> List[Term]:
+        # Deduplicación por término: se conserva la primera aparición con el mayor peso
+        terms = []
+        for segment in segments:
+            terms.extend(parse_prompt(segment))
+        return dedupe_terms(terms)
+
+    def expand_prompt(self, seed) -> str:
+        """Prompt con la sintaxis dinámica expandida para `seed` (no toca la caché)."""
+        return join_terms(self._assemble(self._expanded_segments(seed)))
+
     def generate_prompt(self) -> str:
         """Genera prompt final."""
-        if not self.active_categories:
-            return ""
-        
-        prompt_parts = []
-        
-        for category in self.category_order:
-            if category in self.active_categories:
-                value = self.active_categories[category]
-                if value:
-                    cleaned_value = value.rstrip(', ').strip()
-                    if cleaned_value:
-                        prompt_parts.append(cleaned_value)
-        
-        for category, value in self.active_categories.items():
-            if category not in self.category_order and value:
-                cleaned_value = value.rstrip(', ').strip()
-                if cleaned_value:
-                    prompt_parts.append(cleaned_value)
-        
-        unique_parts = self.remove_duplicates(prompt_parts)
-        
-        final_prompt = ", ".join(unique_parts)
-        final_prompt = re.sub(r'\s+', ' ', final_prompt)
-        
-        return final_prompt.strip()
+        self._current_ranks()
+        if self._cache_version == self._version:
+            return self._cached_prompt
+        unique_terms = self._assemble(self._expanded_segments(self._wildcard_seed))
+        prompt = join_terms(unique_terms)
+        self._cached_prompt = prompt
+        self._cached_terms = tuple(unique_terms)
+        self._cached_stats = {
+            "total_terms": len(unique_terms),
+            "total_characters": len(prompt)
+        }
+        self._cache_version = self._version
+        return prompt
     
+    def get_prompt_terms(self) -> Tuple[Term, ...]:
+        """Términos del prompt actual (ya deduplicados)."""
+        self.generate_prompt()
+        return self._cached_terms
+
     def get_category_value(self, category_name: str) -> str:
         """Obtiene valor de categoría."""
         return self.active_categories.get(category_name, "")
@@ -127,12 +177,12 @@ class PromptGenerator:
     
     def get_prompt_statistics(self) -> Dict[str, int]:
         """Obtiene estadísticas."""
-        prompt = self.generate_prompt()
-        if not prompt:
-            return {"total_terms": 0, "total_characters": 0}
-        
-        terms = [term.strip() for term in prompt.split(",")]
-        return {
-            "total_terms": len(terms),
-            "total_characters": len(prompt)
-        }
+        self.generate_prompt()
+        if "total_tokens" not in self._cached_stats:
+            from logic.clip_tokenizer import analyze_terms
+            info = analyze_terms(self._cached_terms)
+            self._cached_stats["total_tokens"] = info["total_tokens"]
+            self._cached_stats["chunks"] = len(info["chunks"])
+            # 1 si los dos valores anteriores son estimados (falta el vocabulario de CLIP)
+            self._cached_stats["tokens_estimated"] = int(not info["exact"])
+        return dict(self._cached_stats)
@@ -0,0 +1,132 @@
+"""Capa sin Qt sobre PromptGenerator, VariationsManager y PresetsManager.
+
+Permite cargar un personaje, aplicar variaciones y presets y obtener el prompt
+(o sus variantes sin LoRAs / solo vestuario / solo rasgos) desde scripts."""
+import json
+import os
+from typing import Dict, List, Optional
+
+from logic.prompt_generator import PromptGenerator
+from logic.prompt_parser import parse_prompt, strip_loras
+from logic.batch_generator import load_character_categories, normalize_category_key
+
+TRAITS_CATEGORIES = [
+    "personaje", "cabello_forma", "cabello_color", "cabello_accesorios",
+    "rostro_accesorios", "ojos", "expresion_facial_ojos",
+    "expresion_facial_mejillas", "expresion_facial_boca", "tipo_de_cuerpo",
+    "rasgo_fisico_cuerpo", "rasgo_fisico_piernas", "actitud_emocion", "nsfw",
+]
+
+OUTFIT_CATEGORIES = [
+    "cabello_accesorios", "rostro_accesorios", "vestuario_general",
+    "vestuario_superior", "vestuario_inferior", "vestuario_accesorios",
+    "vestuariospies", "ropa_interior_superior", "ropa_interior_inferior",
+    "ropa_interior_accesorios",
+]
+
+CATEGORY_GROUPS = {"traits": TRAITS_CATEGORIES, "outfit": OUTFIT_CATEGORIES}
+
+CHARACTERS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "characters")
+
+
+def list_characters() -> List[str]:
+    if not os.path.isdir(CHARACTERS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(CHARACTERS_DIR)
+        if os.path.isfile(os.path.join(CHARACTERS_DIR, name, f"{name}.json"))
+    )
+
+
+class PromptSession:
+    """Estado de categorías de un prompt, equivalente al grid de la UI.
+
+    Igual que en la interfaz, personaje, variaciones y presets se aplican
+    encima de los valores actuales."""
+
+    def __init__(self, generator: PromptGenerator = None):
+        self.generator = generator or PromptGenerator()
+        self.character: Optional[str] = None
+        self._variations = None
+        self._presets = None
+
+    @property
+    def variations(self):
+        if self._variations is None:
+            from logic.variations_manager import VariationsManager
+            self._variations = VariationsManager()
+        return self._variations
+
+    @property
+    def presets(self):
+        if self._presets is None:
+            from logic.presets_manager import PresetsManager
+            self._presets = PresetsManager()
+        return self._presets
+
+    def set_category(self, category: str, value: str):
+        # Igual que el grid: el valor llega al generador tal cual se escribió
+        self.generator.update_category(normalize_category_key(category), value or "")
+
+    def apply_categories(self, categories: Dict[str, str]) -> int:
+        for category, value in (categories or {}).items():
+            self.set_category(category, value)
+        return len(categories or {})
+
+    def load_character(self, name: str) -> int:
+        self.character = name
+        return self.apply_categories(load_character_categories(name))
+
+    def apply_variation(self, variation_name: str, character: str = None) -> int:
+        character = character or self.character
+        if not character:
+            raise ValueError("Hace falta un personaje para aplicar una variación")
+        data = self.variations.load_variation(character, variation_name)
+        if data is None:
+            raise KeyError(f"Variación no encontrada: {character}/{variation_name}")
+        return self.apply_categories(data.get("categories", {}))
+
+    def apply_preset(self, ref: str) -> int:
+        """`ref` con formato 'carpeta/nombre'."""
+        folder, _, preset_name = ref.partition("/")
+        data = self.presets.load_preset(folder, preset_name)
+        if data is None:
+            raise KeyError(f"Preset no encontrado: {ref}")
+        return self.apply_categories(data.get("categories", {}))
+
+    def values(self) -> Dict[str, str]:
+        return self.generator.get_active_categories()
+
+    def build(self, no_lora: bool = False, only: str = None, seed: int = None) -> str:
+        """Prompt final. `only` = "outfit" | "traits" limita las categorías."""
+        gen = self.generator
+        if only:
+            if only not in CATEGORY_GROUPS:
+                raise ValueError(f"Grupo desconocido: {only}")
+            wanted = set(CATEGORY_GROUPS[only])
+            gen = PromptGenerator(self.generator.registry)
+            for category, value in self.generator.get_active_categories().items():
+                if category in wanted:
+                    gen.update_category(category, value)
+        prompt = gen.generate_prompt() if seed is None else gen.expand_prompt(seed)
+        return strip_loras(prompt) if no_lora else prompt
+
+    def statistics(self, no_lora: bool = False, only: str = None, seed: int = None) -> Dict[str, int]:
+        """Estadísticas del prompt que retorna `build` con los mismos argumentos."""
+        if not no_lora and not only and seed is None:
+            return self.generator.get_prompt_statistics()
+        from logic.clip_tokenizer import analyze_terms
+        prompt = self.build(no_lora=no_lora, only=only, seed=seed)
+        terms = parse_prompt(prompt)
+        info = analyze_terms(terms)
+        return {
+            "total_terms": len(terms),
+            "total_characters": len(prompt),
+            "total_tokens": info["total_tokens"],
+            "chunks": len(info["chunks"]),
+            "tokens_estimated": int(not info["exact"]),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps({"character": self.character, "categories": self.values()},
+                          ensure_ascii=False, indent=2)
@@ -0,0 +1,191 @@
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+_WEIGHT_RE = re.compile(r"^(.*?)\s*:\s*(-?\d+(?:\.\d+)?)\s*$", re.DOTALL)
+_LORA_RE = re.compile(
+    r"<\s*(lora|lyco|hypernet)\s*:\s*([^:>]+?)\s*(?::\s*(-?\d+(?:\.\d+)?)\s*)?(?::[^>]*)?>",
+    re.IGNORECASE,
+)
+_SPACES_RE = re.compile(r"\s+")
+
+_OPENERS = {"(": ")", "[": "]", "<": ">", "{": "}"}
+_CLOSERS = {")", "]", ">", "}"}
+
+EMPHASIS = 1.1
+
+
+class Term(NamedTuple):
+    """Término de un prompt.
+
+    `raw` es el texto tal como se escribió, `text` el término sin énfasis, `key`
+    la forma normalizada usada para deduplicar y `weight` el peso efectivo.
+    `loras` son las claves de los LoRA escritos dentro de un tag (p. ej.
+    "detailed <lora:x:0.7> skin"), que sigue siendo un único término."""
+    raw: str
+    text: str
+    key: str
+    weight: float
+    kind: str  # "tag" | "lora"
+    loras: Tuple[str, ...] = ()
+
+
+def term_key(text: str) -> str:
+    """Clave normalizada de un término."""
+    return _SPACES_RE.sub(" ", text.strip()).lower()
+
+
+def _split_top_level(text: str) -> List[str]:
+    # Divide por comas que no estén dentro de (), [], <> o {}
+    chunks = []
+    stack = []
+    start = 0
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch in _OPENERS:
+            stack.append(_OPENERS[ch])
+        elif ch in _CLOSERS:
+            if stack and stack[-1] == ch:
+                stack.pop()
+        elif ch == "," and not stack:
+            chunks.append(text[start:i])
+            start = i + 1
+        i += 1
+    chunks.append(text[start:])
+    return chunks
+
+
+def _wraps(s: str, opener: str, closer: str) -> bool:
+    # True si el primer carácter abre un grupo que se cierra justo en el último
+    if len(s) < 2 or s[0] != opener or s[-1] != closer or s[-2] == "\\":
+        return False
+    depth = 0
+    i = 0
+    while i < len(s):
+        ch = s[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == opener:
+            depth += 1
+        elif ch == closer:
+            depth -= 1
+            if depth == 0:
+                return i == len(s) - 1
+        i += 1
+    return False
+
+
+def _parse_tag(raw: str) -> Term:
+    body = raw
+    parens = brackets = 0
+    while True:
+        if _wraps(body, "(", ")"):
+            parens += 1
+            body = body[1:-1].strip()
+        elif _wraps(body, "[", "]"):
+            brackets += 1
+            body = body[1:-1].strip()
+        else:
+            break
+    weight = EMPHASIS ** parens
+    if parens:
+        match = _WEIGHT_RE.match(body)
+        if match:
+            body = match.group(1).strip()
+            weight = float(match.group(2)) * EMPHASIS ** (parens - 1)
+    weight /= EMPHASIS ** brackets
+    return Term(raw, body, term_key(body), round(weight, 4), "tag")
+
+
+def _lora_key(match) -> str:
+    return f"lora:{match.group(2).strip().lower()}"
+
+
+def _without_loras(text: str) -> str:
+    return _SPACES_RE.sub(" ", _LORA_RE.sub(" ", text)).strip()
+
+
+def _parse_chunk(chunk: str) -> List[Term]:
+    matches = list(_LORA_RE.finditer(chunk))
+    if not matches:
+        return [_parse_tag(chunk)]
+    match = matches[0]
+    if len(matches) == 1 and match.group(0) == chunk:
+        name = match.group(2).strip()
+        weight = float(match.group(3)) if match.group(3) else 1.0
+        return [Term(chunk, name, _lora_key(match), weight, "lora")]
+    # LoRA junto a otro texto: el término queda tal como se escribió (la clave
+    # también) y los LoRA solo se anotan para deduplicarlos y quitarlos
+    tag = _parse_tag(chunk)
+    return [tag._replace(text=_without_loras(tag.text), loras=tuple(_lora_key(m) for m in matches))]
+
+
+@lru_cache(maxsize=4096)
+def parse_prompt(text: str) -> Tuple[Term, ...]:
+    """Parsea un prompt en términos. El resultado se memoiza por texto."""
+    if not text:
+        return ()
+    terms = []
+    for chunk in _split_top_level(text):
+        chunk = chunk.strip()
+        if chunk:
+            terms.extend(_parse_chunk(chunk))
+    return tuple(terms)
+
+
+def dedupe_terms(terms) -> List[Term]:
+    """Quita términos repetidos manteniendo la primera posición y el mayor peso."""
+    best = {}
+    order = []
+    inline_loras = set()
+    for term in terms:
+        if term.kind == "lora" and term.key in inline_loras:
+            # Ya está escrito dentro de un tag anterior
+            continue
+        inline_loras.update(term.loras)
+        current = best.get(term.key)
+        if current is None:
+            best[term.key] = term
+            order.append(term.key)
+        elif term.weight > current.weight:
+            best[term.key] = term
+    return [best[key] for key in order]
+
+
+def join_terms(terms) -> str:
+    return ", ".join(term.raw for term in terms)
+
+
+@lru_cache(maxsize=256)
+def strip_loras(text: str) -> str:
+    """Prompt sin LoRAs, como proyección del parseo cacheado."""
+    terms = (t._replace(raw=_without_loras(t.raw)) if t.loras else t
+             for t in parse_prompt(text) if t.kind != "lora")
+    return join_terms(t for t in terms if t.raw)
+
+
+@lru_cache(maxsize=256)
+def normalize_prompt(text: str) -> str:
+    """Prompt con separadores normalizados y sin términos vacíos."""
+    return join_terms(parse_prompt(text))
+
+
+def emphasize(tag: str, level: int) -> str:
+    """Texto de `tag` con `level - 1` pares de paréntesis."""
+    extra = max(0, level - 1)
+    return f"{'(' * extra}{tag}{')' * extra}"
+
+
+def set_tag_emphasis(value: str, tag: str, level: int) -> str:
+    """Quita `tag` (con cualquier énfasis) de `value` y, si `level` > 0, lo añade al final."""
+    key = term_key(tag)
+    kept = [t.raw for t in parse_prompt(value) if t.key != key]
+    if level > 0:
+        kept.append(emphasize(tag, level))
+    return ", ".join(kept) + "," if kept else ""
@@ -0,0 +1,197 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from logic.prompt_parser import term_key
+
+# Prioridad al elegir qué término mostrar cuando una categoría coincide por varios campos
+FIELD_PRIORITY = {"name": 0, "value": 1, "tag": 2}
+# Límite de términos recorridos por prefijo; con prefijos muy cortos basta con los primeros
+MAX_PREFIX_TERMS = 500
+# Trigramas más comunes que esto no aportan candidatos a la búsqueda aproximada
+MAX_GRAM_POSTINGS = 1000
+
+
+def _tokens(text: str) -> Set[str]:
+    """Frase completa y cada palabra suelta: 'blue eyes' -> {'blue eyes', 'blue', 'eyes'}."""
+    key = term_key(text).strip("()[]{}<>")
+    if not key:
+        return set()
+    tokens = {key}
+    words = key.replace("_", " ").split()
+    if len(words) > 1:
+        tokens.update(words)
+    return tokens
+
+
+def _trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _within_distance(a: str, b: str, limit: int) -> bool:
+    """Levenshtein(a, b) <= limit, cortando en cuanto se supera."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+class SearchIndex:
+    """Índice invertido término -> categorías sobre nombres, valores y tags.
+
+    Se mantiene de forma incremental: `set_field` solo toca los términos que
+    entran o salen. Los términos se guardan ordenados para buscar por prefijo
+    con bisect, y un índice de trigramas da candidatos para la búsqueda
+    aproximada (errores de tecleo). Ambas estructuras se crean en la primera
+    búsqueda que las necesita y a partir de ahí se actualizan con cada cambio."""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, Dict[str, str]]] = {}  # token -> doc -> field -> texto original
+        self._sorted_terms: Optional[List[str]] = None
+        self._trigrams: Optional[Dict[str, Set[str]]] = None
+        self._fields: Dict[Tuple[str, str], Dict[str, str]] = {}  # (doc, field) -> token -> texto
+        self._names: Dict[str, Tuple[str, str]] = {}  # doc -> (nombre en minúsculas, nombre)
+
+    def __contains__(self, doc: str) -> bool:
+        return doc in self._names
+
+    def set_document(self, doc: str, name: str, values: Iterable[str] = (), tags: Iterable[str] = ()):
+        self.set_field(doc, "name", [name])
+        self.set_field(doc, "value", values)
+        self.set_field(doc, "tag", tags)
+
+    def remove_document(self, doc: str):
+        for field in FIELD_PRIORITY:
+            self.set_field(doc, field, [])
+        self._names.pop(doc, None)
+
+    def set_field(self, doc: str, field: str, texts: Iterable[str]):
+        """Reemplaza los textos de un campo aplicando solo la diferencia."""
+        texts = list(texts)
+        if field == "name":
+            if texts:
+                self._names[doc] = (texts[0].lower(), texts[0])
+            else:
+                self._names.pop(doc, None)
+        new = {}
+        for text in texts:
+            for token in _tokens(text):
+                new.setdefault(token, text.strip())
+        old = self._fields.get((doc, field), {})
+        for token in old.keys() - new.keys():
+            self._remove_posting(token, doc, field)
+        for token, text in new.items():
+            if old.get(token) != text:
+                self._add_posting(token, doc, field, text)
+        if new:
+            self._fields[(doc, field)] = new
+        else:
+            self._fields.pop((doc, field), None)
+
+    def _add_posting(self, token: str, doc: str, field: str, text: str):
+        docs = self._postings.get(token)
+        if docs is None:
+            docs = self._postings[token] = {}
+            if self._sorted_terms is not None:
+                insort(self._sorted_terms, token)
+            if self._trigrams is not None:
+                for gram in _trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+        docs.setdefault(doc, {})[field] = text
+
+    def _remove_posting(self, token: str, doc: str, field: str):
+        docs = self._postings.get(token)
+        if not docs or doc not in docs:
+            return
+        docs[doc].pop(field, None)
+        if not docs[doc]:
+            del docs[doc]
+        if not docs:
+            del self._postings[token]
+            if self._sorted_terms is not None:
+                i = bisect_left(self._sorted_terms, token)
+                if i < len(self._sorted_terms) and self._sorted_terms[i] == token:
+                    del self._sorted_terms[i]
+            if self._trigrams is not None:
+                for gram in _trigrams(token):
+                    grams = self._trigrams.get(gram)
+                    if grams is not None:
+                        grams.discard(token)
+                        if not grams:
+                            del self._trigrams[gram]
+
+    def _collect(self, token: str, results: Dict[str, Tuple[str, str]]):
+        for doc, fields in self._postings[token].items():
+            field = min(fields, key=FIELD_PRIORITY.__getitem__)
+            current = results.get(doc)
+            if current is None or FIELD_PRIORITY[field] < FIELD_PRIORITY[current[0]]:
+                results[doc] = (field, fields[field])
+
+    def _fuzzy_terms(self, query: str) -> List[str]:
+        if self._trigrams is None:
+            self._trigrams = {}
+            for token in self._postings:
+                for gram in _trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+        # Con consultas cortas dos ediciones dejan pasar casi todo el índice
+        limit = 1 if len(query) < 10 else 2
+        grams = _trigrams(query)
+        # Cada edición rompe como mucho 3 trigramas: un término a distancia <= limit
+        # comparte al menos len(grams) - 3*limit y aparece en alguno de los
+        # 3*limit + 1 trigramas menos frecuentes de la consulta.
+        needed = len(grams) - 3 * limit
+        if needed < 2 and limit > 1:
+            limit = 1
+            needed = len(grams) - 3
+        if needed < 2:
+            # Consulta poco específica (p. ej. 'zzzz'): cualquier término pasaría el filtro
+            return []
+        rarest = sorted(grams, key=lambda g: len(self._trigrams.get(g, ())))[:3 * limit + 1]
+        candidates = set()
+        for gram in rarest:
+            tokens = self._trigrams.get(gram, ())
+            if len(tokens) <= MAX_GRAM_POSTINGS:
+                candidates.update(tokens)
+        return [
+            token for token in candidates
+            if abs(len(token) - len(query)) <= limit
+            and len(grams & _trigrams(token)) >= needed
+            and _within_distance(query, token, limit)
+        ]
+
+    def search(self, query: str, fuzzy: bool = True) -> Dict[str, Tuple[str, str]]:
+        """{categoria: (campo, término encontrado)} para `query`.
+
+        Coincide por prefijo de cualquier término o palabra, por subcadena del
+        nombre de la categoría y, si no hay nada, de forma aproximada."""
+        query = term_key(query).strip("()[]{}<>")
+        if not query:
+            return {}
+        results: Dict[str, Tuple[str, str]] = {}
+        for doc, (lowered, name) in self._names.items():
+            if query in lowered:
+                results[doc] = ("name", name)
+
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = self._sorted_terms
+        start = bisect_left(terms, query)
+        for i in range(start, min(start + MAX_PREFIX_TERMS, len(terms))):
+            if not terms[i].startswith(query) or len(results) == len(self._names):
+                break
+            self._collect(terms[i], results)
+
+        if not results and fuzzy and len(query) >= 4:
+            for token in self._fuzzy_terms(query):
+                self._collect(token, results)
+        return results
+
+    def __len__(self):
+        return len(self._postings)
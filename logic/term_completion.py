@@ -0,0 +1,267 @@
+import glob
+import heapq
+import json
+import os
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from logic.category_registry import category_key, get_registry
+from logic.prompt_parser import parse_prompt, term_key
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+CHARACTERS_DIR = os.path.join(DATA_DIR, "characters")
+PRESETS_DIR = os.path.join(DATA_DIR, "presets")
+
+# Sugerencias por consulta
+DEFAULT_LIMIT = 10
+# Con una sola letra el rango abarca una parte enorme del índice y no ayuda a elegir
+MIN_PREFIX_LEN = 2
+# Prefijos de hasta esta longitud guardan su resultado (son los de rangos más grandes)
+CACHED_PREFIX_LEN = 2
+# Como mucho se revisan los archivos de la biblioteca una vez por este intervalo
+REFRESH_INTERVAL = 2.0
+# Peso de un término en los tags de la propia categoría frente a una aparición suelta
+CATEGORY_BONUS = 1000
+
+def split_terms(value: str) -> List[str]:
+    """Términos de un valor o tag ('a, (b:1.2)' -> ['a', 'b'])."""
+    return [t.text for t in parse_prompt(value or "") if t.kind == "tag" and t.text]
+
+
+def current_term(text: str, cursor: int) -> Tuple[int, int, str]:
+    """(inicio, fin, texto) del término separado por comas bajo el cursor."""
+    start = text.rfind(",", 0, cursor) + 1
+    end = text.find(",", cursor)
+    if end < 0:
+        end = len(text)
+    while start < cursor and text[start].isspace():
+        start += 1
+    return start, end, text[start:cursor]
+
+
+class TermCompletionIndex:
+    """Términos conocidos (tags.json, personajes, variaciones y presets) para autocompletar.
+
+    Los términos se guardan en un arreglo ordenado de (prefijo buscable, término):
+    el término completo y cada palabra a partir de la segunda, así 'hair'
+    sugiere 'long hair'. Una consulta es un bisect más recorrer el rango; los
+    rangos grandes (prefijos de 1-2 letras) se resuelven con heapq y se guardan
+    hasta el siguiente cambio. Cada origen (una categoría de tags.json, un
+    archivo JSON) se actualiza aplicando solo la diferencia de sus términos."""
+
+    def __init__(self):
+        self._counts: Counter = Counter()  # término -> apariciones en la biblioteca
+        self._categories: Dict[str, Counter] = {}  # término -> {categoria: apariciones}
+        self._display: Dict[str, str] = {}  # término -> texto tal como se escribió
+        self._sources: Dict[str, Counter] = {}  # origen -> Counter[(término, categoria)]
+        self._entries: Optional[List[Tuple[str, str]]] = None
+        self._cache: Dict[Tuple[str, str, int], List[str]] = {}
+        self._used: Counter = Counter()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, term: str) -> bool:
+        return term_key(term) in self._counts
+
+    # --- actualización ---
+
+    def set_source(self, source: str, pairs: Iterable[Tuple[str, str]]):
+        """Reemplaza los términos de un origen; `pairs` son (texto, categoria)."""
+        new = Counter()
+        display = {}
+        for text, category in pairs:
+            key = term_key(text)
+            if key:
+                new[(key, category)] += 1
+                display.setdefault(key, text.strip())
+        old = self._sources.get(source, Counter())
+        if new == old:
+            return
+        for pair in old.keys() | new.keys():
+            delta = new[pair] - old[pair]
+            if delta:
+                self._adjust(pair[0], pair[1], delta, display.get(pair[0]))
+        if new:
+            self._sources[source] = new
+        else:
+            self._sources.pop(source, None)
+        self._cache.clear()
+
+    def remove_source(self, source: str):
+        self.set_source(source, [])
+
+    def note_used(self, term: str):
+        """Sube en el ranking un término elegido por el usuario en esta sesión."""
+        key = term_key(term)
+        if key in self._counts:
+            self._used[key] += 1
+            self._cache.clear()
+
+    def _adjust(self, key: str, category: str, delta: int, display: Optional[str]):
+        total = self._counts[key] + delta
+        per_category = self._categories.setdefault(key, Counter())
+        per_category[category] += delta
+        if per_category[category] <= 0:
+            del per_category[category]
+        if total > 0:
+            if key not in self._display:
+                self._display[key] = display or key
+                if self._entries is not None:
+                    for variant in self._variants(key):
+                        insort(self._entries, (variant, key))
+            self._counts[key] = total
+            return
+        del self._counts[key]
+        self._categories.pop(key, None)
+        self._display.pop(key, None)
+        self._used.pop(key, None)
+        if self._entries is not None:
+            for variant in self._variants(key):
+                i = bisect_left(self._entries, (variant, key))
+                if i < len(self._entries) and self._entries[i] == (variant, key):
+                    del self._entries[i]
+
+    @staticmethod
+    def _variants(key: str) -> List[str]:
+        words = key.split(" ")
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    # --- consulta ---
+
+    def prepare(self) -> List[Tuple[str, str]]:
+        """Construye el arreglo ordenado si aún no existe (la primera vez cuesta O(n log n))."""
+        if self._entries is None:
+            self._entries = sorted(
+                (variant, key) for key in self._counts for variant in self._variants(key)
+            )
+        return self._entries
+
+    def complete(self, prefix: str, category: str = "", limit: int = DEFAULT_LIMIT) -> List[str]:
+        """Términos que empiezan por `prefix` (o tienen una palabra que empieza
+        así), de más a menos usados; los de la propia categoría van primero."""
+        prefix = term_key(prefix).lstrip("([{<")
+        if len(prefix) < MIN_PREFIX_LEN:
+            return []
+        cache_key = (prefix, category, limit)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        entries = self.prepare()
+        start = bisect_left(entries, (prefix,))
+        end = bisect_left(entries, (prefix + "\uffff",), start)
+        keys = {entry[1] for entry in entries[start:end]}
+        keys.discard(prefix)
+        used, counts, categories = self._used, self._counts, self._categories
+
+        def score(k):
+            # Elegidos en esta sesión > tags de la propia categoría > más frecuentes > más cortos
+            return (used[k], categories[k][category] * CATEGORY_BONUS + counts[k], -len(k))
+
+        best = heapq.nlargest(limit, keys, key=score)
+        result = [self._display[k] for k in best]
+        if len(prefix) <= CACHED_PREFIX_LEN:
+            self._cache[cache_key] = result
+        return result
+
+
+# --- biblioteca en disco ---
+
+def _read_json(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error leyendo {path}: {e}")
+        return None
+
+
+def _category_pairs(categories) -> List[Tuple[str, str]]:
+    pairs = []
+    if isinstance(categories, dict):
+        for name, value in categories.items():
+            if isinstance(value, str):
+                category = category_key(name)
+                pairs.extend((term, category) for term in split_terms(value))
+    return pairs
+
+
+def _file_pairs(path: str) -> List[Tuple[str, str]]:
+    """Términos de un personaje, archivo de variaciones o archivo de presets."""
+    data = _read_json(path)
+    if not isinstance(data, dict):
+        return []
+    pairs = _category_pairs(data.get("categories"))
+    for group in ("variations", "presets"):
+        items = data.get(group)
+        if isinstance(items, dict):
+            for item in items.values():
+                if isinstance(item, dict):
+                    pairs.extend(_category_pairs(item.get("categories")))
+    return pairs
+
+
+def _library_files() -> List[str]:
+    return (glob.glob(os.path.join(CHARACTERS_DIR, "*", "*.json"))
+            + glob.glob(os.path.join(PRESETS_DIR, "*", "*.json")))
+
+
+class TermLibrary:
+    """Mantiene un TermCompletionIndex al día con tags.json y los JSON de data/.
+
+    `refresh()` es barato: los tags se comparan por la versión del registro y
+    los archivos por mtime, así que solo se vuelven a leer los que cambiaron."""
+
+    def __init__(self, index: TermCompletionIndex = None):
+        self.index = index or TermCompletionIndex()
+        self._tags_version = None
+        self._tag_categories = set()
+        self._mtimes: Dict[str, Optional[int]] = {}
+        self._last_refresh = 0.0
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_refresh < REFRESH_INTERVAL:
+            return
+        self._last_refresh = now
+        self.refresh_tags()
+        seen = set()
+        for path in _library_files():
+            seen.add(path)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            if self._mtimes.get(path) != mtime:
+                self._mtimes[path] = mtime
+                self.index.set_source(path, _file_pairs(path))
+        for path in set(self._mtimes) - seen:
+            del self._mtimes[path]
+            self.index.remove_source(path)
+        self.index.prepare()
+
+    def refresh_tags(self):
+        registry = get_registry()
+        if registry.version == self._tags_version:
+            return
+        self._tags_version = registry.version
+        all_tags = registry.all_tags()
+        for category, tags in all_tags.items():
+            pairs = [(term, category) for tag in tags or [] for term in split_terms(tag)]
+            self.index.set_source(f"tags:{category}", pairs)
+        for category in self._tag_categories - all_tags.keys():
+            self.index.remove_source(f"tags:{category}")
+        self._tag_categories = set(all_tags)
+
+
+_library = None
+
+
+def get_term_library() -> TermLibrary:
+    global _library
+    if _library is None:
+        _library = TermLibrary()
+    return _library
@@ -0,0 +1,200 @@
+import os
+import random
+import re
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+WILDCARDS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "wildcards")
+
+_WILDCARD_RE = re.compile(r"__([\w\-/. ]+?)__")
+_COUNT_RE = re.compile(r"^\s*(\d*)\s*(?:-\s*(\d*))?\s*$")
+MAX_DEPTH = 20
+
+# Nodos del plan: ("lit", texto) | ("wild", nombre) | ("choice", min, max, sep, (planes...))
+Plan = Tuple[tuple, ...]
+
+
+def is_dynamic(text: str) -> bool:
+    """True si el texto usa {a|b}, {n$$...} o __wildcard__."""
+    return bool(text) and ("{" in text or "__" in text)
+
+
+def _split_top(text: str, sep: str) -> List[str]:
+    parts = []
+    depth = 0
+    start = 0
+    for i, ch in enumerate(text):
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _literal_nodes(text: str) -> List[tuple]:
+    nodes = []
+    pos = 0
+    for match in _WILDCARD_RE.finditer(text):
+        if match.start() > pos:
+            nodes.append(("lit", text[pos:match.start()]))
+        nodes.append(("wild", match.group(1).strip()))
+        pos = match.end()
+    if pos < len(text):
+        nodes.append(("lit", text[pos:]))
+    return nodes
+
+
+def _choice_node(body: str) -> tuple:
+    lo, hi, sep = 1, 1, ", "
+    pieces = body.split("$$")
+    if len(pieces) >= 2:
+        match = _COUNT_RE.match(pieces[0])
+        if match:
+            lo = int(match.group(1)) if match.group(1) else 1
+            if match.group(2) is not None or "-" in pieces[0]:
+                hi = int(match.group(2)) if match.group(2) else -1  # -1: hasta el total de opciones
+            else:
+                hi = lo
+            if len(pieces) >= 3:
+                sep = pieces[1]
+            body = "$$".join(pieces[2:] if len(pieces) >= 3 else pieces[1:])
+    options = tuple(compile_template(option.strip()) for option in _split_top(body, "|"))
+    return ("choice", lo, hi, sep, options)
+
+
+@lru_cache(maxsize=2048)
+def compile_template(text: str) -> Plan:
+    """Compila un valor con sintaxis dinámica a un plan de expansión (memoizado)."""
+    nodes = []
+    depth = 0
+    start = 0
+    literal_start = 0
+    for i, ch in enumerate(text):
+        if ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                if start > literal_start:
+                    nodes.extend(_literal_nodes(text[literal_start:start]))
+                nodes.append(_choice_node(text[start + 1:i]))
+                literal_start = i + 1
+    if literal_start < len(text):
+        # Llaves sin cerrar se dejan como texto literal
+        nodes.extend(_literal_nodes(text[literal_start:]))
+    return tuple(nodes)
+
+
+class WildcardStore:
+    """Carga perezosa de data/wildcards/<nombre>.txt con caché en memoria.
+
+    El mtime de cada archivo se comprueba como mucho una vez cada
+    `check_interval` segundos; si cambió, se vuelve a leer."""
+
+    def __init__(self, base_dir: str = WILDCARDS_DIR, check_interval: float = 1.0):
+        self.base_dir = base_dir
+        self.check_interval = check_interval
+        self._cache: Dict[str, Tuple[Optional[int], float, Tuple[str, ...]]] = {}
+
+    def _path(self, name: str) -> Optional[str]:
+        name = name.replace("\\", "/").strip("/")
+        if not name or ".." in name.split("/"):
+            return None
+        return os.path.join(self.base_dir, *name.split("/")) + ".txt"
+
+    def get(self, name: str) -> Tuple[str, ...]:
+        entry = self._cache.get(name)
+        now = time.monotonic()
+        if entry is not None and now - entry[1] < self.check_interval:
+            return entry[2]
+        path = self._path(name)
+        try:
+            mtime = os.stat(path).st_mtime_ns if path else None
+        except OSError:
+            mtime = None
+        if entry is not None and entry[0] == mtime:
+            self._cache[name] = (mtime, now, entry[2])
+            return entry[2]
+        lines: Tuple[str, ...] = ()
+        if mtime is not None:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    lines = tuple(
+                        line.strip() for line in f
+                        if line.strip() and not line.lstrip().startswith("#")
+                    )
+            except Exception as e:
+                print(f"Error cargando wildcard {name}: {e}")
+        self._cache[name] = (mtime, now, lines)
+        return lines
+
+    def invalidate(self, name: str = None):
+        if name is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(name, None)
+
+    def list_wildcards(self) -> List[str]:
+        names = []
+        if not os.path.isdir(self.base_dir):
+            return names
+        for root, _, files in os.walk(self.base_dir):
+            for file_name in files:
+                if file_name.endswith(".txt"):
+                    rel = os.path.relpath(os.path.join(root, file_name), self.base_dir)
+                    names.append(rel[:-4].replace(os.sep, "/"))
+        return sorted(names)
+
+
+_default_store = None
+
+
+def get_store() -> WildcardStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = WildcardStore()
+    return _default_store
+
+
+def expand_plan(plan: Plan, rng: random.Random, store: WildcardStore = None, depth: int = 0) -> str:
+    """Expande un plan compilado: cada hueco cuesta solo un sorteo."""
+    store = store or get_store()
+    out = []
+    for node in plan:
+        kind = node[0]
+        if kind == "lit":
+            out.append(node[1])
+        elif kind == "wild":
+            lines = store.get(node[1])
+            if not lines or depth >= MAX_DEPTH:
+                out.append(f"__{node[1]}__")
+            else:
+                out.append(expand_plan(compile_template(rng.choice(lines)), rng, store, depth + 1))
+        else:
+            _, lo, hi, sep, options = node
+            if not options:
+                continue
+            hi = len(options) if hi < 0 else min(hi, len(options))
+            lo = min(lo, hi)
+            count = lo if lo == hi else rng.randint(lo, hi)
+            if count == 1:
+                picked = [rng.choice(options)]
+            else:
+                picked = rng.sample(options, count)
+            out.append(sep.join(expand_plan(p, rng, store, depth + 1) for p in picked))
+    return "".join(out)
+
+
+def expand(text: str, seed=None, rng: random.Random = None, store: WildcardStore = None) -> str:
+    """Expande `text` de forma determinista para una semilla dada."""
+    if not is_dynamic(text):
+        return text
+    rng = rng or random.Random(seed)
+    return expand_plan(compile_template(text), rng, store)
@@ -0,0 +1,38 @@
+import unittest
+
+from logic.clip_tokenizer import analyze_prompt, get_tokenizer, plain_text
+from logic.prompt_parser import parse_prompt
+
+
+class AnalyzeTermsTest(unittest.TestCase):
+    def test_emphasis_is_not_counted(self):
+        plain = analyze_prompt("red eyes, long hair")
+        self.assertEqual(analyze_prompt("((red eyes:1.3)), [long hair]")["total_tokens"], plain["total_tokens"])
+
+    def test_loras_and_their_commas_are_skipped(self):
+        plain = analyze_prompt("1girl, smile")
+        for text in ("<lora:foo:0.8>, 1girl, smile",
+                     "1girl, <lora:foo:0.8>, smile",
+                     "1girl, smile, <lora:foo:0.8>, <lyco:bar>"):
+            self.assertEqual(analyze_prompt(text)["total_tokens"], plain["total_tokens"], text)
+
+    def test_plain_text_unescapes_parentheses(self):
+        term = parse_prompt(r"artist \(style\)")[0]
+        self.assertEqual(plain_text(term), "artist (style)")
+
+    def test_boundaries_point_at_term_indices(self):
+        tag = "red eyes"
+        per_term = get_tokenizer().count(tag) + 1
+        count = 75 // per_term + 2
+        info = analyze_prompt(", ".join(["<lora:foo:1>"] + [tag] * count))
+        self.assertEqual(len(info["chunks"]), 2)
+        # Sin la coma inicial ni la del corte entre chunks
+        self.assertEqual(info["total_tokens"], count * per_term - 2)
+        first_chunk = (75 + 1) // per_term
+        self.assertEqual(info["chunks"][0], first_chunk * per_term - 1)
+        # Índice del primer término del segundo chunk, contando el LoRA del principio
+        self.assertEqual(info["boundaries"], [1 + first_chunk])
+
+
+if __name__ == "__main__":
+    unittest.main()
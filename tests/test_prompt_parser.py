@@ -0,0 +1,23 @@
+import unittest
+
+from logic.prompt_parser import dedupe_terms, join_terms, normalize_prompt, parse_prompt, strip_loras
+
+
+class InlineLoraTest(unittest.TestCase):
+    def test_inline_lora_keeps_the_chunk_as_written(self):
+        text = "detailed <lora:foo:0.7> skin, blue eyes, <lora:a:1> <lora:b>"
+        self.assertEqual(normalize_prompt(text), text)
+        term = parse_prompt(text)[0]
+        self.assertEqual((term.kind, term.text, term.loras), ("tag", "detailed skin", ("lora:foo",)))
+
+    def test_strip_removes_inline_loras(self):
+        self.assertEqual(strip_loras("detailed <lora:foo:0.7> skin, blue eyes, <lora:a:1> <lora:b>, <lora:c>"),
+                         "detailed skin, blue eyes")
+
+    def test_standalone_lora_after_inline_one_is_a_duplicate(self):
+        terms = dedupe_terms(parse_prompt("detailed <lora:foo:0.7> skin, <lora:foo:1>, <lora:c>"))
+        self.assertEqual(join_terms(terms), "detailed <lora:foo:0.7> skin, <lora:c>")
+
+
+if __name__ == "__main__":
+    unittest.main()
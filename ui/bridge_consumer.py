@@ -0,0 +1,232 @@
+import logging
+import secrets
+from collections import OrderedDict
+from PyQt6.QtCore import QObject, QTimer, QFileSystemWatcher, pyqtSignal
+from PyQt6.QtNetwork import QTcpServer, QHostAddress
+from ui.embeddings.bridge import (
+    _bridge_dir,
+    _bridge_path,
+    migrate_legacy_journal,
+    read_updates,
+    rotate_journal,
+    read_rotated,
+    journal_size,
+    rotated_journal_size,
+    ROTATE_SETTLE_SECONDS,
+    load_checkpoint,
+    save_checkpoint,
+    coalesce_updates,
+    mark_receiver_ready,
+    clear_receiver_ready,
+    encode_frame,
+    decode_frames,
+)
+
+logger = logging.getLogger(__name__)
+
+# Cuántos batch_id recientes se recuerdan para descartar lotes repetidos
+SEEN_BATCHES = 512
+
+class BridgeConsumer(QObject):
+    """Consume el journal del bridge de embeddings y emite las actualizaciones agrupadas.
+
+    Usa QFileSystemWatcher para enterarse de los cambios y, si no está disponible,
+    un temporizador de sondeo. Además escucha en un socket TCP local (127.0.0.1,
+    puerto anunciado en el flag de disponibilidad) por el que llegan lotes con
+    prefijo de longitud. Todo se agrupa en una sola emisión de `updates_ready`."""
+
+    updates_ready = pyqtSignal(dict)  # {categoria: {"replace": bool, "items": [...]}}
+
+    def __init__(self, parent=None, poll_interval=1000, settle_ms=40):
+        super().__init__(parent)
+        self.poll_interval = poll_interval
+        self._offset = 0
+        self._rotated_offset = None
+        self._watcher = None
+        self._server = None
+        self._token = secrets.token_hex(16)
+        self._buffers = {}
+        self._pending = []
+        self._seen_batches = OrderedDict()  # batch_id -> "socket" | "journal"
+
+        self._settle_timer = QTimer(self)
+        self._settle_timer.setSingleShot(True)
+        self._settle_timer.setInterval(settle_ms)
+        self._settle_timer.timeout.connect(self.drain)
+
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(poll_interval)
+        self._poll_timer.timeout.connect(self.drain)
+
+        # Los lotes del socket se aplican en la siguiente vuelta del event loop
+        self._socket_timer = QTimer(self)
+        self._socket_timer.setSingleShot(True)
+        self._socket_timer.setInterval(0)
+        self._socket_timer.timeout.connect(self.drain)
+
+        # Mientras haya un journal apartado se vuelve a mirar hasta poder borrarlo
+        self._rotated_timer = QTimer(self)
+        self._rotated_timer.setSingleShot(True)
+        self._rotated_timer.setInterval(int(ROTATE_SETTLE_SECONDS * 1000))
+        self._rotated_timer.timeout.connect(self.drain)
+
+    def start(self):
+        """Carga el checkpoint, procesa lo pendiente y empieza a vigilar el journal."""
+        migrate_legacy_journal()
+        checkpoint = load_checkpoint()
+        if checkpoint is None:
+            # Primera ejecución: no reaplicar el histórico completo
+            checkpoint = (journal_size(), rotated_journal_size())
+            save_checkpoint(*checkpoint)
+        self._offset, self._rotated_offset = checkpoint
+
+        watched = False
+        try:
+            self._watcher = QFileSystemWatcher(self)
+            watched = self._watcher.addPath(str(_bridge_dir()))
+            self._watch_journal()
+            self._watcher.directoryChanged.connect(self._on_fs_change)
+            self._watcher.fileChanged.connect(self._on_fs_change)
+        except Exception as e:
+            logger.warning(f"bridge: QFileSystemWatcher no disponible ({e})")
+            watched = False
+        if not watched:
+            self._poll_timer.start()
+
+        self.drain()
+        port = self._listen()
+        try:
+            mark_receiver_ready(port, self._token)
+        except Exception as e:
+            logger.warning(f"bridge: no se pudo publicar el flag de disponibilidad ({e})")
+
+    def stop(self):
+        clear_receiver_ready()
+        self._settle_timer.stop()
+        self._poll_timer.stop()
+        self._socket_timer.stop()
+        self._rotated_timer.stop()
+        if self._server is not None:
+            self._server.close()
+            for sock in list(self._buffers):
+                sock.abort()
+            self._buffers.clear()
+        if self._watcher is not None:
+            paths = self._watcher.files() + self._watcher.directories()
+            if paths:
+                self._watcher.removePaths(paths)
+
+    def _listen(self):
+        try:
+            self._server = QTcpServer(self)
+            if not self._server.listen(QHostAddress(QHostAddress.SpecialAddress.LocalHost), 0):
+                logger.warning(f"bridge: socket local no disponible ({self._server.errorString()})")
+                self._server = None
+                return None
+            self._server.newConnection.connect(self._on_new_connection)
+            return self._server.serverPort()
+        except Exception as e:
+            logger.warning(f"bridge: socket local no disponible ({e})")
+            self._server = None
+            return None
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            sock = self._server.nextPendingConnection()
+            self._buffers[sock] = bytearray()
+            sock.readyRead.connect(lambda s=sock: self._on_socket_read(s))
+            sock.disconnected.connect(lambda s=sock: self._drop_socket(s))
+
+    def _drop_socket(self, sock):
+        self._buffers.pop(sock, None)
+        sock.deleteLater()
+
+    def _on_socket_read(self, sock):
+        buffer = self._buffers.get(sock)
+        if buffer is None:
+            return
+        buffer.extend(bytes(sock.readAll()))
+        try:
+            messages = decode_frames(buffer)
+        except Exception as e:
+            logger.warning(f"bridge: mensaje inválido en socket ({e})")
+            sock.abort()
+            return
+        for message in messages:
+            ok = isinstance(message, dict) and message.get("token") == self._token
+            if ok:
+                updates = message.get("updates") or []
+                self._pending.extend(u for u in updates if isinstance(u, dict))
+                if not self._socket_timer.isActive():
+                    self._socket_timer.start()
+            sock.write(encode_frame({"ok": ok}))
+            sock.flush()
+
+    def _watch_journal(self):
+        # El journal puede crearse o reemplazarse después; se vuelve a registrar
+        if self._watcher is None:
+            return
+        path = str(_bridge_path())
+        if path not in self._watcher.files() and _bridge_path().exists():
+            self._watcher.addPath(path)
+
+    def _on_fs_change(self, _path):
+        self._watch_journal()
+        if not self._settle_timer.isActive():
+            self._settle_timer.start()
+
+    def _drop_seen(self, records, source):
+        """Quita los registros de lotes que ya llegaron por la otra vía.
+
+        Si la confirmación del socket no le llega al emisor, este vuelve a
+        escribir el mismo lote en el journal. Un lote del journal puede leerse
+        en dos partes, por eso solo se descarta lo que vino por la otra vía."""
+        kept = []
+        for rec in records:
+            batch_id = rec.get("batch_id")
+            if batch_id:
+                seen = self._seen_batches.get(batch_id)
+                if seen is not None and seen != source:
+                    continue
+                self._seen_batches[batch_id] = source
+                self._seen_batches.move_to_end(batch_id)
+                while len(self._seen_batches) > SEEN_BATCHES:
+                    self._seen_batches.popitem(last=False)
+            kept.append(rec)
+        return kept
+
+    def drain(self):
+        """Junta lo recibido por socket y lo nuevo del journal, y emite un único lote."""
+        records = []
+        rotated_offset = self._rotated_offset
+        if rotated_offset is not None:
+            # Lo que un emisor alcanzó a escribir en el journal ya apartado
+            try:
+                records, rotated_offset = read_rotated(rotated_offset)
+            except Exception as e:
+                logger.error(f"bridge: error leyendo journal rotado: {e}")
+        try:
+            new_records, offset = read_updates(self._offset)
+        except Exception as e:
+            logger.error(f"bridge: error leyendo journal: {e}")
+            new_records, offset = [], self._offset
+        records = self._drop_seen(records + new_records, "journal")
+        if offset != self._offset or rotated_offset != self._rotated_offset:
+            self._offset = offset
+            self._rotated_offset = rotated_offset
+            save_checkpoint(offset, rotated_offset)
+        # Todo leído: el journal se rota para que no crezca sin límite
+        if self._rotated_offset is None and rotate_journal(self._offset):
+            self._rotated_offset = self._offset
+            self._offset = 0
+        if self._rotated_offset is not None and not self._rotated_timer.isActive():
+            self._rotated_timer.start()
+        if self._pending:
+            records = records + self._drop_seen(self._pending, "socket")
+            self._pending = []
+        if not records:
+            return
+        merged = coalesce_updates(records)
+        if merged:
+            logger.info(f"bridge: {len(records)} registros -> {len(merged)} categorías")
+            self.updates_ready.emit(merged)
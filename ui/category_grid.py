@@ -1,14 +1,15 @@
 import os
 import json
 import re
+from contextlib import contextmanager
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, 
     QLineEdit, QScrollArea, QPushButton, QToolButton, QInputDialog, QMessageBox,
     QDialog, QLabel, QTextEdit, QMenu
 )
-from PyQt6.QtCore import Qt, pyqtSignal, QSize
-from PyQt6.QtGui import QFont, QIcon, QPixmap, QColor,QAction
-from .components import CategoryCard, AddCategoryCard
+from PyQt6.QtCore import Qt, pyqtSignal, QSize, QFileSystemWatcher, QTimer, QEvent
+from PyQt6.QtGui import QFont, QIcon, QPixmap, QColor,QAction, QKeySequence, QShortcut
+from .components import CategoryCard, AddCategoryCard, CardPlaceholder
 from .utils.category_utils import (
     load_categories_and_tags, 
     normalize_category,
@@ -18,13 +19,20 @@ from .utils.category_utils import (
     DEFAULT_CARD_COLOR,
     save_categories_order,
     load_category_colors,
-    rename_category_color_key
+    rename_category_color_key,
+    category_id_for
 )
+from logic.category_registry import get_registry, category_key
+from logic.grid_history import GridHistory, DEFAULT_MAX_BYTES
+from logic.prompt_parser import parse_prompt
+from logic.search_index import SearchIndex
 from .save_manager import SaveManager
+from .change_scheduler import ChangeScheduler
+from .components.negative_prompt_store import NegativePromptStore
 
 class CategoryGridFrame(QWidget):
     prompt_updated = pyqtSignal(str)
-    category_value_changed = pyqtSignal(str, str, str)  # (category_name, old_value, new_value)
+    category_values_changed = pyqtSignal(dict)  # {category_name: (old_value, new_value)}
     character_saved = pyqtSignal(str)  # Nueva señal: (character_name)
     
     def __init__(self, prompt_generator, main_window=None):
@@ -34,11 +42,45 @@ class CategoryGridFrame(QWidget):
         self.cards = []
         self.previous_values = {}
         self.previous_values_snapshot = {}
+        self._bulk_depth = 0
+        self._bulk_cards = {}
+        self._card_index = None
+        self._reorder_mode = False
+        self._restoring = False
+        self.search_index = None
+        self._search_tags_version = None
+        self.history = GridHistory(self._history_budget())
 
         self.save_manager = SaveManager(self, self)
+        self.change_scheduler = ChangeScheduler(self._flush_changes, self)
+        self._materialize_timer = QTimer(self)
+        self._materialize_timer.setSingleShot(True)
+        self._materialize_timer.setInterval(0)
+        self._materialize_timer.timeout.connect(self.materialize_visible_cards)
         
         self.setup_ui()
         self.create_cards()
+        self.setup_registry_watcher()
+
+    def _history_budget(self):
+        """Bytes para deshacer/rehacer ("undo_max_bytes" en settings.json)"""
+        try:
+            return int(NegativePromptStore().get_setting("undo_max_bytes", DEFAULT_MAX_BYTES))
+        except Exception:
+            return DEFAULT_MAX_BYTES
+
+    def setup_registry_watcher(self):
+        """Invalida el registro de categorías si sus archivos cambian por fuera de la app"""
+        registry = get_registry()
+        paths = [p for p in registry.watched_paths() if os.path.exists(p)]
+        self.registry_watcher = QFileSystemWatcher(paths, self)
+        self.registry_watcher.fileChanged.connect(self._on_registry_file_changed)
+
+    def _on_registry_file_changed(self, path):
+        # Las escrituras atómicas (tmp + rename) quitan el archivo del watcher
+        if os.path.exists(path) and path not in self.registry_watcher.files():
+            self.registry_watcher.addPath(path)
+        get_registry().reload_if_changed()
 
     def setup_ui(self):
         """Configura la interfaz del grid"""
@@ -72,6 +114,38 @@ class CategoryGridFrame(QWidget):
         self.clear_btn.customContextMenuRequested.connect(self.show_clear_menu)
         search_layout.addWidget(self.clear_btn)
         search_layout.addSpacing(10)
+
+        history_btn_style = """
+            QToolButton { background-color:#404040; color:#fff; border-radius:6px; padding:2px; }
+            QToolButton:hover { background-color:#6366f1; }
+            QToolButton:disabled { color:#777; }
+            """
+        self.undo_btn = QToolButton()
+        self.undo_btn.setText("↶")
+        self.undo_btn.setToolTip("Deshacer (Ctrl+Z)")
+        self.undo_btn.setFixedSize(28, 28)
+        self.undo_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.undo_btn.setStyleSheet(history_btn_style)
+        self.undo_btn.clicked.connect(self.undo)
+        search_layout.addWidget(self.undo_btn)
+
+        self.redo_btn = QToolButton()
+        self.redo_btn.setText("↷")
+        self.redo_btn.setToolTip("Rehacer (Ctrl+Y)")
+        self.redo_btn.setFixedSize(28, 28)
+        self.redo_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.redo_btn.setStyleSheet(history_btn_style)
+        self.redo_btn.clicked.connect(self.redo)
+        search_layout.addWidget(self.redo_btn)
+        search_layout.addSpacing(10)
+
+        # Con el foco en un input, Ctrl+Z lo gestiona el propio QLineEdit
+        for sequence, slot in ((QKeySequence.StandardKey.Undo, self.undo),
+                               (QKeySequence.StandardKey.Redo, self.redo)):
+            shortcut = QShortcut(QKeySequence(sequence), self)
+            shortcut.setContext(Qt.ShortcutContext.WidgetWithChildrenShortcut)
+            shortcut.activated.connect(slot)
+        self.update_history_buttons()
         
         self.reorder_btn = QToolButton()
         self.reorder_btn.setText("↕️")
@@ -143,6 +217,9 @@ class CategoryGridFrame(QWidget):
         
         self.scroll_area.setWidget(self.grid_widget)
         self.main_layout.addWidget(self.scroll_area)
+
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self._schedule_materialize)
+        self.scroll_area.viewport().installEventFilter(self)
         
     def setup_styles(self):
         """Configura los estilos del grid"""
@@ -195,30 +272,28 @@ class CategoryGridFrame(QWidget):
         return "#252525"
 
     def create_cards(self):
-        """Crea las tarjetas de categorías"""
+        """Crea las tarjetas de categorías.
+
+        Al principio solo hay marcadores (CardPlaceholder) con el valor de cada
+        categoría; la CategoryCard real se construye cuando entra en la vista."""
         categories = load_categories_and_tags()
         colors_map = load_category_colors()
         
         row, col = 0, 0
         self.cards = []
+        self._card_index = None
+        self.search_index = None
         for category in categories:
             snake = category["name"].lower().replace(" ", "_")
             manual_color = colors_map.get(snake)
             group_color = manual_color or self.get_category_group_color(category["name"]) 
             
-            card = CategoryCard(
-                category["name"], 
-                category["icon"], 
-                category["tags"], 
-                self.prompt_generator,
-                bg_color=group_color
+            card = CardPlaceholder(
+                category["name"],
+                category["tags"],
+                bg_color=group_color,
+                value=self.previous_values.get(category["name"], "")
             )
-            card.request_rename.connect(self.handle_category_rename)
-            card.value_changed.connect(self.update_prompt)
-            if hasattr(card, 'request_move_up'):
-                card.request_move_up.connect(lambda name=category["name"]: self.move_card(name, -1))
-            if hasattr(card, 'request_move_down'):
-                card.request_move_down.connect(lambda name=category["name"]: self.move_card(name, 1))
             
             self.cards.append(card)
             self.grid_layout.addWidget(card, row, col)
@@ -230,25 +305,125 @@ class CategoryGridFrame(QWidget):
         
         self.add_card = AddCategoryCard(self.add_custom_category)
         self.grid_layout.addWidget(self.add_card, row, col)
+        self._schedule_materialize()
+
+    def _build_card(self, placeholder):
+        """Construye la CategoryCard real a partir de su marcador"""
+        name = placeholder.category_name
+        card = CategoryCard(
+            name,
+            None,
+            placeholder.tags,
+            self.prompt_generator,
+            bg_color=placeholder.bg_color
+        )
+        card.input_field.blockSignals(True)
+        card.input_field.setText(placeholder.input_field.text())
+        card.input_field.blockSignals(False)
+        card.request_rename.connect(self.handle_category_rename)
+        card.value_changed.connect(lambda c=card: self.change_scheduler.mark_dirty(c))
+        card.request_move_up.connect(lambda name=name: self.move_card(name, -1))
+        card.request_move_down.connect(lambda name=name: self.move_card(name, 1))
+        if self._reorder_mode:
+            card.set_reorder_mode(True)
+        if placeholder.search_match is not None:
+            card.set_search_match(placeholder.search_match)
+        return card
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Type.Resize, QEvent.Type.Show):
+            self._schedule_materialize()
+        return super().eventFilter(obj, event)
+
+    def _schedule_materialize(self, *args):
+        self._materialize_timer.start()
+
+    def materialize_visible_cards(self):
+        """Cambia por tarjetas reales los marcadores que están (o casi) en la vista"""
+        if not self.grid_widget.isVisible():
+            return
+        self.grid_layout.activate()
+        viewport_height = self.scroll_area.viewport().height()
+        top = self.scroll_area.verticalScrollBar().value() - viewport_height // 2
+        bottom = top + viewport_height * 2
+        
+        built = 0
+        for i, card in enumerate(self.cards):
+            if not isinstance(card, CardPlaceholder) or card.isHidden():
+                continue
+            geometry = card.geometry()
+            if geometry.bottom() < top or geometry.top() > bottom:
+                continue
+            real_card = self._build_card(card)
+            self.grid_layout.replaceWidget(card, real_card)
+            card.setParent(None)
+            card.deleteLater()
+            self.cards[i] = real_card
+            built += 1
+        
+        if built:
+            self._card_index = None
+            # Las tarjetas reales pueden medir distinto: revisar otra vez con el nuevo layout
+            self._schedule_materialize()
 
     def filter_cards(self, text):
-        """Filtra las tarjetas según el texto de búsqueda"""
-        text = text.lower()
+        """Filtra las tarjetas por nombre, valor o tags y resalta el término encontrado"""
+        matches = self.search_cards(text) if text.strip() else None
         for card in self.cards:
             if hasattr(card, 'category_name'):
-                visible = text in card.category_name.lower()
-                card.setVisible(visible)
+                match = None if matches is None else matches.get(category_key(card.category_name))
+                card.setVisible(matches is None or match is not None)
+                if match is not None or card.search_match is not None:
+                    card.set_search_match(match)
+        self._schedule_materialize()
+
+    def search_cards(self, text):
+        """{clave de categoría: (campo, término)} para el texto buscado"""
+        index = self._ensure_search_index()
+        registry = get_registry()
+        if self._search_tags_version != registry.version:
+            # Los tags cambiaron (editor de tags o archivo externo): solo se aplica la diferencia
+            for card in self.cards:
+                if hasattr(card, 'category_name'):
+                    tags = registry.tags(category_id_for(card.category_name))
+                    index.set_field(category_key(card.category_name), "tag",
+                                    [term for tag in tags for term in self._value_terms(tag)])
+            self._search_tags_version = registry.version
+        return index.search(text)
+
+    def _ensure_search_index(self):
+        if self.search_index is None:
+            self.search_index = SearchIndex()
+            self._search_tags_version = None
+            for card in self.cards:
+                if hasattr(card, 'category_name') and hasattr(card, 'input_field'):
+                    self.search_index.set_document(
+                        category_key(card.category_name),
+                        card.category_name,
+                        values=self._value_terms(card.input_field.text())
+                    )
+        return self.search_index
+
+    @staticmethod
+    def _value_terms(value):
+        # Un tag puede ser una lista "a, b, c": se indexa cada término por separado
+        return [term.text for term in parse_prompt(value)]
     
+    def card_for(self, category_name):
+        """Tarjeta de una categoría dada por id, nombre visible o alias (O(1))"""
+        if self._card_index is None:
+            self._card_index = {
+                category_key(card.category_name): card
+                for card in self.cards
+                if hasattr(card, 'category_name') and hasattr(card, 'input_field')
+            }
+        return self._card_index.get(category_key(category_name))
+
     def clear_all_values(self):
         """Limpia los valores de todas las tarjetas de categorías."""
-        for card in self.cards:
-            # Respetar bloqueo de tarjeta
-            if hasattr(card, 'is_locked') and card.is_locked:
-                continue
-            if hasattr(card, 'clear_value'):
-                card.clear_value()
-        # Actualizar prompt y señales tras limpiar
-        self.update_prompt()
+        with self.bulk_update():
+            for card in self.cards:
+                self.write_card_value(card, "")
 
     def show_clear_menu(self, position):
         """Muestra el menú contextual para limpiar por grupos de color (dinámico)."""
@@ -315,30 +490,21 @@ class CategoryGridFrame(QWidget):
 
     def clear_categories_by_color(self, target_color_hex):
         """Limpia tarjetas que coincidan con el color especificado."""
-        cleaned_any = False
         target = str(target_color_hex).lower()
         
-        for card in self.cards:
-            if hasattr(card, 'is_locked') and card.is_locked:
-                continue
-            
-            if hasattr(card, 'bg_color'):
-                c = card.bg_color
-                if isinstance(c, QColor):
-                    c = c.name()
-                
-                if c:
-                    c = str(c).lower()
-                    if c == target:
-                        if hasattr(card, 'clear_value'):
-                            card.clear_value()
-                            cleaned_any = True
-        
-        if cleaned_any:
-            self.update_prompt()
+        with self.bulk_update():
+            for card in self.cards:
+                if hasattr(card, 'bg_color'):
+                    c = card.bg_color
+                    if isinstance(c, QColor):
+                        c = c.name()
+                    
+                    if c and str(c).lower() == target:
+                        self.write_card_value(card, "")
 
     def toggle_reorder_mode(self, enabled: bool):
         """Activa o desactiva el modo reordenar mostrando controles en cada tarjeta."""
+        self._reorder_mode = enabled
         for card in self.cards:
             if hasattr(card, 'set_reorder_mode'):
                 card.set_reorder_mode(enabled)
@@ -363,7 +529,8 @@ class CategoryGridFrame(QWidget):
         
         try:
             snake_order = [c.category_name.lower().replace(" ", "_") for c in self.cards]
-            save_categories_order(snake_order)
+            if save_categories_order(snake_order):
+                self.update_prompt()
         except Exception:
             pass
 
@@ -388,32 +555,118 @@ class CategoryGridFrame(QWidget):
         
         if hasattr(self, 'add_card') and self.add_card is not None:
             self.grid_layout.addWidget(self.add_card, row, col)
+        self._schedule_materialize()
 
     def update_prompt(self):
-        """Actualiza el prompt cuando cambian los valores de las tarjetas"""
-        with open("c:\\Users\\LENOVO\\Desktop\\AppPrompts\\data\\categories.json", "r", encoding="utf-8") as f:
-            original_categories = json.load(f)["categorias"]
-        
-        category_reverse_mapping = {}
-        for orig_cat in original_categories:
-            formatted_cat = orig_cat.replace("_", " ").capitalize()
-            category_reverse_mapping[formatted_cat] = orig_cat
-        
-        current_values = self.get_current_values()
-        
-        for category_name, current_value in current_values.items():
+        """Sincroniza todas las tarjetas con el generador y emite el prompt"""
+        self.change_scheduler.discard()
+        self._apply_card_changes(self.cards)
+        self.prompt_updated.emit(self.prompt_generator.generate_prompt())
+
+    def _flush_changes(self, dirty_cards, mergeable=True):
+        """Aplica solo las tarjetas marcadas desde el último flush"""
+        cards = [c for c in dirty_cards if c in self.cards]
+        if self._apply_card_changes(cards, mergeable):
+            self.prompt_updated.emit(self.prompt_generator.generate_prompt())
+
+    def _apply_card_changes(self, cards, mergeable=False):
+        changes = {}
+        for card in cards:
+            if not (hasattr(card, 'category_name') and hasattr(card, 'input_field')):
+                continue
+            category_name = card.category_name
+            current_value = card.input_field.text()
             previous_value = self.previous_values.get(category_name, "")
-            if previous_value != current_value:
-                self.category_value_changed.emit(category_name, previous_value, current_value)
-                
-                snake_case_name = category_reverse_mapping.get(category_name, category_name.lower().replace(" ", "_"))
-                if self.prompt_generator:
-                    self.prompt_generator.update_category(snake_case_name, current_value)
-        
-        self.previous_values = current_values.copy()
-        
-        prompt = self.prompt_generator.generate_prompt()
-        self.prompt_updated.emit(prompt)
+            if previous_value == current_value:
+                continue
+            changes[category_name] = (previous_value, current_value)
+            if self.search_index is not None:
+                self.search_index.set_field(category_key(category_name), "value",
+                                            self._value_terms(current_value))
+            if self.prompt_generator:
+                self.prompt_generator.update_category(category_id_for(category_name), current_value)
+            self.previous_values[category_name] = current_value
+        if changes:
+            if not self._restoring:
+                # Lo tecleado se funde por categoría; cada operación en bloque es un paso
+                self.history.record(changes, mergeable)
+                self.update_history_buttons()
+            self.category_values_changed.emit(changes)
+        return len(changes)
+
+    def undo(self):
+        """Deshace el último paso (una operación en bloque o una ráfaga de tecleo)"""
+        self.change_scheduler.flush()
+        return self._restore(self.history.undo())
+
+    def redo(self):
+        self.change_scheduler.flush()
+        return self._restore(self.history.redo())
+
+    def _restore(self, values):
+        if values is None:
+            return False
+        self._restoring = True
+        try:
+            self.write_card_values(values)
+        finally:
+            self._restoring = False
+        self.update_history_buttons()
+        return True
+
+    def update_history_buttons(self):
+        self.undo_btn.setEnabled(self.history.can_undo())
+        self.redo_btn.setEnabled(self.history.can_redo())
+
+    @contextmanager
+    def bulk_update(self):
+        """Transacción para escribir muchas tarjetas a la vez.
+
+        Dentro del bloque se usa `write_card_value`; al salir del bloque más
+        externo se aplica un único diff (una sola emisión de
+        `category_values_changed`) y el prompt se regenera una vez."""
+        self._bulk_depth += 1
+        try:
+            yield self
+        finally:
+            self._bulk_depth -= 1
+            if self._bulk_depth == 0:
+                # También entra lo que el usuario haya tecleado y siga pendiente
+                pending = dict.fromkeys(self.change_scheduler.take())
+                pending.update(self._bulk_cards)
+                self._bulk_cards.clear()
+                if pending:
+                    self._flush_changes(list(pending), mergeable=False)
+
+    def write_card_values(self, values):
+        """Escribe {categoria: valor} en una sola transacción; las claves pueden venir
+        como id, nombre visible o alias. Retorna el número de tarjetas escritas."""
+        written = {}
+        with self.bulk_update():
+            for category, value in values.items():
+                card = self.card_for(category)
+                if card is not None and self.write_card_value(card, value):
+                    written[card] = None
+        return len(written)
+
+    def write_card_value(self, card, value):
+        """Escribe un valor sin disparar las señales de la tarjeta.
+        Retorna False si la tarjeta no tiene input o está bloqueada."""
+        if not hasattr(card, 'input_field'):
+            return False
+        if hasattr(card, 'is_locked') and card.is_locked:
+            return False
+        if card.input_field.text() != value:
+            card.input_field.blockSignals(True)
+            card.input_field.setText(value)
+            card.input_field.blockSignals(False)
+            if not value and hasattr(card, 'tag_click_counts'):
+                card.tag_click_counts = {tag: 0 for tag in card.tags}
+        if self._bulk_depth:
+            self._bulk_cards[card] = None
+        else:
+            self._flush_changes([card], mergeable=False)
+        return True
     
     def get_current_values(self):
         """Obtiene los valores actuales de todas las categorías"""
@@ -430,6 +683,8 @@ class CategoryGridFrame(QWidget):
 
     def handle_category_rename(self, old_name, new_name):
         """Maneja el renombrado de categorías"""
+        self._card_index = None
+        self.search_index = None
         try:
             rename_category_in_files(old_name, new_name)
             try:
@@ -461,6 +716,8 @@ class CategoryGridFrame(QWidget):
         for card in self.cards:
             card.setParent(None)
         self.cards.clear()
+        self._card_index = None
+        self.search_index = None
         
         while self.grid_layout.count():
             item = self.grid_layout.takeAt(0)
@@ -549,18 +806,7 @@ class CategoryGridFrame(QWidget):
         if not data:
             return
             
-        loaded_count = 0
-        for card in self.cards:
-            if hasattr(card, 'category_name') and hasattr(card, 'input_field'):
-                if hasattr(card, 'is_locked') and card.is_locked:
-                    continue
-                    
-                category_name = card.category_name.lower().replace(' ', '_')
-                if category_name in data:
-                    card.input_field.setText(data[category_name])
-                    loaded_count += 1
-        
-        self.update_prompt()
+        loaded_count = self.write_card_values(data)
         
         if loaded_count > 0:
             QMessageBox.information(
@@ -574,18 +820,8 @@ class CategoryGridFrame(QWidget):
         if not character_data:
             return
             
-        loaded_count = 0
-        for card in self.cards:
-            if hasattr(card, 'category_name') and hasattr(card, 'input_field'):
-                if hasattr(card, 'is_locked') and card.is_locked:
-                    continue
-                category_name = card.category_name.lower().replace(' ', '_')
-                
-                if category_name in character_data:
-                    card.input_field.setText(character_data[category_name])
-                    loaded_count += 1
+        loaded_count = self.write_card_values(character_data)
 
-        self.update_prompt()
         if loaded_count > 0:
             QMessageBox.information(
                 self, 
@@ -602,19 +838,7 @@ class CategoryGridFrame(QWidget):
         if not categories_data:
             return
         
-        loaded_count = 0
-        for card in self.cards:
-            if hasattr(card, 'category_name') and hasattr(card, 'input_field'):
-                if hasattr(card, 'is_locked') and card.is_locked:
-                    continue
-
-                category_name = card.category_name
-                
-                if category_name in categories_data:
-                    card.input_field.setText(categories_data[category_name])
-                    loaded_count += 1
-        
-        self.update_prompt()
+        loaded_count = self.write_card_values(categories_data)
 
         if loaded_count > 0:
             variation_name = variation_data.get('name', 'Variación')
@@ -640,33 +864,7 @@ class CategoryGridFrame(QWidget):
             QMessageBox.information(self, "Preset vacío", "El preset no contiene categorías.")
             return
         
-        applied_count = 0
-        
-        for i, card in enumerate(self.cards):
-            if hasattr(card, 'category_name') and hasattr(card, 'input_field'):
-                if hasattr(card, 'is_locked') and card.is_locked:
-                    continue
-                    
-                card_name = card.category_name
-                
-                if card_name in preset_categories:
-                    preset_value = preset_categories[card_name]
-                    card.input_field.setText(preset_value)
-                    applied_count += 1
-                else:
-                    card_normalized = card_name.lower().replace(" ", "_")
-                    
-                    found_match = False
-                    for preset_key, preset_value in preset_categories.items():
-                        preset_normalized = preset_key.lower().replace(" ", "_")
-                        
-                        if card_normalized == preset_normalized:
-                            card.input_field.setText(preset_value)
-                            applied_count += 1
-                            found_match = True
-                            break
-        
-        self.update_prompt()
+        applied_count = self.write_card_values(preset_categories)
         
         if applied_count > 0:
             QMessageBox.information(
@@ -688,21 +886,41 @@ class CategoryGridFrame(QWidget):
         Establece el valor de una categoría específica.
         Retorna True si tuvo éxito, False si la categoría no existe o está bloqueada.
         """
-        category_normalized = category_name.lower().replace(" ", "_")
-        
-        for card in self.cards:
-            if hasattr(card, 'category_name') and hasattr(card, 'input_field'):
-                card_cat_normalized = card.category_name.lower().replace(" ", "_")
-                
-                if card_cat_normalized == category_normalized:
-                    if hasattr(card, 'is_locked') and card.is_locked:
-                        return False
-                    
-                    card.input_field.setText(value)
-                    self.update_prompt()
-                    return True
-        
-        return False
+        card = self.card_for(category_name)
+        if card is None:
+            return False
+        return self.write_card_value(card, value)
+
+    def apply_bridge_updates(self, updates):
+        """
+        Aplica un lote de actualizaciones del bridge ({categoria: {"replace", "items"}}).
+        Se aplican en una sola transacción (`bulk_update`). Retorna el número de
+        categorías aplicadas.
+        """
+        if not updates:
+            return 0
+
+        applied = 0
+        with self.bulk_update():
+            for category, update in updates.items():
+                card = self.card_for(category)
+                if card is None or (hasattr(card, 'is_locked') and card.is_locked):
+                    continue
+
+                items = update.get("items", [])
+                if update.get("replace"):
+                    terms = list(items)
+                else:
+                    terms = [t.strip() for t in card.input_field.text().split(",") if t.strip()]
+                    for item in items:
+                        if item not in terms:
+                            terms.append(item)
+                value = ", ".join(terms) + "," if terms else ""
+
+                if value != card.input_field.text():
+                    self.write_card_value(card, value)
+                    applied += 1
+        return applied
 
 class ImportDataDialog(QDialog):
     def __init__(self, parent=None):
@@ -0,0 +1,48 @@
+from PyQt6.QtCore import QObject, QTimer
+
+# Pausa sin cambios tras la que se aplican (una ráfaga de tecleo o de señales cuenta como un cambio)
+DEBOUNCE_MS = 80
+
+
+class ChangeScheduler(QObject):
+    """Agrupa los cambios de todas las tarjetas y los aplica una sola vez.
+
+    Las tarjetas solo marcan su clave como sucia; cuando pasan `interval_ms`
+    sin marcas nuevas se llama a `flush_callback` con todas las claves
+    pendientes, en el orden en que se marcaron por primera vez."""
+
+    def __init__(self, flush_callback, parent=None, interval_ms=DEBOUNCE_MS):
+        super().__init__(parent)
+        self._flush_callback = flush_callback
+        self._dirty = {}
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+
+    def mark_dirty(self, key):
+        self._dirty[key] = None
+        # Debounce: cada marca reinicia la espera
+        self._timer.start()
+
+    def has_pending(self):
+        return bool(self._dirty)
+
+    def discard(self):
+        """Olvida lo pendiente (p. ej. porque se acaba de hacer una pasada completa)."""
+        self._dirty.clear()
+        self._timer.stop()
+
+    def take(self):
+        """Devuelve y vacía lo pendiente sin llamar a `flush_callback`."""
+        dirty = list(self._dirty)
+        self.discard()
+        return dirty
+
+    def flush(self):
+        self._timer.stop()
+        if not self._dirty:
+            return
+        dirty = list(self._dirty)
+        self._dirty.clear()
+        self._flush_callback(dirty)
@@ -1,4 +1,5 @@
 from .category_card import CategoryCard, TagButton
 from .add_category_card import AddCategoryCard
+from .card_placeholder import CardPlaceholder
 
-__all__ = ['CategoryCard', 'TagButton', 'AddCategoryCard']
\ No newline at end of file
+__all__ = ['CategoryCard', 'TagButton', 'AddCategoryCard', 'CardPlaceholder']
\ No newline at end of file
@@ -0,0 +1,75 @@
+from PyQt6.QtWidgets import QFrame, QSizePolicy
+from PyQt6.QtCore import Qt, QRectF
+from PyQt6.QtGui import QColor, QFont, QPainter, QPen
+
+from .category_card import DEFAULT_CARD_COLOR, SEARCH_FIELD_LABELS
+
+# Alto aproximado de una tarjeta real, para que el scroll no salte al construirla
+PLACEHOLDER_HEIGHT = 150
+
+
+class PendingValue:
+    """Valor de una tarjeta aún no construida.
+
+    Imita lo que el grid usa de QLineEdit (text/setText/blockSignals) sin ser
+    un widget."""
+
+    __slots__ = ("_text",)
+
+    def __init__(self, text=""):
+        self._text = text
+
+    def text(self):
+        return self._text
+
+    def setText(self, text):
+        self._text = text
+
+    def blockSignals(self, block):
+        return False
+
+
+class CardPlaceholder(QFrame):
+    """Marcador ligero que ocupa el sitio de una CategoryCard fuera de la vista.
+
+    Solo pinta el fondo y el nombre; el grid lo cambia por la tarjeta real
+    cuando entra en el área visible."""
+
+    def __init__(self, name, tags=None, bg_color=DEFAULT_CARD_COLOR, value=""):
+        super().__init__()
+        self.category_name = name
+        self.tags = tags or []
+        self.bg_color = bg_color
+        self.is_locked = False
+        self.input_field = PendingValue(value)
+        self.tag_click_counts = {}
+        self.search_match = None
+        self.setMinimumSize(300, PLACEHOLDER_HEIGHT)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+
+    def set_search_match(self, match):
+        self.search_match = match
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        bg = QColor(self.bg_color) if isinstance(self.bg_color, str) else QColor(DEFAULT_CARD_COLOR)
+        painter.setBrush(bg)
+        if self.search_match is not None:
+            painter.setPen(QPen(QColor("#6366f1"), 2))
+        else:
+            painter.setPen(QPen(QColor("#404040"), 1))
+        painter.drawRoundedRect(QRectF(self.rect()).adjusted(1, 1, -1, -1), 8, 8)
+        painter.setPen(QColor("#e0e0e0"))
+        painter.setFont(QFont("Segoe UI", 12, QFont.Weight.Bold))
+        painter.drawText(self.rect().adjusted(12, 12, -12, -12),
+                         Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                         self.category_name)
+        if self.search_match is not None and self.search_match[0] != "name":
+            field, term = self.search_match
+            painter.setPen(QColor("#a5b4fc"))
+            painter.setFont(QFont("Segoe UI", 9))
+            painter.drawText(self.rect().adjusted(12, 36, -12, -12),
+                             Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                             f"🔍 {SEARCH_FIELD_LABELS.get(field, field)}: {term}")
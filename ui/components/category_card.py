@@ -1,17 +1,22 @@
 import os
-import json
-import re
 import math
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QLineEdit, QFrame, QPushButton, QToolButton, QSizePolicy, QMenu, QWidgetAction, QApplication, QStyle, QColorDialog, QGridLayout)
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QPoint
 from PyQt6.QtGui import QFont, QPixmap, QIcon, QColor
-from ..utils.category_utils import save_category_color
+from ..utils.category_utils import save_category_color, category_id_for
+from logic.category_registry import get_registry
+from logic.prompt_parser import set_tag_emphasis
+from ..tag_image_index import get_tag_image_index
+from .term_completer import TermCompleter
+from ..thumbnail_service import get_thumbnail_service
 
 ICON_COLORS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "assets", "icons", "colors.png")
 DEFAULT_CARD_COLOR = "#252525"
 ICON_EDIT = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "assets", "icons", "edit.png")
 ICON_SAVE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "assets", "icons", "save.png")
+SEARCH_FIELD_LABELS = {"name": "nombre", "value": "valor", "tag": "tag"}
+TAG_PREVIEW_SIZE = 200
 
 class TagButton(QPushButton):
     def __init__(self, tag, parent_card):
@@ -40,6 +45,321 @@ class TagButton(QPushButton):
         elif event.button() == Qt.MouseButton.RightButton:
             self.parent_card.modify_tag_importance(self.tag, increase=False)
 
+GEAR_STYLE_BASE = (
+    "QToolButton {"
+    " background-color: #404040;"
+    " color: #fff;"
+    " border-radius: 10px;"
+    " padding: 0px 8px;"
+    " font-size: 12px;"
+    "}"
+    " QToolButton:hover {"
+    " background-color: #00A36C;"
+    " color: #ffffff;"
+    "}"
+)
+GEAR_STYLE_ACTIVE = (
+    "QToolButton {"
+    " background-color: #008a57;"
+    " color: #ffffff;"
+    " border-radius: 10px;"
+    " padding: 0px 8px;"
+    " font-size: 12px;"
+    "}"
+    " QToolButton:hover {"
+    " background-color: #008a57;"
+    " color: #ffffff;"
+    "}"
+)
+ALL_TAGS_STYLE = """
+    QToolButton {
+        background-color: #6366f1;
+        color: #fff;
+        border-radius: 10px;
+        padding: 2px 10px;
+        font-size: 10px;
+    }
+    QToolButton:hover {
+        background-color: #4f46e5;
+    }
+    """
+ALL_TAGS_STYLE_EMPTY = """
+    QToolButton {
+        background-color: #4f4f4f;
+        color: #bbbbbb;
+        border-radius: 10px;
+        padding: 2px 10px;
+        font-size: 10px;
+    }
+    """
+
+
+def _build_tags_tooltip(tags, max_items=3, max_chars=80):
+    if not tags:
+        return "Sin tags"
+    display = ", ".join(tags[:max_items])
+    if len(tags) > max_items:
+        display += ", …"
+    if len(display) > max_chars:
+        display = display[:max_chars].rstrip(", ") + "…"
+    return display
+
+
+class TagMenuItem(QWidget):
+    """Fila del menú "All tags". Las filas se reutilizan entre páginas (`set_tag`)."""
+
+    LABEL_WIDTH = 130
+    STYLE_BASE = (
+        "QWidget { background-color: transparent; } "
+        "QLabel { color: #e0e0e0; font-size: 11px; }"
+    )
+    STYLE_HOVER = (
+        "QWidget { background-color: #00A36C; border-radius: 6px; } "
+        "QLabel { color: #ffffff; font-size: 11px; }"
+    )
+    STYLE_PRESSED = (
+        "QWidget { background-color: #008a57; border-radius: 6px; } "
+        "QLabel { color: #ffffff; font-size: 11px; }"
+    )
+
+    def __init__(self, parent_card):
+        super().__init__()
+        self.tag_text = None
+        self.parent_card = parent_card
+        row = QHBoxLayout(self)
+        row.setContentsMargins(8, 4, 8, 4)
+        row.setSpacing(8)
+        self.label = QLabel()
+        self.label.setStyleSheet("color: #e0e0e0; font-size: 11px;")
+        self.label.setFixedWidth(self.LABEL_WIDTH)
+        row.addWidget(self.label)
+        row.addStretch()
+        # Marca de los tags con imagen de referencia
+        self.image_mark = QLabel("🖼")
+        self.image_mark.setToolTip("Tiene imagen de referencia (pasa el ratón para verla)")
+        self.image_mark.hide()
+        row.addWidget(self.image_mark)
+        self.setStyleSheet(self.STYLE_BASE)
+        self._preview = None
+        self._hovered = False
+
+    def set_tag(self, tag_text):
+        if tag_text == self.tag_text:
+            return
+        self.tag_text = tag_text
+        metrics = self.label.fontMetrics()
+        self.label.setText(metrics.elidedText(tag_text, Qt.TextElideMode.ElideRight, self.LABEL_WIDTH - 10))
+        self.label.setToolTip(tag_text)
+        self.setStyleSheet(self.STYLE_BASE)
+        self._hide_preview()
+        self.refresh_image()
+
+    def refresh_image(self):
+        """Vuelve a mirar la imagen del tag (p. ej. tras renombrarla o quitarla)."""
+        path = self.parent_card.get_tag_image_path(self.tag_text) if self.tag_text else None
+        self.image_mark.setVisible(path is not None)
+        if self._hovered:
+            self._hide_preview()
+            self._request_preview(path)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.setStyleSheet(self.STYLE_PRESSED)
+            self.parent_card.modify_tag_importance(self.tag_text, increase=True)
+            QTimer.singleShot(120, lambda: self.setStyleSheet(self.STYLE_HOVER))
+        elif event.button() == Qt.MouseButton.RightButton:
+            self.setStyleSheet(self.STYLE_PRESSED)
+            self.parent_card.modify_tag_importance(self.tag_text, increase=False)
+            QTimer.singleShot(120, lambda: self.setStyleSheet(self.STYLE_HOVER))
+        self._hide_preview()
+        event.accept()
+
+    def enterEvent(self, event):
+        self.setStyleSheet(self.STYLE_HOVER)
+        self._hovered = True
+        self._request_preview(self.parent_card.get_tag_image_path(self.tag_text))
+        super().enterEvent(event)
+
+    def _request_preview(self, path):
+        if path:
+            tag = self.tag_text
+            pix = get_thumbnail_service().request(
+                path, TAG_PREVIEW_SIZE, lambda pix: self._on_preview_ready(tag, pix))
+            if pix is not None:
+                self._show_preview(pix)
+
+    def leaveEvent(self, event):
+        self.setStyleSheet(self.STYLE_BASE)
+        self._hovered = False
+        self._hide_preview()
+        super().leaveEvent(event)
+
+    def _on_preview_ready(self, tag, pixmap):
+        # Solo si el ratón sigue sobre la misma fila (las filas se reutilizan entre páginas)
+        if self._hovered and tag == self.tag_text and not pixmap.isNull():
+            self._show_preview(pixmap)
+
+    def _show_preview(self, pixmap):
+        if self._preview is None:
+            self._preview = QWidget(None, Qt.WindowType.ToolTip)
+            self._preview.setStyleSheet("background-color:#1a1a1a; border:1px solid #404040; border-radius:6px;")
+            lay = QVBoxLayout(self._preview)
+            lay.setContentsMargins(6, 6, 6, 6)
+            lay.setSpacing(4)
+            img_label = QLabel()
+            img_label.setObjectName("img_label")
+            img_label.setScaledContents(True)
+            lay.addWidget(img_label)
+        img_label = self._preview.findChild(QLabel, "img_label")
+        img_label.setPixmap(pixmap)
+        img_label.adjustSize()
+        self._preview.adjustSize()
+        pos_right = self.mapToGlobal(self.rect().topRight()) + QPoint(10, 0)
+        screen = self._preview.screen() or (QApplication.primaryScreen() if hasattr(QApplication, 'primaryScreen') else None)
+        avail = screen.availableGeometry() if screen else None
+        w = self._preview.width()
+        h = self._preview.height()
+        final_pos = pos_right
+        if avail and (pos_right.x() + w > avail.right() - 8):
+            pos_left = self.mapToGlobal(self.rect().topLeft()) - QPoint(w + 10, 0)
+            final_pos = pos_left
+            if final_pos.x() < avail.left() + 8:
+                final_pos.setX(avail.left() + 8)
+        if avail:
+            y = final_pos.y()
+            if y + h > avail.bottom() - 8:
+                y = max(avail.top() + 8, avail.bottom() - h - 8)
+            final_pos.setY(y)
+        self._preview.move(final_pos)
+        self._preview.show()
+
+    def _hide_preview(self):
+        if self._preview is not None:
+            self._preview.hide()
+
+
+class TagMenu(QMenu):
+    """Menú paginado de tags de una tarjeta.
+
+    El contenido se construye la primera vez que se abre; cada página reutiliza
+    el mismo conjunto de TagMenuItem (como mucho uno por hueco de página). Una
+    vez construido escucha el índice de imágenes de tags para actualizar las
+    filas cuando una imagen se asigna, se renombra o se quita."""
+
+    ROWS_PER_COL = 20
+    COLS_PER_PAGE = 2
+    ITEMS_PER_PAGE = ROWS_PER_COL * COLS_PER_PAGE
+
+    def __init__(self, parent_card, parent=None):
+        super().__init__(parent)
+        self.parent_card = parent_card
+        self.tags = []
+        self.page_index = 0
+        self._items = []
+        self._built = False
+        self.setStyleSheet(
+            """
+            QMenu {
+                background-color: #2b2b2b;
+                border: 1px solid #404040;
+                padding: 4px;
+            }
+            QMenu::item {
+                padding: 6px 10px;
+                color: #e0e0e0;
+                background-color: transparent;
+            }
+            QMenu::item:selected {
+                background-color: transparent;
+            }
+            """
+        )
+        self.setMinimumWidth(200)
+        self.aboutToShow.connect(self._ensure_built)
+
+    def total_pages(self):
+        return max(1, math.ceil(len(self.tags) / self.ITEMS_PER_PAGE))
+
+    def set_tags(self, tags):
+        self.tags = list(tags)
+        if self._built:
+            self.page_index = min(self.page_index, self.total_pages() - 1)
+            self.render_page()
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        grid_container = QWidget()
+        container_layout = QVBoxLayout(grid_container)
+        container_layout.setContentsMargins(6, 6, 6, 6)
+        container_layout.setSpacing(6)
+
+        self._grid_layout = QGridLayout()
+        self._grid_layout.setContentsMargins(0, 0, 0, 0)
+        self._grid_layout.setHorizontalSpacing(4)
+        self._grid_layout.setVerticalSpacing(4)
+        container_layout.addLayout(self._grid_layout)
+
+        nav_layout = QHBoxLayout()
+        nav_layout.setContentsMargins(0, 0, 0, 0)
+        nav_layout.setSpacing(8)
+        self._prev_btn = QToolButton()
+        self._prev_btn.setText("◄")
+        self._prev_btn.setToolTip("Anterior")
+        self._next_btn = QToolButton()
+        self._next_btn.setText("►")
+        self._next_btn.setToolTip("Siguiente")
+        self._page_indicator = QLabel("")
+        self._page_indicator.setStyleSheet("color:#bdbdbd; font-size:10px;")
+        nav_layout.addWidget(self._prev_btn)
+        nav_layout.addStretch(1)
+        nav_layout.addWidget(self._page_indicator)
+        nav_layout.addStretch(1)
+        nav_layout.addWidget(self._next_btn)
+        container_layout.addLayout(nav_layout)
+
+        self._prev_btn.clicked.connect(lambda: self.go_to_page(self.page_index - 1))
+        self._next_btn.clicked.connect(lambda: self.go_to_page(self.page_index + 1))
+
+        grid_action = QWidgetAction(self)
+        grid_action.setDefaultWidget(grid_container)
+        self.addAction(grid_action)
+        self._built = True
+        get_tag_image_index().changed.connect(self._on_tag_images_changed)
+        self.render_page()
+
+    def _on_tag_images_changed(self, category_key):
+        if category_key != self.parent_card._category_key():
+            return
+        # Las filas de la página actual, aunque el menú esté cerrado
+        for item in self._items:
+            if not item.isHidden():
+                item.refresh_image()
+
+    def go_to_page(self, page_index):
+        if 0 <= page_index < self.total_pages() and page_index != self.page_index:
+            self.page_index = page_index
+            self.render_page()
+
+    def render_page(self):
+        start = self.page_index * self.ITEMS_PER_PAGE
+        page_tags = self.tags[start:start + self.ITEMS_PER_PAGE]
+        while len(self._items) < len(page_tags):
+            i = len(self._items)
+            item = TagMenuItem(self.parent_card)
+            self._grid_layout.addWidget(item, i % self.ROWS_PER_COL, i // self.ROWS_PER_COL)
+            self._items.append(item)
+        for item, tag in zip(self._items, page_tags):
+            item.set_tag(tag)
+            item.show()
+        for item in self._items[len(page_tags):]:
+            item.hide()
+        total_pages = self.total_pages()
+        self._page_indicator.setText(f"Página {self.page_index + 1} / {total_pages}")
+        self._prev_btn.setEnabled(self.page_index > 0)
+        self._next_btn.setEnabled(self.page_index < total_pages - 1)
+
+
 class CategoryCard(QFrame):
     request_rename = pyqtSignal(str, str)
     value_changed = pyqtSignal()
@@ -56,11 +376,9 @@ class CategoryCard(QFrame):
         self.unsaved_changes = False
         self.is_locked = False
         self.tags = tags or []
+        self.search_match = None
         self.setup_ui(name, tags)
         self.setup_styles()
-        self.setup_debounce()
-        self._tag_image_index = None
-        self._tag_pixmap_cache = {}
 
     def setup_ui(self, name, tags):
         self.setMinimumSize(300, 100)
@@ -122,10 +440,16 @@ class CategoryCard(QFrame):
         title_layout.addWidget(self.move_down_btn)
     
         layout.addLayout(title_layout)
+
+        self.search_match_label = QLabel()
+        self.search_match_label.setStyleSheet("color: #a5b4fc; font-size: 10px;")
+        self.search_match_label.hide()
+        layout.addWidget(self.search_match_label)
         
         self.input_field = QLineEdit()
         self.input_field.setPlaceholderText("Añadir valor...")
         self.input_field.textChanged.connect(self.on_input_change)
+        self.term_completer = TermCompleter(self.input_field, lambda: category_id_for(self.category_name))
         layout.addWidget(self.input_field)
         
         self.tags = tags or []
@@ -205,468 +529,102 @@ class CategoryCard(QFrame):
                 """)
 
     def update_tags_ui(self, tags=None):
-        layout = self.layout()
-        
-        for i in reversed(range(layout.count())):
-            item = layout.itemAt(i)
-            if isinstance(item, QHBoxLayout) and i > 1:
-                tags_layout = item
-                while tags_layout.count():
-                    widget_item = tags_layout.takeAt(0)
-                    if widget_item.widget():
-                        widget_item.widget().setParent(None)
-                layout.removeItem(tags_layout)
-                break
-        
+        """Actualiza la fila de tags.
+
+        La fila (engranaje, color, candado y "All tags") se construye una sola vez;
+        al editar tags solo se aplican las diferencias: contadores, tooltip y la
+        lista del menú, cuyo contenido se crea al abrirlo."""
+        if tags is not None:
+            self.tags = list(tags)
+        if not hasattr(self, "tags_menu"):
+            self._build_tags_row()
+
+        previous_counts = self.tag_click_counts
+        self.tag_click_counts = {tag: previous_counts.get(tag, 0) for tag in self.tags}
+
+        has_tags = bool(self.tags)
+        self.all_tags_btn.setToolTip(_build_tags_tooltip(self.tags))
+        if has_tags != self._row_has_tags:
+            self._row_has_tags = has_tags
+            self.all_tags_btn.setEnabled(has_tags)
+            self.all_tags_btn.setStyleSheet(ALL_TAGS_STYLE if has_tags else ALL_TAGS_STYLE_EMPTY)
+            if has_tags:
+                self.color_btn.setFixedSize(24, 22)
+            else:
+                self.color_btn.setFixedSize(32, 30)
+            self.color_btn.setIconSize(self.color_btn.size())
+        self.tags_menu.set_tags(self.tags)
+
+    def _build_tags_row(self):
         tags_layout = QHBoxLayout()
         tags_layout.setContentsMargins(0, 0, 0, 0)
         tags_layout.setSpacing(6)
-        
-        if tags is not None:
-            self.tags = tags
-            
-        self.tag_click_counts = {}
-        if self.tags:
-            for tag in self.tags:
-                self.tag_click_counts[tag] = 0
 
-            all_tags_btn = QToolButton()
-            all_tags_btn.setText("All tags")
-            all_tags_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            
-            def _build_tags_tooltip(tags, max_items=3, max_chars=80):
-                if not tags:
-                    return "Sin tags"
-                display = ", ".join(tags[:max_items])
-                if len(tags) > max_items:
-                    display += ", …"
-                if len(display) > max_chars:
-                    display = display[:max_chars].rstrip(", ") + "…"
-                return display
-            all_tags_btn.setToolTip(_build_tags_tooltip(self.tags))
-            all_tags_btn.setStyleSheet(
-                """
-                QToolButton {
-                    background-color: #6366f1;
-                    color: #fff;
-                    border-radius: 10px;
-                    padding: 2px 10px;
-                    font-size: 10px;
-                }
-                QToolButton:hover {
-                    background-color: #4f46e5;
-                }
-                """
-            )
-
-            menu = QMenu(all_tags_btn)
-            menu.setStyleSheet(
-                """
-                QMenu {
-                    background-color: #2b2b2b;
-                    border: 1px solid #404040;
-                    padding: 4px;
-                }
-                QMenu::item {
-                    padding: 6px 10px;
-                    color: #e0e0e0;
-                    background-color: transparent;
-                }
-                QMenu::item:selected {
-                    background-color: transparent;
-                }
-                """
-            )
-            menu.setMinimumWidth(200)
-
-            class TagMenuItem(QWidget):
-                def __init__(self, tag_text, parent_card):
-                    super().__init__()
-                    self.tag_text = tag_text
-                    self.parent_card = parent_card
-                    row = QHBoxLayout(self)
-                    row.setContentsMargins(8, 4, 8, 4)
-                    row.setSpacing(8)
-                    label = QLabel(tag_text)
-                    label.setStyleSheet("color: #e0e0e0; font-size: 11px;")
-                    max_width = 130
-                    label.setFixedWidth(max_width)
-                    metrics = label.fontMetrics()
-                    elided = metrics.elidedText(tag_text, Qt.TextElideMode.ElideRight, max_width - 10)
-                    label.setText(elided)
-                    label.setToolTip(tag_text)
-                    row.addWidget(label)
-                    row.addStretch()
-                    self._style_base = (
-                        "QWidget { background-color: transparent; } "
-                        "QLabel { color: #e0e0e0; font-size: 11px; }"
-                    )
-                    self._style_hover = (
-                        "QWidget { background-color: #00A36C; border-radius: 6px; } "
-                        "QLabel { color: #ffffff; font-size: 11px; }"
-                    )
-                    self._style_pressed = (
-                        "QWidget { background-color: #008a57; border-radius: 6px; } "
-                        "QLabel { color: #ffffff; font-size: 11px; }"
-                    )
-                    self.setStyleSheet(self._style_base)
-                    self._preview = None
-
-                def mousePressEvent(self, event):
-                    if event.button() == Qt.MouseButton.LeftButton:
-                        self.setStyleSheet(self._style_pressed)
-                        self.parent_card.modify_tag_importance(self.tag_text, increase=True)
-                        from PyQt6.QtCore import QTimer
-                        QTimer.singleShot(120, lambda: self.setStyleSheet(self._style_hover))
-                    elif event.button() == Qt.MouseButton.RightButton:
-                        self.setStyleSheet(self._style_pressed)
-                        self.parent_card.modify_tag_importance(self.tag_text, increase=False)
-                        from PyQt6.QtCore import QTimer
-                        QTimer.singleShot(120, lambda: self.setStyleSheet(self._style_hover))
-                    self._hide_preview()
-                    event.accept()
-
-                def enterEvent(self, event):
-                    self.setStyleSheet(self._style_hover)
-                    pix = self.parent_card.get_tag_pixmap(self.tag_text)
-                    if pix is not None:
-                        self._show_preview(pix)
-                    super().enterEvent(event)
-
-                def leaveEvent(self, event):
-                    self.setStyleSheet(self._style_base)
-                    self._hide_preview()
-                    super().leaveEvent(event)
-
-                def _show_preview(self, pixmap):
-                    from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel
-                    if self._preview is None:
-                        self._preview = QWidget(None, Qt.WindowType.ToolTip)
-                        self._preview.setStyleSheet("background-color:#1a1a1a; border:1px solid #404040; border-radius:6px;")
-                        lay = QVBoxLayout(self._preview)
-                        lay.setContentsMargins(6, 6, 6, 6)
-                        lay.setSpacing(4)
-                        img_label = QLabel()
-                        img_label.setObjectName("img_label")
-                        img_label.setScaledContents(True)
-                        lay.addWidget(img_label)
-                    img_label = self._preview.findChild(QLabel, "img_label")
-                    max_side = 200
-                    if pixmap.width() > max_side or pixmap.height() > max_side:
-                        scaled = pixmap.scaled(max_side, max_side, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                    else:
-                        scaled = pixmap
-                    img_label.setPixmap(scaled)
-                    img_label.adjustSize()
-                    self._preview.adjustSize()
-                    pos_right = self.mapToGlobal(self.rect().topRight()) + QPoint(10, 0)
-                    screen = self._preview.screen() or (QApplication.primaryScreen() if hasattr(QApplication, 'primaryScreen') else None)
-                    avail = screen.availableGeometry() if screen else None
-                    w = self._preview.width()
-                    h = self._preview.height()
-                    final_pos = pos_right
-                    if avail and (pos_right.x() + w > avail.right() - 8):
-                        pos_left = self.mapToGlobal(self.rect().topLeft()) - QPoint(w + 10, 0)
-                        final_pos = pos_left
-                        if final_pos.x() < avail.left() + 8:
-                            final_pos.setX(avail.left() + 8)
-                    if avail:
-                        y = final_pos.y()
-                        if y + h > avail.bottom() - 8:
-                            y = max(avail.top() + 8, avail.bottom() - h - 8)
-                        final_pos.setY(y)
-                    self._preview.move(final_pos)
-                    self._preview.show()
-
-                def _hide_preview(self):
-                    if self._preview is not None:
-                        self._preview.hide()
-
-            grid_container = QWidget()
-            container_layout = QVBoxLayout(grid_container)
-            container_layout.setContentsMargins(6, 6, 6, 6)
-            container_layout.setSpacing(6)
-
-            grid_layout = QGridLayout()
-            grid_layout.setContentsMargins(0, 0, 0, 0)
-            grid_layout.setHorizontalSpacing(4)
-            grid_layout.setVerticalSpacing(4)
-            container_layout.addLayout(grid_layout)
-
-            nav_layout = QHBoxLayout()
-            nav_layout.setContentsMargins(0, 0, 0, 0)
-            nav_layout.setSpacing(8)
-            prev_btn = QToolButton()
-            prev_btn.setText("◄")
-            prev_btn.setToolTip("Anterior")
-            next_btn = QToolButton()
-            next_btn.setText("►")
-            next_btn.setToolTip("Siguiente")
-            page_indicator = QLabel("")
-            page_indicator.setStyleSheet("color:#bdbdbd; font-size:10px;")
-            nav_layout.addWidget(prev_btn)
-            nav_layout.addStretch(1)
-            nav_layout.addWidget(page_indicator)
-            nav_layout.addStretch(1)
-            nav_layout.addWidget(next_btn)
-            container_layout.addLayout(nav_layout)
-
-            rows_per_col = 20
-            cols_per_page = 2
-            items_per_page = rows_per_col * cols_per_page
-            total_items = len(self.tags)
-            total_pages = max(1, math.ceil(total_items / items_per_page))
-            page_index = 0
-
-            def render_page():
-                while grid_layout.count():
-                    item = grid_layout.takeAt(0)
-                    if item and item.widget():
-                        item.widget().setParent(None)
-                start = page_index * items_per_page
-                end = min(total_items, start + items_per_page)
-                for i, idx in enumerate(range(start, end)):
-                    tag = self.tags[idx]
-                    row = i % rows_per_col
-                    col = i // rows_per_col
-                    widget = TagMenuItem(tag, self)
-                    grid_layout.addWidget(widget, row, col)
-                page_indicator.setText(f"Página {page_index + 1} / {total_pages}")
-                prev_btn.setEnabled(page_index > 0)
-                next_btn.setEnabled(page_index < total_pages - 1)
-
-            def go_prev():
-                nonlocal page_index
-                if page_index > 0:
-                    page_index -= 1
-                    render_page()
-
-            def go_next():
-                nonlocal page_index
-                if page_index < total_pages - 1:
-                    page_index += 1
-                    render_page()
-
-            prev_btn.clicked.connect(go_prev)
-            next_btn.clicked.connect(go_next)
-            render_page()
-
-            grid_action = QWidgetAction(menu)
-            grid_action.setDefaultWidget(grid_container)
-            menu.addAction(grid_action)
-
-            all_tags_btn.setMenu(menu)
-            all_tags_btn.setPopupMode(QToolButton.ToolButtonPopupMode.InstantPopup)
-
-            gear_btn = QToolButton()
-            gear_btn.setText("⚙️")
-            gear_btn.setToolTip("Editar tags")
-            gear_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            gear_btn.setFixedHeight(22)
-            self._gear_style_base = (
-                "QToolButton {"
-                " background-color: #404040;"
-                " color: #fff;"
-                " border-radius: 10px;"
-                " padding: 0px 8px;"
-                " font-size: 12px;"
-                "}"
-                " QToolButton:hover {"
-                " background-color: #00A36C;"
-                " color: #ffffff;"
-                "}"
-            )
-            self._gear_style_active = (
-                "QToolButton {"
-                " background-color: #008a57;"
-                " color: #ffffff;"
-                " border-radius: 10px;"
-                " padding: 0px 8px;"
-                " font-size: 12px;"
-                "}"
-                " QToolButton:hover {"
-                " background-color: #008a57;"
-                " color: #ffffff;"
-                "}"
-            )
-            gear_btn.setStyleSheet(self._gear_style_base)
-            self.gear_btn = gear_btn
-            gear_btn.clicked.connect(self.show_tags_dialog)
-            
-            color_btn = QToolButton()
-            color_btn.setToolTip("Asignar color")
-            color_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            color_btn.setFixedSize(24, 22)
-            try:
-                color_btn.setIcon(QIcon(ICON_COLORS))
-                color_btn.setIconSize(color_btn.size())
-            except Exception:
-                color_btn.setText("🎨")
-            color_btn.clicked.connect(self.choose_color)
-            self.color_btn = color_btn
-            self.update_color_button_style()
-            
-            tags_layout.addWidget(gear_btn)
-            tags_layout.addWidget(color_btn)
-            tags_layout.addStretch()
-            
-            self.lock_btn = QToolButton()
-            self.lock_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            self.lock_btn.setFixedSize(28, 22)
-            self.lock_btn.clicked.connect(self.toggle_lock)
-            self.update_lock_style()
-            tags_layout.addWidget(self.lock_btn)
-
-            tags_layout.addWidget(all_tags_btn)
-
-        else:
-            gear_btn = QToolButton()
-            gear_btn.setText("⚙️")
-            gear_btn.setToolTip("Editar tags")
-            gear_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            gear_btn.setFixedHeight(22)
-            self._gear_style_base = (
-                "QToolButton {"
-                " background-color: #404040;"
-                " color: #fff;"
-                " border-radius: 10px;"
-                " padding: 0px 8px;"
-                " font-size: 12px;"
-                "}"
-                " QToolButton:hover {"
-                " background-color: #00A36C;"
-                " color: #ffffff;"
-                "}"
-            )
-            gear_btn.setStyleSheet(self._gear_style_base)
-            self.gear_btn = gear_btn
-            gear_btn.clicked.connect(self.show_tags_dialog)
-            
-            color_btn = QToolButton()
-            color_btn.setToolTip("Asignar color")
-            color_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            color_btn.setFixedSize(32, 30)
-            try:
-                color_btn.setIcon(QIcon(ICON_COLORS))
-                color_btn.setIconSize(color_btn.size())
-            except Exception:
-                color_btn.setText("🎨")
-            color_btn.clicked.connect(self.choose_color)
-            self.color_btn = color_btn
-            self.update_color_button_style()
-            
-            tags_layout.addWidget(gear_btn)
-            tags_layout.addWidget(color_btn)
-            tags_layout.addStretch()
-
-            all_tags_btn = QToolButton()
-            all_tags_btn.setText("All tags")
-            all_tags_btn.setToolTip("Sin tags")
-            all_tags_btn.setEnabled(False)
-            all_tags_btn.setStyleSheet(
-                """
-                QToolButton {
-                    background-color: #4f4f4f;
-                    color: #bbbbbb;
-                    border-radius: 10px;
-                    padding: 2px 10px;
-                    font-size: 10px;
-                }
-                """
-            )
-            
-            self.lock_btn = QToolButton()
-            self.lock_btn.setCursor(Qt.CursorShape.PointingHandCursor)
-            self.lock_btn.setFixedSize(28, 22)
-            self.lock_btn.clicked.connect(self.toggle_lock)
-            self.update_lock_style()
-            tags_layout.addWidget(self.lock_btn)
+        gear_btn = QToolButton()
+        gear_btn.setText("⚙️")
+        gear_btn.setToolTip("Editar tags")
+        gear_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        gear_btn.setFixedHeight(22)
+        self._gear_style_base = GEAR_STYLE_BASE
+        self._gear_style_active = GEAR_STYLE_ACTIVE
+        gear_btn.setStyleSheet(self._gear_style_base)
+        self.gear_btn = gear_btn
+        gear_btn.clicked.connect(self.show_tags_dialog)
+
+        color_btn = QToolButton()
+        color_btn.setToolTip("Asignar color")
+        color_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        color_btn.setFixedSize(24, 22)
+        try:
+            color_btn.setIcon(QIcon(ICON_COLORS))
+            color_btn.setIconSize(color_btn.size())
+        except Exception:
+            color_btn.setText("🎨")
+        color_btn.clicked.connect(self.choose_color)
+        self.color_btn = color_btn
+        self.update_color_button_style()
 
-            tags_layout.addWidget(all_tags_btn)
+        tags_layout.addWidget(gear_btn)
+        tags_layout.addWidget(color_btn)
+        tags_layout.addStretch()
 
+        self.lock_btn = QToolButton()
+        self.lock_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.lock_btn.setFixedSize(28, 22)
+        self.lock_btn.clicked.connect(self.toggle_lock)
+        self.update_lock_style()
+        tags_layout.addWidget(self.lock_btn)
 
-        layout.addLayout(tags_layout)
+        self.all_tags_btn = QToolButton()
+        self.all_tags_btn.setText("All tags")
+        self.all_tags_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.all_tags_btn.setStyleSheet(ALL_TAGS_STYLE)
+        self.tags_menu = TagMenu(self, self.all_tags_btn)
+        self.all_tags_btn.setMenu(self.tags_menu)
+        self.all_tags_btn.setPopupMode(QToolButton.ToolButtonPopupMode.InstantPopup)
+        self._row_has_tags = True
+        tags_layout.addWidget(self.all_tags_btn)
 
-    def _project_root(self):
-        return os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-
-    def _load_tag_image_index(self):
-        if self._tag_image_index is not None:
-            return self._tag_image_index
-        index_path = os.path.join(self._project_root(), "data", "tag_images", "tag_images_index.json")
-        legacy_path = os.path.join(self._project_root(), "data", "tag_images", "index.json")
-        try:
-            if os.path.isfile(index_path):
-                with open(index_path, "r", encoding="utf-8") as f:
-                    self._tag_image_index = json.load(f)
-            elif os.path.isfile(legacy_path):
-                with open(legacy_path, "r", encoding="utf-8") as f:
-                    self._tag_image_index = json.load(f)
-            else:
-                self._tag_image_index = {}
-        except Exception:
-            self._tag_image_index = {}
-        return self._tag_image_index
+        self.tags_layout = tags_layout
+        self.layout().addLayout(tags_layout)
 
     def _category_key(self):
         return self.category_name.lower().replace(" ", "_")
 
-    def _normalize_tag(self, tag):
-        return re.sub(r"[^a-z0-9_\-]", "", tag.lower().replace(" ", "_"))
-
-    def get_tag_pixmap(self, tag):
-        key = f"{self._category_key()}/{self._normalize_tag(tag)}"
-        if key in self._tag_pixmap_cache:
-            return self._tag_pixmap_cache[key]
-        idx = self._load_tag_image_index()
-        rel = idx.get(key)
-        if not rel:
-            try:
-                cat_dir = os.path.join(self._project_root(), "data", "tag_images", self._category_key())
-                if os.path.isdir(cat_dir):
-                    base = self._normalize_tag(tag)
-                    candidates = [f"{base}.png", f"{base}.jpg", f"{base}.jpeg"]
-                    for fname in candidates:
-                        abs_candidate = os.path.join(cat_dir, fname)
-                        if os.path.isfile(abs_candidate):
-                            rel = os.path.join("tag_images", self._category_key(), fname).replace("\\", "/")
-                            try:
-                                idx[key] = rel
-                            except Exception:
-                                pass
-                            break
-            except Exception:
-                pass
-            if not rel:
-                return None
-        abs_path = os.path.join(self._project_root(), "data", rel)
-        if not os.path.isfile(abs_path):
-            return None
+    def get_tag_image_path(self, tag):
+        # El índice vive en el servicio compartido; la tarjeta no guarda copia
         try:
-            pix = QPixmap(abs_path)
-            if pix and not pix.isNull():
-                self._tag_pixmap_cache[key] = pix
-                return pix
+            index = get_tag_image_index()
+            rel = index.get(self._category_key(), tag)
+            return index.abs_path(rel) if rel else None
         except Exception:
             return None
-        return None
-
-    def invalidate_tag_image_cache(self):
-        try:
-            self._tag_image_index = None
-            if isinstance(self._tag_pixmap_cache, dict):
-                self._tag_pixmap_cache.clear()
-        except Exception:
-            self._tag_image_index = None
 
     def show_tags_dialog(self):
         from ..tags_dialog import TagsDialog
 
-        TAGS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data", "tags.json")
-        key = self.category_name.lower().replace(" ", "_")
-        with open(TAGS_PATH, "r", encoding="utf-8") as f:
-            tags_data = json.load(f)
-            tags = tags_data.get(key, [])
+        key = category_id_for(self.category_name)
+        tags = get_registry().tags(key)
         dlg = TagsDialog(self.category_name, tags, self)
         if hasattr(self, "gear_btn") and hasattr(self, "_gear_style_active"):
             self.gear_btn.setStyleSheet(self._gear_style_active)
@@ -676,9 +634,25 @@ class CategoryCard(QFrame):
         if hasattr(self, "gear_btn") and hasattr(self, "_gear_style_base"):
             self.gear_btn.setStyleSheet(self._gear_style_base)
 
+    def set_search_match(self, match):
+        """Resalta la tarjeta con el resultado de búsqueda (campo, término) o lo quita"""
+        highlighted = self.search_match is not None
+        self.search_match = match
+        if match is not None and match[0] != "name":
+            self.search_match_label.setText(f"🔍 {SEARCH_FIELD_LABELS.get(match[0], match[0])}: {match[1]}")
+            self.search_match_label.show()
+        else:
+            self.search_match_label.hide()
+        if highlighted != (match is not None):
+            self.setup_styles()
+
     def setup_styles(self):
-        border_color = "#d32f2f" if self.is_locked else "#404040"
-        border_width = "2px" if self.is_locked else "1px"
+        if self.is_locked:
+            border_color, border_width = "#d32f2f", "2px"
+        elif self.search_match is not None:
+            border_color, border_width = "#6366f1", "2px"
+        else:
+            border_color, border_width = "#404040", "1px"
         
         self.setStyleSheet(f"""
             QFrame {{
@@ -702,24 +676,12 @@ class CategoryCard(QFrame):
             }}
         """)
 
-    def setup_debounce(self):
-        self.debounce_timer = QTimer()
-        self.debounce_timer.setSingleShot(True)
-        self.debounce_timer.timeout.connect(self.update_prompt)
-
     def on_input_change(self):
-        self.debounce_timer.start(500)
+        # El grid agrupa los cambios de todas las tarjetas (ChangeScheduler)
+        self.value_changed.emit()
 
     def update_prompt(self):
-        if not self.prompt_generator:
-            return
-        
-        value = self.input_field.text()
-        if self.prompt_generator:
-            validated_value = self.prompt_generator.validate_input(value)
-            snake_case_name = self.category_name.lower().replace(" ", "_")
-            self.prompt_generator.update_category(snake_case_name, validated_value)
-            self.value_changed.emit()
+        self.value_changed.emit()
 
     def toggle_edit_mode(self):
         if not self.is_editing:
@@ -779,24 +741,7 @@ class CategoryCard(QFrame):
         count = max(0, count)
         self.tag_click_counts[tag] = count
     
-        current = self.input_field.text()
-        pattern = re.compile(rf"\(*\s*{re.escape(tag)}\s*\)*,")
-        current = pattern.sub("", current).strip()
-    
-        if count > 0:
-            if count == 1:
-                tag_text = f"{tag},"
-            else:
-                parentheses_count = count - 1
-                tag_text = f"{'(' * parentheses_count}{tag}{')' * parentheses_count},"
-            
-            if current:
-                new_text = f"{current} {tag_text}"
-            else:
-                new_text = tag_text
-            self.input_field.setText(new_text.strip())
-        else:
-            self.input_field.setText(current)
+        self.input_field.setText(set_tag_emphasis(self.input_field.text(), tag, count))
 
     def get_selected_tags(self):
         return [tag for tag, count in self.tag_click_counts.items() if count > 0]
@@ -0,0 +1,60 @@
+from PyQt6.QtCore import QObject, QEvent, QStringListModel, Qt
+from PyQt6.QtWidgets import QCompleter
+
+from logic.term_completion import current_term, get_term_library
+
+
+class TermCompleter(QObject):
+    """Autocompletado del término bajo el cursor en el input de una tarjeta.
+
+    Las sugerencias salen del índice compartido (logic/term_completion.py); el
+    QCompleter se crea la primera vez que hay algo que sugerir y al elegir una
+    sugerencia solo se reemplaza el término actual, no todo el valor."""
+
+    def __init__(self, line_edit, category_getter):
+        super().__init__(line_edit)
+        self.line_edit = line_edit
+        self.category_getter = category_getter
+        self._completer = None
+        self._model = None
+        self._span = (0, 0)
+        line_edit.textEdited.connect(self.update_suggestions)
+        line_edit.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self.line_edit and event.type() == QEvent.Type.FocusIn:
+            # Revisa la biblioteca al entrar al campo, no en cada tecla
+            get_term_library().refresh()
+        return False
+
+    def _ensure_completer(self):
+        if self._completer is None:
+            self._model = QStringListModel(self)
+            self._completer = QCompleter(self._model, self)
+            self._completer.setWidget(self.line_edit)
+            self._completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+            self._completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+            self._completer.activated.connect(self.insert_completion)
+        return self._completer
+
+    def update_suggestions(self, text):
+        start, end, prefix = current_term(text, self.line_edit.cursorPosition())
+        library = get_term_library()
+        library.refresh_tags()
+        suggestions = library.index.complete(prefix, self.category_getter())
+        if not suggestions:
+            if self._completer is not None:
+                self._completer.popup().hide()
+            return
+        self._span = (start, end)
+        completer = self._ensure_completer()
+        self._model.setStringList(suggestions)
+        completer.complete()
+
+    def insert_completion(self, term):
+        text = self.line_edit.text()
+        start, end = self._span
+        new_text = text[:start] + term + text[end:]
+        self.line_edit.setText(new_text)
+        self.line_edit.setCursorPosition(start + len(term))
+        get_term_library().index.note_used(term)
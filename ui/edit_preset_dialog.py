@@ -3,13 +3,19 @@ from PyQt6.QtWidgets import (
     QScrollArea, QWidget, QInputDialog, QFileDialog, QFrame, QGridLayout, QSizePolicy, QLineEdit,
     QComboBox, QCheckBox, QMessageBox, QToolButton
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QPixmap
 import os
+from ui.thumbnail_service import get_thumbnail_service
 
 
 class EditPresetDialog(QDialog):
-    """Diálogo sencillo para editar las categorías y las imágenes de un preset"""
+    """Diálogo sencillo para editar las categorías y las imágenes de un preset.
+
+    Guardar emite `save_requested`; quien abrió el diálogo lo cierra con
+    accept() cuando el guardado terminó (ver set_saving)."""
+
+    save_requested = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -138,18 +144,23 @@ class EditPresetDialog(QDialog):
         actions.addStretch()
         cancel_btn = QPushButton("Cancelar")
         cancel_btn.setMaximumHeight(24)
-        save_btn = QPushButton("💾 Guardar")
-        save_btn.setMaximumHeight(24)
-        save_btn.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold; font-size: 10px;")
+        self.save_btn = QPushButton("💾 Guardar")
+        self.save_btn.setMaximumHeight(24)
+        self.save_btn.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold; font-size: 10px;")
         cancel_btn.clicked.connect(self.reject)
-        save_btn.clicked.connect(self.accept)
+        self.save_btn.clicked.connect(self.save_requested)
         actions.addWidget(cancel_btn)
-        actions.addWidget(save_btn)
+        actions.addWidget(self.save_btn)
         right_panel.addLayout(actions)
 
         body.addLayout(right_panel, 3)
         layout.addLayout(body)
 
+    def set_saving(self, saving):
+        """Bloquea el botón de guardar mientras el guardado está en curso"""
+        self.save_btn.setEnabled(not saving)
+        self.save_btn.setText("Guardando…" if saving else "💾 Guardar")
+
     def set_preset_data(self, preset_name, category_id, categories, images):
         """Inicializa el diálogo con los datos actuales del preset"""
         self.preset_name = preset_name
@@ -404,21 +415,33 @@ class EditPresetDialog(QDialog):
         
         for i, lbl in enumerate(self.image_previews):
             if i < len(self.selected_images) and os.path.exists(self.selected_images[i]):
-                pix = QPixmap(self.selected_images[i])
-                if not pix.isNull():
-                    scaled = pix.scaled(150, 150, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                    lbl.setPixmap(scaled)
-                    lbl.setText("")
-                    lbl.setStyleSheet("border: 2px solid #4CAF50; background-color: #1f1f1f; border-radius: 4px;")
+                path = self.selected_images[i]
+                pix = get_thumbnail_service().request(
+                    path, 150, lambda pix, lbl=lbl, i=i, path=path: self._apply_image_preview(lbl, i, path, pix))
+                if pix is not None:
+                    self._apply_image_preview(lbl, i, path, pix)
                 else:
                     lbl.setPixmap(QPixmap())
-                    lbl.setText(f"Imagen {i+1}\nNo válida")
-                    lbl.setStyleSheet("border: 2px solid #f44336; background-color: #2f2f2f; border-radius: 4px; font-size: 10px; padding: 6px;")
+                    lbl.setText(f"Imagen {i+1}\nCargando…")
+                    lbl.setStyleSheet("border: 2px solid gray; background-color: #2f2f2f; border-radius: 4px; font-size: 10px; padding: 6px;")
             else:
                 lbl.setPixmap(QPixmap())
                 lbl.setText(f"Imagen {i+1}\nNo seleccionada")
                 lbl.setStyleSheet("border: 2px solid gray; background-color: #2f2f2f; border-radius: 4px; font-size: 10px; padding: 6px;")
 
+    def _apply_image_preview(self, lbl, i, path, pix):
+        # La miniatura puede llegar después de que el hueco cambió de imagen
+        if i >= len(self.selected_images) or self.selected_images[i] != path:
+            return
+        if not pix.isNull():
+            lbl.setPixmap(pix)
+            lbl.setText("")
+            lbl.setStyleSheet("border: 2px solid #4CAF50; background-color: #1f1f1f; border-radius: 4px;")
+        else:
+            lbl.setPixmap(QPixmap())
+            lbl.setText(f"Imagen {i+1}\nNo válida")
+            lbl.setStyleSheet("border: 2px solid #f44336; background-color: #2f2f2f; border-radius: 4px; font-size: 10px; padding: 6px;")
+
     def _group_color_for_category(self, name: str) -> str:
         """Heurística para asignar color por grupo de categoría"""
         n = (name or "").lower()
@@ -4,80 +4,494 @@ import time
 import os
 import logging
 import subprocess
-import shlex
+import threading
+import socket
+import struct
+import uuid
 from urllib.request import urlopen
 from urllib.error import URLError
-import os
 logger = logging.getLogger(__name__)
 
-def _bridge_path():
+CHECKPOINT_NAME = "app_prompts_updates.checkpoint"
+READY_FLAG_NAME = "app_prompts_ready.flag"
+READY_TTL = 2.0
+SOCKET_TIMEOUT = 0.5
+MAX_FRAME = 8 * 1024 * 1024
+# Tamaño a partir del cual el journal ya leído entero se rota (ver rotate_journal)
+JOURNAL_ROTATE_BYTES = 64 * 1024
+# Tiempo sin escrituras tras el cual el journal apartado se puede borrar
+ROTATE_SETTLE_SECONDS = 2.0
+
+def _bridge_dir():
     base = Path(__file__).resolve().parents[1]
     root = base.parent
     bdir = root / "bridge"
     bdir.mkdir(parents=True, exist_ok=True)
-    return bdir / "app_prompts_updates.json"
+    return bdir
 
-def receiver_ready():
-    base = Path(__file__).resolve().parents[1]
-    root = base.parent
-    flag = root / "bridge" / "app_prompts_ready.flag"
-    if os.environ.get("APP_PROMPTS_READY", "").lower() in ("1", "true", "yes"):
-        return True
-    url = os.environ.get("APP_PROMPTS_HEALTH_URL", "")
-    if url:
+def _bridge_path():
+    return _bridge_dir() / "app_prompts_updates.json"
+
+def _ready_flag_path():
+    return _bridge_dir() / READY_FLAG_NAME
+
+def _process_running(pname):
+    pname = pname.lower()
+    if os.path.isdir("/proc"):
+        # Linux: leer /proc/<pid>/comm es mucho más barato que lanzar un proceso
+        target = pname[:-4] if pname.endswith(".exe") else pname
         try:
-            with urlopen(url, timeout=1.5) as r:
-                code = getattr(r, "status", 200)
-                if int(code) == 200:
+            for entry in os.scandir("/proc"):
+                if not entry.name.isdigit():
+                    continue
+                try:
+                    with open(f"/proc/{entry.name}/comm", "r", encoding="utf-8", errors="ignore") as f:
+                        comm = f.read().strip().lower()
+                except OSError:
+                    continue
+                if comm == target[:15] or comm == target:
                     return True
-        except URLError:
-            pass
-        except Exception:
+        except OSError:
             pass
-    pname = os.environ.get("APP_PROMPTS_PROCESS_NAME", "")
-    if pname:
+        return False
+    if os.name == "nt":
+        cmd = ["tasklist", "/FI", f"IMAGENAME eq {pname}", "/NH"]
+    else:
+        cmd = ["ps", "-A", "-o", "comm="]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=2)
+        return pname in proc.stdout.lower()
+    except Exception:
+        return False
+
+def _pid_alive(pid):
+    # Solo se puede comprobar sin coste (ni riesgo) donde existe /proc
+    if not os.path.isdir("/proc"):
+        return True
+    return os.path.exists(f"/proc/{int(pid)}")
+
+class ReceiverStatus:
+    """Estado de disponibilidad del receptor, cacheado con TTL.
+
+    `is_ready()` responde desde la caché; las comprobaciones costosas (endpoint de
+    salud, listado de procesos) se hacen en un hilo en segundo plano cuando vence
+    el TTL o cambia el mtime del flag. Los listeners reciben el nuevo estado
+    cada vez que cambia."""
+
+    def __init__(self, ttl=READY_TTL):
+        self.ttl = ttl
+        self._ready = None
+        self._checked_at = 0.0
+        self._flag_path = _ready_flag_path()
+        self._flag_mtime = None
+        self._flag_pid = None
+        self._flag_data = {}
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def is_ready(self):
+        if self._ready is None:
+            self._store(self._probe(full=False))
+            self.refresh_async()
+        elif time.monotonic() - self._checked_at > self.ttl or self._flag_changed():
+            self.refresh_async()
+        return self._ready
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="bridge-ready", daemon=True).start()
+
+    def refresh(self):
+        """Comprobación completa y síncrona (bloquea: no usar desde la UI)."""
+        self._store(self._probe(full=True))
+        return self._ready
+
+    def _refresh(self):
         try:
-            proc = subprocess.run(["tasklist"], capture_output=True, text=True, timeout=2)
-            out = proc.stdout.lower()
-            if pname.lower() in out:
-                return True
-        except Exception:
-            pass
-    return flag.exists()
+            self.refresh()
+        except Exception as e:
+            logger.error(f"bridge ready: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
 
-def send_update(category, items, operation="append"):
-    try:
-        fp = _bridge_path()
-        payload = {
-            "source_app": "promptEmbeddings",
-            "schema_version": 1,
-            "timestamp": int(time.time()),
-            "operation": operation,
-            "category": category,
-            "items": list(dict.fromkeys(items or []))
-        }
-        current = []
-        if fp.exists():
-            try:
-                data = json.loads(fp.read_text(encoding="utf-8"))
-                if isinstance(data, list):
-                    current = data
-                elif isinstance(data, dict) and "updates" in data and isinstance(data["updates"], list):
-                    current = data["updates"]
-            except Exception:
-                current = []
-        current.append(payload)
-        tmp = fp.with_suffix(".tmp")
-        tmp.write_text(json.dumps(current, ensure_ascii=False), encoding="utf-8")
-        if fp.exists():
+    def _store(self, ready):
+        changed = self._ready is not None and ready != self._ready
+        self._ready = ready
+        self._checked_at = time.monotonic()
+        if changed:
+            for callback in list(self._listeners):
+                try:
+                    callback(ready)
+                except Exception as e:
+                    logger.error(f"bridge ready listener: {e}")
+
+    def _flag_stat(self):
+        try:
+            return os.stat(self._flag_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _flag_changed(self):
+        return self._flag_stat() != self._flag_mtime
+
+    def _flag_ready(self):
+        mtime = self._flag_stat()
+        if mtime != self._flag_mtime:
+            # El contenido (pid del receptor) solo se relee cuando cambia el mtime
+            self._flag_mtime = mtime
+            self._flag_pid = None
+            self._flag_data = {}
+            if mtime is not None:
+                try:
+                    data = json.loads(self._flag_path.read_text(encoding="utf-8") or "{}")
+                    if isinstance(data, dict):
+                        self._flag_data = data
+                        self._flag_pid = data.get("pid")
+                except Exception:
+                    pass
+        if mtime is None:
+            return False
+        if self._flag_pid:
+            return _pid_alive(self._flag_pid)
+        return True
+
+    def endpoint(self):
+        """(puerto, token) del socket anunciado por el receptor, o None."""
+        if not self._flag_ready():
+            return None
+        port = self._flag_data.get("port")
+        if not port:
+            return None
+        return int(port), self._flag_data.get("token", "")
+
+    def _probe(self, full):
+        if os.environ.get("APP_PROMPTS_READY", "").lower() in ("1", "true", "yes"):
+            return True
+        if self._flag_ready():
+            return True
+        if not full:
+            return False
+        url = os.environ.get("APP_PROMPTS_HEALTH_URL", "")
+        if url:
             try:
-                os.replace(tmp, fp)
+                with urlopen(url, timeout=1.0) as r:
+                    if int(getattr(r, "status", 200)) == 200:
+                        return True
+            except URLError:
+                pass
             except Exception:
-                tmp.replace(fp)
-        else:
-            tmp.replace(fp)
-        logger.info(f"bridge write ok category={category} items={len(items or [])}")
+                pass
+        pname = os.environ.get("APP_PROMPTS_PROCESS_NAME", "")
+        if pname and _process_running(pname):
+            return True
+        return False
+
+_receiver_status = None
+
+def receiver_status():
+    global _receiver_status
+    if _receiver_status is None:
+        _receiver_status = ReceiverStatus()
+    return _receiver_status
+
+def receiver_ready():
+    return receiver_status().is_ready()
+
+def mark_receiver_ready(port=None, token=None):
+    flag = _ready_flag_path()
+    tmp = flag.with_name(flag.name + ".tmp")
+    data = {"pid": os.getpid(), "since": int(time.time())}
+    if port:
+        data["port"] = int(port)
+        data["token"] = token or ""
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, flag)
+
+def clear_receiver_ready():
+    try:
+        _ready_flag_path().unlink()
+    except OSError:
+        pass
+
+def migrate_legacy_journal():
+    """Convierte a JSON Lines un journal escrito por una versión anterior.
+
+    Esas versiones reescribían una lista JSON completa en cada envío; el journal
+    actual es un registro por línea y solo se añade al final. Lo llama el
+    consumidor una vez al arrancar."""
+    fp = _bridge_path()
+    try:
+        with open(fp, "rb") as f:
+            head = f.read(64).lstrip()
+    except OSError:
+        return
+    if not head or head[:1] not in (b"[", b"{"):
+        return
+    try:
+        data = json.loads(fp.read_text(encoding="utf-8"))
+    except Exception:
+        return
+    if isinstance(data, dict) and "updates" not in data:
+        return
+    records = data.get("updates", []) if isinstance(data, dict) else data
+    if not isinstance(records, list):
+        return
+    tmp = fp.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for rec in records:
+            if isinstance(rec, dict):
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    os.replace(tmp, fp)
+
+def encode_frame(message):
+    """Mensaje JSON con prefijo de longitud (4 bytes, big-endian)."""
+    body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return struct.pack(">I", len(body)) + body
+
+def decode_frames(buffer):
+    """Extrae los mensajes completos de `buffer` (bytearray) y deja el resto."""
+    messages = []
+    while len(buffer) >= 4:
+        (size,) = struct.unpack(">I", bytes(buffer[:4]))
+        if size > MAX_FRAME:
+            raise ValueError(f"frame demasiado grande ({size} bytes)")
+        if len(buffer) < 4 + size:
+            break
+        body = bytes(buffer[4:4 + size])
+        del buffer[:4 + size]
+        messages.append(json.loads(body.decode("utf-8")))
+    return messages
+
+def _make_payload(category, items, operation="append", batch_id=None):
+    payload = {
+        "source_app": "promptEmbeddings",
+        "schema_version": 1,
+        "timestamp": int(time.time()),
+        "operation": operation,
+        "category": category,
+        "items": list(dict.fromkeys(items or []))
+    }
+    if batch_id:
+        payload["batch_id"] = batch_id
+    return payload
+
+def _send_socket(payloads):
+    endpoint = receiver_status().endpoint()
+    if endpoint is None:
+        return False
+    port, token = endpoint
+    try:
+        with socket.create_connection(("127.0.0.1", port), timeout=SOCKET_TIMEOUT) as sock:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(encode_frame({"token": token, "updates": payloads}))
+            # El receptor confirma con un frame {"ok": true} al aceptar el lote
+            buffer = bytearray()
+            while True:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    return False
+                buffer.extend(chunk)
+                replies = decode_frames(buffer)
+                if replies:
+                    return bool(replies[0].get("ok"))
+    except (OSError, ValueError) as e:
+        logger.info(f"bridge socket no disponible, usando journal: {e}")
+        return False
+
+def _append_journal(payloads):
+    fp = _bridge_path()
+    data = "".join(json.dumps(p, ensure_ascii=False) + "\n" for p in payloads)
+    with open(fp, "a", encoding="utf-8") as f:
+        f.write(data)
+
+def send_updates(updates):
+    """Envía un lote de (categoria, items[, operacion]).
+
+    Usa el socket local si el receptor está escuchando; si no (o si falla), añade
+    el lote al journal, que sigue siendo el respaldo persistente. Todos los
+    registros llevan el mismo batch_id: si el receptor aceptó el lote pero la
+    confirmación no llegó, descarta la copia que le llega por el journal."""
+    try:
+        batch_id = uuid.uuid4().hex
+        payloads = [_make_payload(*u, batch_id=batch_id) for u in updates]
+        if not payloads:
+            return True
+        if _send_socket(payloads):
+            logger.info(f"bridge socket ok updates={len(payloads)}")
+            return True
+        _append_journal(payloads)
+        logger.info(f"bridge write ok updates={len(payloads)}")
         return True
     except Exception as e:
         logger.error(str(e))
         return False
+
+def send_update(category, items, operation="append"):
+    return send_updates([(category, items, operation)])
+
+def read_updates(offset=0):
+    """Lee los registros añadidos al journal desde `offset` (en bytes).
+
+    Devuelve (registros, nuevo_offset). Solo se consumen líneas completas, así que
+    una escritura a medias se leerá en la siguiente llamada."""
+    fp = _bridge_path()
+    if not fp.exists():
+        return [], 0
+    try:
+        size = fp.stat().st_size
+    except OSError:
+        return [], offset
+    if offset > size:
+        # El journal fue truncado o reemplazado: empezar de nuevo
+        offset = 0
+    return _read_lines(fp, offset, size)
+
+def _read_lines(fp, offset, size, partial=False):
+    if offset >= size:
+        return [], offset
+    with open(fp, "rb") as f:
+        f.seek(offset)
+        chunk = f.read(size - offset)
+    end = len(chunk) - 1 if partial else chunk.rfind(b"\n")
+    if end < 0:
+        return [], offset
+    return _parse_lines(chunk[:end + 1]), offset + end + 1
+
+def _parse_lines(chunk):
+    records = []
+    for raw in chunk.splitlines():
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            rec = json.loads(raw.decode("utf-8"))
+        except Exception:
+            logger.warning("bridge: registro inválido descartado")
+            continue
+        if isinstance(rec, dict):
+            records.append(rec)
+    return records
+
+def _rotated_path():
+    fp = _bridge_path()
+    return fp.with_name(fp.name + ".rotating")
+
+def rotate_journal(offset):
+    """Aparta el journal cuando ya se consumió hasta el final (`offset` == tamaño).
+
+    El archivo se renombra (el emisor abre en modo "a" en cada envío, así que lo
+    siguiente va a un journal nuevo) pero no se borra: un emisor que lo abrió
+    justo antes del rename todavía puede escribir en él, así que se sigue leyendo
+    con read_rotated() desde `offset`. El checkpoint guarda los dos offsets.
+    Retorna True si se rotó; no se rota otra vez mientras quede un apartado."""
+    fp = _bridge_path()
+    old = _rotated_path()
+    try:
+        if old.exists() or offset < JOURNAL_ROTATE_BYTES or fp.stat().st_size != offset:
+            return False
+        os.replace(fp, old)
+    except OSError:
+        return False
+    save_checkpoint(0, rotated=offset)
+    return True
+
+def read_rotated(offset):
+    """Lee lo que se escribió en el journal apartado desde `offset`.
+
+    Devuelve (registros, nuevo_offset). Cuando ya se leyó hasta el final y lleva
+    ROTATE_SETTLE_SECONDS sin cambios, se borra y nuevo_offset es None."""
+    old = _rotated_path()
+    try:
+        st = old.stat()
+    except OSError:
+        return [], None
+    # Quieto: lo que quede sin salto de línea también es un registro completo
+    settled = time.time() - st.st_mtime >= ROTATE_SETTLE_SECONDS
+    records, offset = _read_lines(old, offset, st.st_size, partial=settled)
+    if not settled or offset < st.st_size:
+        return records, offset
+    try:
+        old.unlink()
+    except OSError:
+        return records, offset
+    return records, None
+
+def journal_size():
+    fp = _bridge_path()
+    try:
+        return fp.stat().st_size
+    except OSError:
+        return 0
+
+def rotated_journal_size():
+    """Tamaño del journal apartado, o None si no hay ninguno."""
+    try:
+        return _rotated_path().stat().st_size
+    except OSError:
+        return None
+
+def load_checkpoint():
+    """(offset del journal, offset del journal apartado o None), o None si no hay."""
+    cp = _bridge_dir() / CHECKPOINT_NAME
+    try:
+        data = json.loads(cp.read_text(encoding="utf-8"))
+        offset = int(data.get("offset", 0))
+        rotated = data.get("rotated")
+    except Exception:
+        return None
+    if not _rotated_path().exists():
+        return offset, None
+    if rotated is None:
+        # Se cortó entre el rename y el checkpoint: el offset era del apartado
+        return 0, offset
+    return offset, int(rotated)
+
+def save_checkpoint(offset, rotated=None):
+    cp = _bridge_dir() / CHECKPOINT_NAME
+    tmp = cp.with_name(cp.name + ".tmp")
+    data = {"offset": int(offset)}
+    if rotated is not None:
+        data["rotated"] = int(rotated)
+    try:
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp, cp)
+    except Exception as e:
+        logger.error(f"bridge checkpoint: {e}")
+
+def coalesce_updates(records):
+    """Combina varios registros de la misma categoría en una sola operación.
+
+    Devuelve {categoria: {"replace": bool, "items": [...]}} en orden de llegada.
+    "replace"/"set" descartan lo anterior, "clear" vacía y "append" acumula."""
+    merged = {}
+    for rec in records:
+        category = rec.get("category")
+        if not category:
+            continue
+        op = str(rec.get("operation") or "append").lower()
+        items = [str(i).strip() for i in (rec.get("items") or []) if str(i).strip()]
+        if op in ("replace", "set"):
+            merged[category] = {"replace": True, "items": list(dict.fromkeys(items))}
+        elif op == "clear":
+            merged[category] = {"replace": True, "items": []}
+        else:
+            entry = merged.setdefault(category, {"replace": False, "items": []})
+            for item in items:
+                if item not in entry["items"]:
+                    entry["items"].append(item)
+    return merged
@@ -6,7 +6,7 @@ import logging
 import time
 import traceback
 from .embeddings import EmbeddingsEngine
-from .bridge import send_update, receiver_ready
+from .bridge import send_update, receiver_ready, receiver_status
 
 class EmbeddingWorker(QObject):
     finished = pyqtSignal(dict)
@@ -54,6 +54,24 @@ class TranslateWorker(QObject):
         except Exception as e:
             self.error.emit(str(e))
 
+class ReceiverReadyMonitor(QObject):
+    """Reenvía como señal Qt los cambios de disponibilidad del receptor."""
+    ready_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._status = receiver_status()
+        # El listener se llama desde el hilo de refresco: la señal cruza a la UI.
+        # Se guarda el mismo objeto para poder quitarlo (cada acceso a la señal crea uno nuevo)
+        self._listener = self.ready_changed.emit
+        self._status.add_listener(self._listener)
+        # Al destruirse no se toca `self`: solo lo capturado aquí
+        status, listener = self._status, self._listener
+        self.destroyed.connect(lambda *_: status.remove_listener(listener))
+
+    def is_ready(self):
+        return receiver_ready()
+
 class ResultsWindow(QWidget):
     """Ventana flotante para mostrar resultados"""
     def __init__(self):
@@ -74,6 +92,15 @@ class ResultsWindow(QWidget):
         }
         self._group_filter = None
         self._last_mapping = None
+        self.receiver_monitor = ReceiverReadyMonitor(self)
+        self.receiver_monitor.ready_changed.connect(self._update_receiver_hint)
+        self._update_receiver_hint(self.receiver_monitor.is_ready())
+
+    def _update_receiver_hint(self, ready):
+        if ready:
+            self.status_label.setToolTip("App Prompts disponible")
+        else:
+            self.status_label.setToolTip("App Prompts no detectado: los envíos quedan en cola")
 
     def setup_ui(self):
         layout = QVBoxLayout(self)
@@ -262,14 +289,20 @@ class ResultsWindow(QWidget):
         widget.selectAll()
         widget.copy()
 
-    def _send_category(self, category, items, btn):
-        success = False
-        try:
-            main_window = None
+    def _find_main_window(self):
+        # Se busca una sola vez; la ventana principal vive lo mismo que la app
+        main_window = getattr(self, '_main_window', None)
+        if main_window is None:
             for w in QApplication.topLevelWidgets():
                 if hasattr(w, 'category_grid') and w.__class__.__name__ == 'MainWindow':
-                    main_window = w
+                    main_window = self._main_window = w
                     break
+        return main_window
+
+    def _send_category(self, category, items, btn):
+        success = False
+        try:
+            main_window = self._find_main_window()
             
             if main_window:
                 value = ", ".join(items) if items else ""
@@ -5,6 +5,7 @@ from PyQt6.QtGui import QPalette, QColor, QFont
 from ui.sidebar import SidebarFrame
 from ui.category_grid import CategoryGridFrame
 from ui.prompt_section import PromptSectionFrame
+from ui.bridge_consumer import BridgeConsumer
 from logic.prompt_generator import PromptGenerator
 
 class MainWindow(QMainWindow):
@@ -22,6 +23,11 @@ class MainWindow(QMainWindow):
         
         # Conectar señales
         self.connect_signals()
+
+        # Consumidor de actualizaciones externas (bridge de embeddings)
+        self.bridge_consumer = BridgeConsumer(self)
+        self.bridge_consumer.updates_ready.connect(self.category_grid.apply_bridge_updates)
+        self.bridge_consumer.start()
         
         # Configurar tema y tamaño
         self.set_dark_theme()
@@ -119,7 +125,7 @@ class MainWindow(QMainWindow):
         self.sidebar.character_defaults_selected.connect(self.category_grid.apply_character_defaults)
         self.sidebar.variation_applied.connect(self.apply_variation)
  
-        self.category_grid.category_value_changed.connect(self.sidebar.track_category_change)
+        self.category_grid.category_values_changed.connect(self.sidebar.track_category_changes)
 
         self.category_grid.character_saved.connect(self.sidebar.add_character_to_dropdown)
 
@@ -134,6 +140,11 @@ class MainWindow(QMainWindow):
         """Aplica una variación a las tarjetas de categoría"""
         self.category_grid.apply_variation(variation_data)
     
+    def closeEvent(self, event):
+        """Detiene el consumidor del bridge al cerrar"""
+        self.bridge_consumer.stop()
+        super().closeEvent(event)
+
     def run(self):
         """Muestra la ventana"""
         self.show()
@@ -0,0 +1,95 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt6.QtWidgets import QApplication
+
+from logic.presets_manager import PresetsManager
+
+
+class _SaveSignals(QObject):
+    done = pyqtSignal(object, object, str)
+
+
+class _PresetSaveJob(QRunnable):
+    """Guarda un preset fuera del hilo de la GUI (ver PresetsManager.stage_preset)."""
+
+    def __init__(self, request, signals):
+        super().__init__()
+        self.request = request
+        self.signals = signals
+
+    def run(self):
+        request = self.request
+        manager = PresetsManager()
+        saved, error = None, ""
+        try:
+            staged = manager.stage_preset(request["category_id"], request["preset_name"], request["preset_data"])
+            saved = manager.commit_preset(staged)
+            request["preset_id"] = staged["preset_id"]
+            replaces = request.get("replaces")
+            request["replaced_id"] = manager.preset_id(replaces) if replaces else ""
+            if request["replaced_id"] and request["replaced_id"] != staged["preset_id"]:
+                # Renombrado: el preset anterior se borra solo si el nuevo quedó guardado
+                manager.delete_preset(request["category_id"], replaces)
+        except Exception as e:
+            print(f"Error guardando preset '{request['preset_name']}': {e}")
+            error = str(e) or type(e).__name__
+        self.signals.done.emit(request, saved, error)
+
+
+class PresetSaveService(QObject):
+    """Guardados de presets en segundo plano.
+
+    `save()` vuelve enseguida; las imágenes se optimizan en paralelo dentro del
+    trabajo y el preset se escribe de forma atómica. Los guardados van de a uno
+    (así dos ediciones seguidas del mismo preset no se pisan) y al cerrar la
+    app se espera a que terminen. `saved` avisa con (carpeta, id del preset,
+    id anterior si se renombró, datos guardados); `failed` con (carpeta,
+    nombre, error). Quien abrió el guardado puede pasar `on_done`, que recibe
+    el error ("" si salió bien) después de esas señales."""
+
+    saved = pyqtSignal(str, str, str, dict)
+    failed = pyqtSignal(str, str, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._signals = _SaveSignals(self)
+        self._signals.done.connect(self._on_done)
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.wait_for_done)
+
+    def save(self, category_id, preset_name, preset_data, replaces=None, on_done=None):
+        """Encola el guardado; `replaces` es el nombre anterior si el preset se renombró."""
+        preset_data = dict(preset_data)
+        # Copia: la lista de imágenes del diálogo puede cambiar mientras se guarda
+        preset_data['images'] = list(preset_data.get('images') or [])
+        request = {
+            "category_id": category_id,
+            "preset_name": preset_name,
+            "preset_data": preset_data,
+            "replaces": replaces,
+            "on_done": on_done,
+        }
+        self._pool.start(_PresetSaveJob(request, self._signals))
+
+    def _on_done(self, request, saved, error):
+        if saved is None:
+            self.failed.emit(request["category_id"], request["preset_name"], error)
+        else:
+            self.saved.emit(request["category_id"], request["preset_id"], request["replaced_id"], saved)
+        if request["on_done"] is not None:
+            request["on_done"]("" if saved is not None else error)
+
+    def wait_for_done(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
+
+
+_service = None
+
+
+def get_preset_save_service():
+    global _service
+    if _service is None:
+        _service = PresetSaveService()
+    return _service
@@ -7,7 +7,10 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, pyqtSignal, QBuffer, QPoint, QEvent, QSize
 from PyQt6.QtGui import QFont, QPixmap, QCursor, QAction, QIcon
 from ui.edit_preset_dialog import EditPresetDialog
+from ui.thumbnail_service import get_thumbnail_service
+from ui.preset_save_service import get_preset_save_service
 from logic.presets_manager import PresetsManager
+from logic.image_store import resolve_image
 from datetime import datetime
 from PIL import Image
 import os
@@ -24,6 +27,9 @@ class PresetsPanel(QWidget):
         self._image_thumb_cache = {}
         self.setup_ui()
         self.load_presets()
+        save_service = get_preset_save_service()
+        save_service.saved.connect(self.refresh_preset_item)
+        save_service.failed.connect(self._on_preset_save_failed)
     
     def setup_ui(self):
         """Configura la interfaz del panel de presets"""
@@ -109,6 +115,8 @@ class PresetsPanel(QWidget):
     def load_presets(self):
         """Carga los presets en el árbol"""
         self.presets_tree.clear()
+        # Las imágenes pudieron cambiar (preset editado): se revisa el archivo de miniaturas
+        get_thumbnail_service().schedule_archive_update()
         all_folders = self.presets_manager.get_all_preset_folders()
         
         for folder_id, folder_info in all_folders.items():
@@ -145,55 +153,100 @@ class PresetsPanel(QWidget):
                 sortable.append((preset_id, preset_data, ts))
             sortable.sort(key=lambda x: (x[2], (x[1].get('name', x[0]) or "").lower()), reverse=True)
             for preset_id, preset_data, _ts in sortable:
-                preset_item = QTreeWidgetItem(category_item)
-                preset_name = preset_data.get('name', preset_id)
-                preset_item.setText(0, preset_name)
-                image_paths = []
-                images_list = preset_data.get('images', [])
-                if isinstance(images_list, list) and images_list:
-                    # Construir ruta a la carpeta de imágenes del preset
-                    images_folder_name = f"{preset_id}_images"
-                    images_dir = os.path.join(self.presets_manager.presets_dir, folder_id, images_folder_name)
-                    
-                    if os.path.isdir(images_dir):
-                        for img_name in images_list:
-                            full_path = os.path.join(images_dir, img_name)
-                            if os.path.exists(full_path):
-                                image_paths.append(full_path)
+                self._add_preset_item(category_item, folder_id, preset_id, preset_data)
+        
+        self.presets_tree.collapseAll()
 
-                if image_paths:
-                    try:
-                        pixmap = QPixmap(image_paths[0])
-                        if not pixmap.isNull():
-                            pixmap = pixmap.scaled(24, 24, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                            icon = QIcon(pixmap)
-                            preset_item.setIcon(0, icon)
-                    except Exception as e:
-                        print(f"Error cargando icono desde archivo para preset {preset_id}: {e}")
+    def _add_preset_item(self, category_item, folder_id, preset_id, preset_data, index=None):
+        """Crea el nodo de un preset (icono, datos para preview y edición)"""
+        if index is None:
+            preset_item = QTreeWidgetItem(category_item)
+        else:
+            preset_item = QTreeWidgetItem()
+            category_item.insertChild(index, preset_item)
+        preset_name = preset_data.get('name', preset_id)
+        preset_item.setText(0, preset_name)
+        image_paths = []
+        images_list = preset_data.get('images', [])
+        if isinstance(images_list, list) and images_list:
+            # Construir ruta a la carpeta de imágenes del preset
+            images_folder_name = f"{preset_id}_images"
+            images_dir = os.path.join(self.presets_manager.presets_dir, folder_id, images_folder_name)
+            
+            for img_name in images_list:
+                # Las imágenes compartidas (image_store/..) viven fuera de la carpeta del preset
+                full_path = resolve_image(images_dir, img_name)
+                if os.path.exists(full_path):
+                    image_paths.append(full_path)
 
-                elif preset_data.get('image'):
-                     try:
-                        image_data = preset_data.get('image')
-                        img_bytes = base64.b64decode(image_data.split(',')[1] if ',' in image_data else image_data)
-                        pixmap = QPixmap()
-                        pixmap.loadFromData(img_bytes)
-                        pixmap = pixmap.scaled(24, 24, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-                        icon = QIcon(pixmap)
-                        preset_item.setIcon(0, icon)
-                        # Convertir a lista ficticia para el preview
-                        image_paths = [image_data]
-                     except Exception:
-                        pass
+        if image_paths:
+            # La miniatura se genera en segundo plano; el icono se pone al terminar
+            self._set_item_thumbnail(preset_item, image_paths[0])
 
-                preset_item.setData(0, Qt.ItemDataRole.UserRole, {
-                    'type': 'preset',
-                    'category_id': folder_id,
-                    'preset_id': preset_id,
-                    'preset_data': preset_data,
-                    'image_paths': image_paths
-                })
-        
-        self.presets_tree.collapseAll()
+        elif preset_data.get('image'):
+             try:
+                image_data = preset_data.get('image')
+                img_bytes = base64.b64decode(image_data.split(',')[1] if ',' in image_data else image_data)
+                pixmap = QPixmap()
+                pixmap.loadFromData(img_bytes)
+                pixmap = pixmap.scaled(24, 24, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                icon = QIcon(pixmap)
+                preset_item.setIcon(0, icon)
+                # Convertir a lista ficticia para el preview
+                image_paths = [image_data]
+             except Exception:
+                pass
+
+        preset_item.setData(0, Qt.ItemDataRole.UserRole, {
+            'type': 'preset',
+            'category_id': folder_id,
+            'preset_id': preset_id,
+            'preset_data': preset_data,
+            'image_paths': image_paths
+        })
+        return preset_item
+
+    def refresh_preset_item(self, folder_id, preset_id, old_preset_id="", preset_data=None):
+        """Actualiza solo el nodo de un preset recién guardado (el resto del árbol no se toca)"""
+        root = self.presets_tree.invisibleRootItem()
+        category_item = None
+        for i in range(root.childCount()):
+            item = root.child(i)
+            if (item.data(0, Qt.ItemDataRole.UserRole) or {}).get('category_id') == folder_id:
+                category_item = item
+                break
+        if category_item is None or preset_data is None:
+            self.load_presets()
+            return
+        for j in reversed(range(category_item.childCount())):
+            child = category_item.child(j)
+            if (child.data(0, Qt.ItemDataRole.UserRole) or {}).get('preset_id') in (preset_id, old_preset_id):
+                if child is self._preview_item:
+                    self.hide_preview_overlay()
+                if child is self._tooltip_item:
+                    self.hide_persistent_tooltip()
+                category_item.removeChild(child)
+        # Recién guardado = el más reciente: va primero, como en load_presets
+        preset_item = self._add_preset_item(category_item, folder_id, preset_id, preset_data, index=0)
+        search_text = self.search_box.text().lower().strip()
+        if search_text and search_text not in preset_item.text(0).lower():
+            preset_item.setHidden(True)
+        else:
+            self.presets_tree.setCurrentItem(preset_item)
+            self.presets_tree.scrollToItem(preset_item)
+        get_thumbnail_service().schedule_archive_update()
+
+    def _on_preset_save_failed(self, folder_id, preset_name, error):
+        QMessageBox.warning(self, "Error", f"No se pudo guardar el preset '{preset_name}':\n{error}")
+
+    def _set_item_thumbnail(self, item, image_path, size=24):
+        def apply(pixmap):
+            if not pixmap.isNull():
+                item.setIcon(0, QIcon(pixmap))
+
+        pixmap = get_thumbnail_service().request(image_path, size, apply)
+        if pixmap is not None:
+            apply(pixmap)
 
     def toggle_folder_on_click(self, item, column):
         """Alterna expansión al hacer clic en una carpeta (item raíz)."""
@@ -235,13 +288,15 @@ class PresetsPanel(QWidget):
         max_col = 0
         has_images = False
         
+        thumbs = get_thumbnail_service()
         for i, img_source in enumerate(image_paths):
             label = QLabel()
             pixmap = QPixmap()
             
             # Verificar si es ruta de archivo o data base64
             if isinstance(img_source, str) and os.path.exists(img_source):
-                pixmap.load(img_source)
+                # Se muestra un hueco y la miniatura llega desde el pool de hilos
+                pixmap = thumbs.request(img_source, MAX_IMG_SIZE, label.setPixmap) or thumbs.placeholder(MAX_IMG_SIZE)
             elif isinstance(img_source, str):
                  try:
                     img_bytes = base64.b64decode(img_source.split(',')[1] if ',' in img_source else img_source)
@@ -758,20 +813,25 @@ class PresetsPanel(QWidget):
                     'created_at': datetime.now().isoformat()
                 }
                 
-                # Guardar usando el presets_manager
-                success = self.presets_manager.save_preset(selected_folder, preset_name, preset_data)
-                
-                if success:
-                    QMessageBox.information(dialog, "Éxito", f"Preset '{preset_name}' guardado correctamente.")
-                    # Recargar la lista de presets
-                    self.load_presets()
-                    dialog.accept()
-                else:
-                    QMessageBox.warning(dialog, "Error", "No se pudo guardar el preset.")
+                # Las imágenes se optimizan en segundo plano; el nodo del preset
+                # aparece en el árbol cuando termina (refresh_preset_item). El
+                # diálogo queda abierto hasta saber el resultado: si falla se
+                # puede reintentar sin volver a cargar todo
+                save_btn.setEnabled(False)
+                save_btn.setText("Guardando…")
+                get_preset_save_service().save(selected_folder, preset_name, preset_data, on_done=on_saved)
                     
             except Exception as e:
                 QMessageBox.critical(dialog, "Error", f"Error al guardar el preset: {str(e)}")
         
+        def on_saved(error):
+            if not error:
+                dialog.accept()
+                return
+            # El aviso con el error lo muestra _on_preset_save_failed
+            save_btn.setEnabled(True)
+            save_btn.setText("💾 Guardar Preset")
+
         # Conectar botón
         save_btn.clicked.connect(save_preset)
         
@@ -890,7 +950,7 @@ class PresetsPanel(QWidget):
         dialog = EditPresetDialog(self)
         dialog.setWindowTitle(f"Editar Preset - {preset_name}")
         dialog.set_preset_data(preset_name, category_id, categories, images)
-        def on_accept():
+        def on_save():
             updated_categories = dialog.get_updated_categories()
             updated_images = dialog.get_selected_images()
             updated_name = getattr(dialog, 'get_preset_name', lambda: preset_name)()
@@ -902,50 +962,36 @@ class PresetsPanel(QWidget):
                 'created_at': datetime.now().isoformat()
             }
 
-            if updated_name != preset_name:
-                success_new = self.presets_manager.save_preset(category_id, updated_name, new_preset_data)
-                if success_new:
-                    if hasattr(self.presets_manager, 'delete_preset'):
-                        try:
-                            self.presets_manager.delete_preset(category_id, preset_name)
-                        except Exception as e:
-                            print(f"Advertencia: No se pudo eliminar el preset anterior: {e}")
-                    QMessageBox.information(self, "Éxito", f"Preset renombrado a '{updated_name}' y actualizado correctamente.")
-                    self.load_presets()
-                else:
-                    QMessageBox.warning(self, "Error", "No se pudo guardar el preset con el nuevo nombre.")
+            # Si cambió el nombre, el preset anterior se borra al terminar de guardar el nuevo
+            replaces = preset_name if updated_name != preset_name else None
+            dialog.set_saving(True)
+            get_preset_save_service().save(category_id, updated_name, new_preset_data, replaces=replaces, on_done=on_saved)
+
+        def on_saved(error):
+            # Si falla, el diálogo sigue abierto con los cambios para reintentar
+            if error:
+                dialog.set_saving(False)
             else:
-                success = self.presets_manager.save_preset(category_id, preset_name, new_preset_data)
-                if success:
-                    QMessageBox.information(self, "Éxito", f"Preset '{preset_name}' actualizado correctamente.")
-                    self.load_presets()
-                else:
-                    QMessageBox.warning(self, "Error", "No se pudo actualizar el preset.")
+                dialog.accept()
 
-        dialog.accepted.connect(on_accept)
+        dialog.save_requested.connect(on_save)
         dialog.show()
 
     def show_preset_preview(self, position):
         """Muestra vista previa de imágenes del preset al hacer clic derecho"""
-        print(f"DEBUG: show_preset_preview llamado en posición {position}")
-
         item = self.presets_tree.itemAt(position)
         if not item or item.parent() is None:
-            print("DEBUG: No es un preset válido")
             return
             
         # Obtener datos del preset
         item_data = item.data(0, Qt.ItemDataRole.UserRole)
         if not item_data or item_data.get('type') != 'preset':
-            print("DEBUG: Item no tiene datos de preset")
             return
             
         preset_data = item_data.get('preset_data', {})
         preset_name = preset_data.get('name', 'Sin nombre')
         categories_count = len(preset_data.get('categories', {}))
         
-        print(f"DEBUG: Preset name: {preset_name}, categories: {categories_count}")
-        
         # Cargar las rutas completas de las imágenes
         category_id = item_data.get('category_id')
         
@@ -953,57 +999,68 @@ class PresetsPanel(QWidget):
         full_preset_data = self.presets_manager.load_preset(category_id, preset_name)
         images = full_preset_data.get('images', []) if full_preset_data else []
         
-        print(f"DEBUG: Imágenes encontradas: {len(images)}")
-        
         header_html = f"""<div style='background-color: #2d2d2d; padding: 16px; border-radius: 10px; max-width: 450px; min-width: 380px; border: 3px solid #00ff00; box-shadow: 0 4px 8px rgba(0,0,0,0.5);'>
             <h3 style='color: #00ff00; margin: 0 0 12px 0; font-size: 16px; font-weight: bold; text-align: center;'>{preset_name}</h3>
             <p style='color: #ffffff; margin: 0 0 12px 0; font-size: 13px; text-align: center;'>📁 {categories_count} categorías</p>"""
         loading_html = "<p style='color: #bbb; font-size: 13px; text-align: center;'>Cargando imágenes…</p></div>"
         self.show_preview_overlay(item, header_html + loading_html)
         
+        if not images:
+            self._render_preset_preview(self._preview_label, header_html, [])
+            return
+        existing = []
+        for image_path in images[:4]:
+            if os.path.exists(image_path):
+                existing.append(image_path)
+        # Las miniaturas se generan fuera del hilo de la GUI; el overlay se
+        # vuelve a pintar a medida que llegan
+        label = self._preview_label
+        refresh = lambda _pixmap: self._render_preset_preview(label, header_html, existing)
+        thumbs = get_thumbnail_service()
+        for image_path in existing:
+            thumbs.request(image_path, 120, refresh)
+        self._render_preset_preview(label, header_html, existing)
+
+    def _render_preset_preview(self, label, header_html, images):
+        if label is None or label is not getattr(self, '_preview_label', None):
+            return
         final_html = header_html
         if images:
-            print(f"DEBUG: Procesando {len(images)} imágenes")
             images_html = "<div style='display: grid; grid-template-columns: repeat(2, 1fr); gap: 12px; margin-top: 12px;'>"
-            for i, image_path in enumerate(images[:4]):
-                print(f"DEBUG: Procesando imagen {i+1}: {image_path}")
-                if os.path.exists(image_path):
-                    try:
-                        image_data = self._get_base64_thumb(image_path, size=120)
-                        if image_data:
-                            images_html += f"<img src='data:image/png;base64,{image_data}' style='border-radius: 6px; border: 2px solid #00ff00;'>"
-                            print(f"DEBUG: Imagen {i+1} procesada correctamente")
-                        else:
-                            print(f"DEBUG: Error: imagen sin datos {image_path}")
-                    except Exception as e:
-                        print(f"DEBUG: Error cargando imagen {image_path}: {e}")
+            missing = 0
+            for image_path in images:
+                image_data = self._get_base64_thumb(image_path, size=120)
+                if image_data:
+                    images_html += f"<img src='data:image/png;base64,{image_data}' style='border-radius: 6px; border: 2px solid #00ff00;'>"
                 else:
-                    print(f"DEBUG: Imagen no existe: {image_path}")
+                    missing += 1
             images_html += "</div>"
+            if missing:
+                images_html += "<p style='color: #bbb; font-size: 13px; text-align: center;'>Cargando imágenes…</p>"
             final_html += images_html + "</div>"
         else:
             final_html += "<p style='color: #ffff00; margin: 0; font-size: 14px; font-style: italic; text-align: center;'>⚠️ Sin imágenes disponibles</p></div>"
 
-        if getattr(self, '_preview_label', None):
-            self._preview_label.setText(final_html)
-            try:
-                self._preview_label.adjustSize()
-            except Exception:
-                pass
+        label.setText(final_html)
+        try:
+            label.adjustSize()
+        except Exception:
+            pass
 
     def _get_base64_thumb(self, image_path: str, size: int = 120):
-        cached = self._image_thumb_cache.get((image_path, size))
+        """PNG en base64 de la miniatura ya generada, o None si aún no está lista."""
+        pixmap = get_thumbnail_service().cached(image_path, size)
+        if pixmap is None or pixmap.isNull():
+            return None
+        cache_key = (image_path, size, pixmap.cacheKey())
+        cached = self._image_thumb_cache.get(cache_key)
         if cached:
             return cached
-        pixmap = QPixmap(image_path)
-        if pixmap.isNull():
-            return None
-        scaled = pixmap.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation)
         buffer = QBuffer()
         buffer.open(QBuffer.OpenModeFlag.WriteOnly)
-        scaled.save(buffer, "PNG")
+        pixmap.save(buffer, "PNG")
         data = buffer.data().toBase64().data().decode()
-        self._image_thumb_cache[(image_path, size)] = data
+        self._image_thumb_cache[cache_key] = data
         return data
 
 
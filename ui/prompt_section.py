@@ -8,6 +8,8 @@ import os
 import re
 from datetime import datetime
 from ui.components.negative_prompt_store import NegativePromptStore
+from logic.prompt_parser import strip_loras, normalize_prompt, parse_prompt
+from logic.clip_tokenizer import analyze_prompt, CHUNK_SIZE
 
 class NegativePromptEditDialog(QDialog):
     def __init__(self, parent=None, initial_text=""):
@@ -105,6 +107,8 @@ class PromptSectionFrame(QFrame):
         """)
         self.positive_toggle.clicked.connect(self.toggle_positive)
         header_layout.addWidget(self.positive_toggle)
+        self.positive_tokens_label = self._create_token_label()
+        header_layout.addWidget(self.positive_tokens_label)
         header_layout.addStretch()
         self.positive_buttons_container = QWidget()
         buttons_layout = QHBoxLayout(self.positive_buttons_container)
@@ -117,6 +121,13 @@ class PromptSectionFrame(QFrame):
         self.copy_btn.customContextMenuRequested.connect(self.show_copy_menu)
         self.copy_btn.setToolTip("Click para copiar todo\nClick derecho para más opciones")
         buttons_layout.addWidget(self.copy_btn)
+        self.reroll_btn = QPushButton("🎲")
+        self.reroll_btn.setFixedSize(28, 28)
+        self.reroll_btn.clicked.connect(self.reroll_wildcards)
+        self.reroll_btn.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.reroll_btn.customContextMenuRequested.connect(self.show_seed_menu)
+        self._update_reroll_button()
+        buttons_layout.addWidget(self.reroll_btn)
         self.export_btn = QPushButton("Exportar")
         self.export_btn.setFixedSize(100, 28)
         self.export_btn.clicked.connect(self.export_prompt)
@@ -163,6 +174,53 @@ class PromptSectionFrame(QFrame):
         layout.addWidget(self.positive_frame)
         self.setup_negative_prompt(layout)
 
+        # Conteo de tokens CLIP: se recalcula con debounce al cambiar cualquiera de los dos textos
+        self.token_timer = QTimer(self)
+        self.token_timer.setSingleShot(True)
+        self.token_timer.setInterval(150)
+        self.token_timer.timeout.connect(self.refresh_token_counts)
+        self.prompt_text.textChanged.connect(self.token_timer.start)
+        self.negative_text.textChanged.connect(self.token_timer.start)
+        self.refresh_token_counts()
+
+    def _create_token_label(self):
+        label = QLabel("")
+        label.setStyleSheet("color: #888; font-size: 10px; border: none; background: transparent;")
+        return label
+
+    def refresh_token_counts(self):
+        """Actualiza los contadores de tokens y los cortes de chunk de ambos prompts"""
+        self._update_token_label(self.positive_tokens_label, self.prompt_text.toPlainText())
+        self._update_token_label(self.negative_tokens_label, self.negative_text.toPlainText())
+
+    def _update_token_label(self, label, text):
+        try:
+            info = analyze_prompt(text.strip())
+        except Exception as e:
+            print(f"Error contando tokens: {e}")
+            label.setText("")
+            return
+        # Sin el vocabulario de CLIP todo es una estimación, también los cortes de chunk
+        prefix = "" if info["exact"] else "~"
+        chunks = info["chunks"]
+        last = chunks[-1] if chunks else 0
+        label.setText(f"{prefix}{info['total_tokens']} tokens · {prefix}{last}/{CHUNK_SIZE} "
+                      f"({prefix}{len(chunks)} chunk{'s' if len(chunks) > 1 else ''})")
+        color = "#f59e0b" if len(chunks) > 1 else "#888"
+        label.setStyleSheet(f"color: {color}; font-size: 10px; border: none; background: transparent;")
+
+        terms = parse_prompt(text.strip())
+        lines = []
+        if not info["exact"]:
+            lines.append("Conteo estimado (falta data/clip/bpe_simple_vocab_16e6.txt.gz): "
+                         "los cortes de chunk son aproximados")
+        starts = [0] + info["boundaries"]
+        for i, size in enumerate(chunks):
+            start = starts[i] if i < len(starts) else None
+            first = terms[start].raw if start is not None and start < len(terms) else ""
+            lines.append(f"Chunk {i + 1}: {prefix}{size} tokens" + (f" (desde «{first}»)" if first else ""))
+        label.setToolTip("\n".join(lines))
+
     def toggle_positive(self):
         """Alterna la visibilidad del prompt positivo"""
         self.positive_expanded = not self.positive_expanded
@@ -198,6 +256,8 @@ class PromptSectionFrame(QFrame):
         """)
         self.negative_toggle.clicked.connect(self.toggle_negative)
         header_bar.addWidget(self.negative_toggle)
+        self.negative_tokens_label = self._create_token_label()
+        header_bar.addWidget(self.negative_tokens_label)
         self.saved_neg_container = QWidget()
         self.saved_neg_layout = QHBoxLayout(self.saved_neg_container)
         self.saved_neg_layout.setContentsMargins(0, 0, 0, 0)
@@ -328,17 +388,7 @@ class PromptSectionFrame(QFrame):
         """Copia el prompt al portapapeles excluyendo los Loras"""
         prompt_content = self.prompt_text.toPlainText()
         if prompt_content and prompt_content != "Aquí aparecerá el prompt generado...":
-            text_no_lora = re.sub(r'<lora:[^>]+>', '', prompt_content)
-            
-            # Dividir por comas y limpiar espacios
-            parts = [p.strip() for p in text_no_lora.split(',')]
-            
-            # Filtrar partes vacías
-            clean_parts = [p for p in parts if p]
-            
-            # Unir con coma y espacio
-            clean_text = ', '.join(clean_parts)
-            
+            clean_text = strip_loras(prompt_content)
             pyperclip.copy(clean_text)
             self.show_feedback(self.copy_btn, "¡Copiado S/Lora!")
 
@@ -402,10 +452,7 @@ class PromptSectionFrame(QFrame):
                 collected_values.append(cleaned_value)
 
         if collected_values:
-            final_text = ", ".join(collected_values)
-            parts = [p.strip() for p in final_text.split(',')]
-            clean_parts = [p for p in parts if p]
-            final_clean_text = ', '.join(clean_parts)
+            final_clean_text = normalize_prompt(", ".join(collected_values))
             
             pyperclip.copy(final_clean_text)
             self.show_feedback(self.copy_btn, feedback_text)
@@ -503,6 +550,39 @@ class PromptSectionFrame(QFrame):
             self.prompt_text.setPlainText(prompt_text)
         else:
             self.prompt_text.setPlainText("Aquí aparecerá el prompt generado...")
+        self._update_reroll_button()
+
+    def reroll_wildcards(self):
+        """Expande {a|b} y __wildcards__ con una semilla nueva"""
+        self.prompt_generator.reroll_wildcards()
+        self.update_prompt(self.prompt_generator.generate_prompt())
+
+    def show_seed_menu(self, pos):
+        """Menú de la semilla: fijar una concreta o volver a la plantilla sin expandir"""
+        menu = QMenu(self)
+        action_seed = menu.addAction("Fijar semilla...")
+        action_template = menu.addAction("Ver plantilla (sin expandir)")
+        action_template.setEnabled(self.prompt_generator.wildcard_seed is not None)
+        action = menu.exec(self.reroll_btn.mapToGlobal(pos))
+        if action == action_seed:
+            current = self.prompt_generator.wildcard_seed or 0
+            seed, ok = QInputDialog.getInt(self, "Semilla", "Semilla para los valores dinámicos:",
+                                           current, 0, 2 ** 31 - 1)
+            if not ok:
+                return
+            self.prompt_generator.wildcard_seed = seed
+        elif action == action_template:
+            self.prompt_generator.wildcard_seed = None
+        else:
+            return
+        self.update_prompt(self.prompt_generator.generate_prompt())
+
+    def _update_reroll_button(self):
+        seed = self.prompt_generator.wildcard_seed
+        self.reroll_btn.setEnabled(self.prompt_generator.has_dynamic_values())
+        self.reroll_btn.setToolTip(
+            "Click: nueva tirada de {a|b} y __wildcards__\nClick derecho: fijar semilla"
+            + (f"\nSemilla actual: {seed}" if seed is not None else "\nAhora se muestra la plantilla sin expandir"))
 
     def get_negative_prompt(self):
         """Obtiene el contenido del negative prompt"""
@@ -13,6 +13,7 @@ from ui.presets_panel import PresetsPanel
 from ui.capture_prompt_panel import CapturePromptPanel
 from logic.variations_manager import VariationsManager
 from ui.utils.style_loader import load_stylesheet
+from ui.thumbnail_service import get_thumbnail_service
 
 class SidebarFrame(QFrame):
     character_defaults_selected = pyqtSignal(dict)
@@ -168,6 +169,11 @@ class SidebarFrame(QFrame):
         elif category_name in self.changes_tracker:
             del self.changes_tracker[category_name]
 
+    def track_category_changes(self, changes):
+        """Registra de una vez un lote {categoria: (anterior, nuevo)} del grid"""
+        for category_name, (old_value, new_value) in changes.items():
+            self.track_category_change(category_name, old_value, new_value)
+
     def on_variation_saved(self, character_name, variation_name):
         """Maneja cuando se guarda una variación"""
         print(f"📨 SEÑAL RECIBIDA: variation_saved para {character_name} - {variation_name}")
@@ -397,18 +403,23 @@ class SidebarFrame(QFrame):
                 
                 # Asignar icono si existe imagen
                 if image_path and os.path.exists(image_path):
-                    # Intentar carga directa y escalado
-                    pixmap = QPixmap(image_path)
-                    if not pixmap.isNull():
-                        scaled_pixmap = pixmap.scaled(40, 40, Qt.AspectRatioMode.KeepAspectRatioByExpanding, Qt.TransformationMode.SmoothTransformation)
-                        icon = QIcon(scaled_pixmap)
-                        item.setIcon(icon)
-                        html_image_path = image_path.replace("\\", "/")
-                        tooltip_html = f"<img src='{html_image_path}' height='150'>"
-                        item.setToolTip(tooltip_html)
+                    # La miniatura se decodifica en segundo plano y el icono se pone al llegar
+                    self._set_character_icon(item, image_path)
+                    html_image_path = image_path.replace("\\", "/")
+                    tooltip_html = f"<img src='{html_image_path}' height='150'>"
+                    item.setToolTip(tooltip_html)
                 
                 self.character_list.addItem(item)
     
+    def _set_character_icon(self, item, image_path):
+        def apply(pixmap):
+            if not pixmap.isNull():
+                item.setIcon(QIcon(pixmap))
+
+        pixmap = get_thumbnail_service().request(image_path, 40, apply)
+        if pixmap is not None:
+            apply(pixmap)
+
     def on_character_selected(self, item):
         """Maneja la selección de un personaje en la lista"""
         pass
@@ -0,0 +1,220 @@
+import json
+import os
+import re
+import shutil
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QApplication
+
+from logic.image_store import STORE_DIR, STORE_FOLDER
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+TAG_IMAGES_DIR = os.path.join(DATA_DIR, "tag_images")
+INDEX_PATH = os.path.join(TAG_IMAGES_DIR, "tag_images_index.json")
+LEGACY_INDEX_PATH = os.path.join(TAG_IMAGES_DIR, "index.json")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Las escrituras se agrupan: varios cambios seguidos producen un solo guardado
+SAVE_DELAY_MS = 500
+# Como mucho se mira el mtime del índice una vez por este intervalo
+CHECK_INTERVAL = 1.0
+
+
+def normalize_tag(tag):
+    return re.sub(r"[^a-z0-9_\-]", "", tag.lower().replace(" ", "_"))
+
+
+def _is_shared(rel):
+    return rel.replace("\\", "/").startswith(STORE_FOLDER + "/")
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class TagImageIndex(QObject):
+    """Índice compartido tag -> imagen de referencia (data/tag_images).
+
+    Una sola copia en memoria del índice para toda la app y un listado en caché
+    por carpeta de categoría (se invalida con el mtime de la carpeta). Las
+    miniaturas las genera ui/thumbnail_service.py, que ya las invalida por
+    mtime. Los cambios se guardan agrupados y de forma atómica; `changed` avisa
+    con la clave de categoría afectada."""
+
+    changed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._index = None
+        self._index_mtime = None
+        self._last_check = 0.0
+        self._listings = {}
+        self._dirty = False
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(SAVE_DELAY_MS)
+        self._save_timer.timeout.connect(self.flush)
+        app = QApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.flush)
+
+    # --- lectura ---
+
+    def _load(self):
+        now = time.monotonic()
+        if self._index is not None and (self._dirty or now - self._last_check < CHECK_INTERVAL):
+            return self._index
+        self._last_check = now
+        mtime = _mtime(INDEX_PATH)
+        if self._index is not None and mtime == self._index_mtime:
+            return self._index
+        path = INDEX_PATH if mtime is not None else LEGACY_INDEX_PATH
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except Exception as e:
+            print(f"Error leyendo índice de imágenes de tags: {e}")
+            data = {}
+        self._index = data if isinstance(data, dict) else {}
+        self._index_mtime = mtime
+        if mtime is None and self._index:
+            # Solo existía el índice antiguo: se migra al nombre actual
+            self._mark_dirty()
+        return self._index
+
+    def _listing(self, category_key, base=TAG_IMAGES_DIR):
+        folder = os.path.join(base, category_key)
+        mtime = _mtime(folder)
+        cached = self._listings.get(folder)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            names = frozenset(os.listdir(folder)) if mtime is not None else frozenset()
+        except OSError:
+            names = frozenset()
+        self._listings[folder] = (mtime, names)
+        return names
+
+    def _forget_listing(self, category_key):
+        self._listings.pop(os.path.join(TAG_IMAGES_DIR, category_key), None)
+
+    def _exists(self, rel):
+        parts = rel.replace("\\", "/").split("/")
+        if len(parts) == 3 and parts[0] == "tag_images":
+            return parts[2] in self._listing(parts[1])
+        if len(parts) == 3 and parts[0] == STORE_FOLDER:
+            return parts[2] in self._listing(parts[1], STORE_DIR)
+        return os.path.isfile(os.path.join(DATA_DIR, rel))
+
+    def get(self, category_key, tag):
+        """Ruta relativa a data/ de la imagen del tag, o None."""
+        key = f"{category_key}/{normalize_tag(tag)}"
+        index = self._load()
+        rel = index.get(key)
+        if rel:
+            return rel if self._exists(rel) else None
+        names = self._listing(category_key)
+        base = normalize_tag(tag)
+        for ext in IMAGE_EXTENSIONS:
+            if f"{base}{ext}" in names:
+                # Imagen copiada a mano: se recuerda en memoria sin reescribir el índice
+                rel = f"tag_images/{category_key}/{base}{ext}"
+                index[key] = rel
+                return rel
+        return None
+
+    def abs_path(self, rel):
+        return os.path.join(DATA_DIR, rel)
+
+    # --- escritura ---
+
+    def set(self, category_key, tag, rel):
+        rel = rel.replace("\\", "/")
+        self._load()[f"{category_key}/{normalize_tag(tag)}"] = rel
+        self._forget_listing(category_key)
+        self._mark_dirty()
+        self.changed.emit(category_key)
+
+    def remove(self, category_key, tag, delete_file=True):
+        """Quita la imagen del tag; retorna la ruta relativa que tenía."""
+        rel = self._load().pop(f"{category_key}/{normalize_tag(tag)}", None)
+        if rel:
+            # Las imágenes compartidas pueden usarlas otros tags o presets: las borra la deduplicación
+            if delete_file and not _is_shared(rel):
+                try:
+                    os.remove(self.abs_path(rel))
+                except OSError:
+                    pass
+                self._forget_listing(category_key)
+            self._mark_dirty()
+            self.changed.emit(category_key)
+        return rel
+
+    def rename(self, category_key, old_tag, new_tag):
+        """Mueve la imagen de un tag renombrado (archivo y entrada del índice)."""
+        old_norm, new_norm = normalize_tag(old_tag), normalize_tag(new_tag)
+        if old_norm == new_norm:
+            return False
+        index = self._load()
+        old_key, new_key = f"{category_key}/{old_norm}", f"{category_key}/{new_norm}"
+        rel = index.get(old_key)
+        if not rel or new_key in index:
+            return False
+        ext = os.path.splitext(rel)[1].lower()
+        new_rel = f"tag_images/{category_key}/{new_norm}{ext}"
+        abs_old, abs_new = self.abs_path(rel), self.abs_path(new_rel)
+        if _is_shared(rel):
+            # La imagen compartida no se mueve: solo cambia la clave
+            index[new_key] = rel
+        elif os.path.isfile(abs_old):
+            os.makedirs(os.path.dirname(abs_new), exist_ok=True)
+            if os.path.isfile(abs_new):
+                try:
+                    os.remove(abs_new)
+                except OSError:
+                    pass
+            shutil.move(abs_old, abs_new)
+            index[new_key] = new_rel
+        else:
+            index[new_key] = rel.replace("\\", "/")
+        del index[old_key]
+        self._forget_listing(category_key)
+        self._mark_dirty()
+        self.changed.emit(category_key)
+        return True
+
+    def _mark_dirty(self):
+        self._dirty = True
+        self._save_timer.start()
+
+    def flush(self):
+        """Escribe el índice si hay cambios pendientes (tmp + rename)."""
+        self._save_timer.stop()
+        if not self._dirty or self._index is None:
+            return
+        try:
+            os.makedirs(TAG_IMAGES_DIR, exist_ok=True)
+            tmp = INDEX_PATH + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, INDEX_PATH)
+            self._index_mtime = _mtime(INDEX_PATH)
+            self._dirty = False
+        except Exception as e:
+            print(f"Error guardando índice de imágenes de tags: {e}")
+
+
+_service = None
+
+
+def get_tag_image_index():
+    global _service
+    if _service is None:
+        _service = TagImageIndex()
+    return _service
@@ -6,11 +6,10 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QDrag, QPixmap, QPainter, QColor, QKeySequence, QImage, QShortcut
 import os
-import json
-import shutil
-import re
-
-TAGS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "tags.json")
+from .utils.category_utils import update_tags_json, category_id_for
+from .tag_image_index import get_tag_image_index, normalize_tag
+from .thumbnail_service import get_thumbnail_service
+from logic.image_store import ImageStore
 
 class DraggableTagWidget(QFrame):
     """Widget de tag que se puede arrastrar para reordenar"""
@@ -138,9 +137,7 @@ class TagsDialog(QDialog):
         self.parent_grid = parent.parent() if parent else None
         self.project_root = os.path.dirname(os.path.dirname(__file__))
         self.tag_images_dir = os.path.join(self.project_root, "data", "tag_images")
-        self.tag_images_index = os.path.join(self.tag_images_dir, "tag_images_index.json")
-        self._tag_images_index_legacy = os.path.join(self.tag_images_dir, "index.json")
-        self._tag_index_cache = None
+        self.tag_images = get_tag_image_index()
         self.init_ui()
 
     def init_ui(self):
@@ -223,34 +220,7 @@ class TagsDialog(QDialog):
         return self.category_name.lower().replace(" ", "_")
 
     def _normalize_tag(self, tag):
-        return re.sub(r"[^a-z0-9_\-]", "", tag.lower().replace(" ", "_"))
-
-    def _load_index(self):
-        if self._tag_index_cache is not None:
-            return self._tag_index_cache
-        try:
-            if os.path.isfile(self.tag_images_index):
-                with open(self.tag_images_index, "r", encoding="utf-8") as f:
-                    self._tag_index_cache = json.load(f)
-            elif os.path.isfile(self._tag_images_index_legacy):
-               
-                with open(self._tag_images_index_legacy, "r", encoding="utf-8") as f:
-                    self._tag_index_cache = json.load(f)
-                try:
-                    self._save_index(self._tag_index_cache)
-                except Exception:
-                    pass
-            else:
-                self._tag_index_cache = {}
-        except Exception:
-            self._tag_index_cache = {}
-        return self._tag_index_cache
-
-    def _save_index(self, idx):
-        os.makedirs(self.tag_images_dir, exist_ok=True)
-        with open(self.tag_images_index, "w", encoding="utf-8") as f:
-            json.dump(idx, f, ensure_ascii=False, indent=2)
-        self._tag_index_cache = idx
+        return normalize_tag(tag)
 
     def choose_tag_image(self, tag):
         """Abre diálogo de archivo y asigna imagen al tag"""
@@ -263,55 +233,10 @@ class TagsDialog(QDialog):
             self.tags[idx_pos] = new_tag
 
             try:
-                idx = self._load_index()
-                category_key = self._category_key()
-                old_norm = self._normalize_tag(old_tag)
-                new_norm = self._normalize_tag(new_tag)
-                if old_norm != new_norm:
-                    old_key = f"{category_key}/{old_norm}"
-                    new_key = f"{category_key}/{new_norm}"
-                    rel = idx.get(old_key)
-                    
-                    if rel and new_key not in idx:
-                        try:
-                           
-                            abs_old = os.path.join(self.project_root, "data", rel)
-                            ext = os.path.splitext(rel)[1].lower()
-                            new_rel = os.path.join("tag_images", category_key, f"{new_norm}{ext}")
-                            abs_new = os.path.join(self.project_root, "data", new_rel)
-                            os.makedirs(os.path.dirname(abs_new), exist_ok=True)
-                            if os.path.isfile(abs_old):
-                                
-                                if os.path.isfile(abs_new):
-                                    try:
-                                        os.remove(abs_new)
-                                    except Exception:
-                                        pass
-                                shutil.move(abs_old, abs_new)
-                                idx[new_key] = new_rel.replace("\\", "/")
-                            else:
-                                
-                                idx[new_key] = rel.replace("\\", "/")
-                            
-                            try:
-                                del idx[old_key]
-                            except Exception:
-                                pass
-                            self._save_index(idx)
-                            
-                            try:
-                                parent_card = self.parent()
-                                if parent_card and hasattr(parent_card, "invalidate_tag_image_cache"):
-                                    parent_card.invalidate_tag_image_cache()
-                            except Exception:
-                                pass
-                        except Exception:
-                            
-                            pass
-
-            except Exception:
-                
-                pass
+                # Mueve la imagen asociada; las tarjetas se enteran por la señal del índice
+                self.tag_images.rename(self._category_key(), old_tag, new_tag)
+            except Exception as e:
+                print(f"Error moviendo la imagen del tag: {e}")
 
             self.refresh_tags()
         else:
@@ -364,14 +289,8 @@ class TagsDialog(QDialog):
             QMessageBox.warning(self, "Error", "El tag está vacío o ya existe.")
 
     def save_and_close(self):
-        # Guarda los tags en tags.json
-        with open(TAGS_PATH, "r+", encoding="utf-8") as f:
-            tags_data = json.load(f)
-            key = self.category_name.lower().replace(" ", "_")
-            tags_data[key] = self.tags
-            f.seek(0)
-            json.dump(tags_data, f, ensure_ascii=False, indent=2)
-            f.truncate()
+        # Guarda los tags en tags.json (a través del registro de categorías)
+        update_tags_json(category_id_for(self.category_name), self.tags)
             
         # Actualiza la tarjeta que abrió este diálogo
         parent_card = self.parent()
@@ -441,11 +360,10 @@ class TagImageDialog(QDialog):
         return self.parent_dialog._normalize_tag(tag)
 
     def load_existing(self):
-        idx = self.parent_dialog._load_index()
-        key = f"{self._category_key()}/{self._normalize_tag(self.tag)}"
-        rel = idx.get(key)
+        tag_images = self.parent_dialog.tag_images
+        rel = tag_images.get(self._category_key(), self.tag)
         if rel:
-            abs_path = os.path.join(self.parent_dialog.project_root, "data", rel)
+            abs_path = tag_images.abs_path(rel)
             if os.path.isfile(abs_path):
                 pix = QPixmap(abs_path)
                 if not pix.isNull():
@@ -517,7 +435,6 @@ class TagImageDialog(QDialog):
             QMessageBox.warning(self, "Sin imagen", "Selecciona o pega una imagen antes de guardar.")
             return
         try:
-            idx = self.parent_dialog._load_index()
             category_key = self._category_key()
             normalized_tag = self._normalize_tag(self.tag)
             os.makedirs(os.path.join(self.parent_dialog.tag_images_dir, category_key), exist_ok=True)
@@ -538,15 +455,10 @@ class TagImageDialog(QDialog):
               
                 img.save(dest_abs)
 
-            key = f"{category_key}/{normalized_tag}"
-            idx[key] = dest_rel.replace("\\", "/")
-            self.parent_dialog._save_index(idx)
-            try:
-                parent_card = self.parent_dialog.parent()
-                if parent_card and hasattr(parent_card, "invalidate_tag_image_cache"):
-                    parent_card.invalidate_tag_image_cache()
-            except Exception:
-                pass
+            # Si otro tag o preset ya tiene la misma imagen, se apunta a la copia compartida
+            dest_rel = ImageStore().add(dest_abs)
+            self.parent_dialog.tag_images.set(category_key, self.tag, dest_rel)
+            get_thumbnail_service().schedule_archive_update()
             QMessageBox.information(self, "Imagen guardada", f"Se guardó y optimizó la imagen para el tag '{self.tag}'.")
             self.accept()
         except Exception as e:
@@ -563,29 +475,12 @@ class TagImageDialog(QDialog):
             msg.exec()
             if msg.clickedButton() != yes_btn:
                 return
-            idx = self.parent_dialog._load_index()
-            key = f"{self._category_key()}/{self._normalize_tag(self.tag)}"
-            rel = idx.get(key)
-            if rel:
-                abs_path = os.path.join(self.parent_dialog.project_root, "data", rel)
-                if os.path.isfile(abs_path):
-                    try:
-                        os.remove(abs_path)
-                    except Exception:
-                        pass
-                idx.pop(key, None)
-                self.parent_dialog._save_index(idx)
+            self.parent_dialog.tag_images.remove(self._category_key(), self.tag)
             self._current_pixmap = None
             self._current_ext = None
             self._existing_rel = None
             self._update_preview()
             self.remove_btn.setEnabled(False)
-            try:
-                parent_card = self.parent_dialog.parent()
-                if parent_card and hasattr(parent_card, "invalidate_tag_image_cache"):
-                    parent_card.invalidate_tag_image_cache()
-            except Exception:
-                pass
             QMessageBox.information(self, "Imagen quitada", "Se quitó la imagen del tag.")
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudo quitar la imagen:\n{e}")
@@ -0,0 +1,233 @@
+import json
+import mmap
+import os
+
+from PyQt6.QtCore import QBuffer, QByteArray
+from PyQt6.QtGui import QImage
+
+from .thumbnail_service import decode_thumbnail
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+ARCHIVE_PATH = os.path.join(DATA_DIR, "cache", "thumbnails.pack")
+INDEX_PATH = ARCHIVE_PATH + ".json"
+SOURCE_FOLDERS = ("presets", "tag_images", "image_store")
+SOURCE_DIRS = tuple(os.path.join(DATA_DIR, folder) for folder in SOURCE_FOLDERS)
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+# Lado de las miniaturas guardadas; los tamaños menores se escalan desde esta
+ARCHIVE_SIDE = 200
+ARCHIVE_VERSION = 1
+# Se reescribe el archivo entero cuando lo descartado supera a lo vivo
+COMPACT_RATIO = 1.0
+
+
+def archive_key(path):
+    """Ruta relativa a data/ con '/' o None si la imagen no está bajo data/."""
+    rel = os.path.relpath(os.path.abspath(path), DATA_DIR)
+    if rel.startswith(".."):
+        return None
+    return rel.replace("\\", "/")
+
+
+def is_source_image(path):
+    """True si la imagen pertenece a las carpetas que se empaquetan."""
+    key = archive_key(path)
+    return key is not None and key.split("/", 1)[0] in SOURCE_FOLDERS
+
+
+def iter_source_images():
+    for base in SOURCE_DIRS:
+        for root, dirs, files in os.walk(base):
+            # Carpetas temporales de un guardado de preset en curso
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, name)
+
+
+def encode_thumbnail(path, side=ARCHIVE_SIDE):
+    """Bytes de la miniatura (PNG si tiene transparencia, JPEG si no) o None."""
+    image = decode_thumbnail(path, side)
+    if image.isNull():
+        return None
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QBuffer.OpenModeFlag.WriteOnly)
+    if image.hasAlphaChannel():
+        ok = image.save(buffer, "PNG")
+    else:
+        ok = image.save(buffer, "JPEG", 85)
+    buffer.close()
+    return bytes(data) if ok else None
+
+
+def scan_changes(entries):
+    """Compara el disco con el índice del archivo.
+
+    Retorna (cambiadas, borradas): rutas cuyo mtime/tamaño no coincide con lo
+    guardado y claves que ya no existen. Pensado para correr fuera de la GUI."""
+    changed = []
+    seen = set()
+    for path in iter_source_images():
+        key = archive_key(path)
+        if key is None:
+            continue
+        seen.add(key)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entry = entries.get(key)
+        if entry is None or entry[2] != st.st_mtime_ns or entry[3] != st.st_size:
+            changed.append((key, path, st.st_mtime_ns, st.st_size))
+    removed = [key for key in entries if key not in seen]
+    return changed, removed
+
+
+class ThumbnailArchive:
+    """Miniaturas de presets y tags empaquetadas en un solo archivo.
+
+    `thumbnails.pack` guarda los bytes de cada miniatura uno tras otro y
+    `thumbnails.pack.json` el índice clave -> [offset, largo, mtime, tamaño]
+    de la imagen original. El archivo se abre con mmap y cada miniatura se
+    decodifica desde una vista del mapa, sin abrir archivos sueltos (el
+    servicio solo compara el mtime y el tamaño de la original). Las actualizaciones añaden al final y solo se reescribe todo
+    cuando lo descartado pesa más que lo vivo."""
+
+    def __init__(self, path=ARCHIVE_PATH, index_path=INDEX_PATH):
+        self.path = path
+        self.index_path = index_path
+        self.entries = {}
+        self.dead_bytes = 0
+        self._file = None
+        self._map = None
+        self.open()
+
+    def __contains__(self, path):
+        key = archive_key(path)
+        return key is not None and key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    # --- lectura ---
+
+    def open(self):
+        self.close()
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = None
+        except Exception as e:
+            print(f"Error leyendo índice de miniaturas: {e}")
+            data = None
+        if not isinstance(data, dict) or data.get("version") != ARCHIVE_VERSION or data.get("side") != ARCHIVE_SIDE:
+            self.entries = {}
+            self.dead_bytes = 0
+            return
+        entries = data.get("entries") or {}
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        # Un índice que apunta fuera del archivo (p. ej. escritura cortada) no sirve
+        if any(offset + length > size for offset, length, _m, _s in entries.values()):
+            self.entries = {}
+            self.dead_bytes = 0
+            return
+        self.entries = {key: tuple(value) for key, value in entries.items()}
+        self.dead_bytes = int(data.get("dead_bytes", 0))
+        if size:
+            self._file = open(self.path, "rb")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def image(self, path):
+        """QImage de la miniatura guardada o None si no está en el archivo."""
+        key = archive_key(path)
+        entry = self.entries.get(key) if key is not None else None
+        if entry is None or self._map is None:
+            return None
+        offset, length = entry[0], entry[1]
+        with memoryview(self._map) as view:
+            image = QImage.fromData(view[offset:offset + length])
+        return None if image.isNull() else image
+
+    # --- escritura ---
+
+    def apply(self, blobs, removed):
+        """Incorpora miniaturas nuevas y quita las borradas.
+
+        `blobs` es [(clave, mtime, tamaño, bytes)] tal como lo produce
+        `build_blobs`. Debe llamarse desde el hilo de la GUI."""
+        if not blobs and not removed:
+            return
+        self.close()
+        try:
+            for key in removed:
+                entry = self.entries.pop(key, None)
+                if entry is not None:
+                    self.dead_bytes += entry[1]
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "ab") as f:
+                offset = f.tell()
+                for key, mtime, size, data in blobs:
+                    old = self.entries.get(key)
+                    if old is not None:
+                        self.dead_bytes += old[1]
+                    f.write(data)
+                    self.entries[key] = (offset, len(data), mtime, size)
+                    offset += len(data)
+            live = sum(entry[1] for entry in self.entries.values())
+            if self.dead_bytes > live * COMPACT_RATIO:
+                self._compact()
+            self._write_index()
+        except Exception as e:
+            print(f"Error actualizando archivo de miniaturas: {e}")
+        self.open()
+
+    def _compact(self):
+        tmp = self.path + ".tmp"
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            compacted = {}
+            for key, (offset, length, mtime, size) in sorted(self.entries.items(), key=lambda kv: kv[1][0]):
+                src.seek(offset)
+                compacted[key] = (dst.tell(), length, mtime, size)
+                dst.write(src.read(length))
+        os.replace(tmp, self.path)
+        self.entries = compacted
+        self.dead_bytes = 0
+
+    def _write_index(self):
+        tmp = self.index_path + ".tmp"
+        data = {
+            "version": ARCHIVE_VERSION,
+            "side": ARCHIVE_SIDE,
+            "dead_bytes": self.dead_bytes,
+            "entries": {key: list(value) for key, value in self.entries.items()},
+        }
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.index_path)
+
+
+def build_blobs(changed):
+    """Genera las miniaturas de `changed` (salida de scan_changes); para un hilo de trabajo."""
+    blobs = []
+    for key, path, mtime, size in changed:
+        try:
+            data = encode_thumbnail(path)
+        except Exception as e:
+            print(f"Error generando miniatura de {path}: {e}")
+            data = None
+        if data:
+            blobs.append((key, mtime, size, data))
+    return blobs
@@ -0,0 +1,287 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QImage, QImageReader, QPixmap
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache", "thumbnails")
+
+# Presupuesto de las miniaturas en memoria (las del disco no cuentan)
+MEMORY_BUDGET_BYTES = 32 * 1024 * 1024
+# Espera tras una imagen que aún no está en el archivo empaquetado antes de actualizarlo
+ARCHIVE_UPDATE_DELAY_MS = 2000
+
+
+def _file_signature(path):
+    """(ruta absoluta, mtime, tamaño) o None si el archivo no existe."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+def _cache_path(signature, size):
+    digest = hashlib.sha1(f"{signature[0]}|{signature[1]}|{signature[2]}|{size}".encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, digest[:2], f"{digest}.png")
+
+
+def _pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+
+def decode_thumbnail(path, size):
+    """Lee `path` escalado para caber en size x size.
+
+    Con JPEG, QImageReader decodifica directamente a un tamaño reducido en vez
+    de cargar la imagen completa y escalarla después."""
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    source = reader.size()
+    if source.isValid() and (source.width() > size or source.height() > size):
+        reader.setScaledSize(source.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if not image.isNull() and (image.width() > size or image.height() > size):
+        image = image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    return image
+
+
+class _JobSignals(QObject):
+    done = pyqtSignal(object, QImage)
+    archive_scanned = pyqtSignal(object, object)
+
+
+class _ThumbnailJob(QRunnable):
+    """Genera (o lee del disco) una miniatura fuera del hilo de la GUI."""
+
+    def __init__(self, key, path, size, cache_path, signals):
+        super().__init__()
+        self.key = key
+        self.path = path
+        self.size = size
+        self.cache_path = cache_path
+        self.signals = signals
+
+    def run(self):
+        image = QImage()
+        try:
+            if os.path.isfile(self.cache_path):
+                image = QImage(self.cache_path)
+            if image.isNull():
+                image = decode_thumbnail(self.path, self.size)
+                if not image.isNull():
+                    os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                    tmp = f"{self.cache_path}.{os.getpid()}.{id(self)}.tmp"
+                    if image.save(tmp, "PNG"):
+                        os.replace(tmp, self.cache_path)
+        except Exception as e:
+            print(f"Error generando miniatura de {self.path}: {e}")
+        self.signals.done.emit(self.key, image)
+
+
+class _ArchiveUpdateJob(QRunnable):
+    """Busca imágenes nuevas o cambiadas y genera sus miniaturas para el archivo empaquetado."""
+
+    def __init__(self, entries, signals):
+        super().__init__()
+        self.entries = entries
+        self.signals = signals
+
+    def run(self):
+        from .thumbnail_archive import build_blobs, scan_changes
+        blobs, removed = [], []
+        try:
+            changed, removed = scan_changes(self.entries)
+            blobs = build_blobs(changed)
+        except Exception as e:
+            print(f"Error revisando miniaturas empaquetadas: {e}")
+        self.signals.archive_scanned.emit(blobs, removed)
+
+
+class ThumbnailService(QObject):
+    """Miniaturas compartidas para toda la app.
+
+    `request()` devuelve la miniatura si ya está en memoria; si no, la genera
+    en un QThreadPool y avisa con `thumbnail_ready` (y con el callback, si se
+    dio). Las miniaturas se guardan en disco por (ruta, mtime, tamaño del
+    archivo, lado) y en memoria en un LRU acotado por bytes.
+
+    Con `use_archive`, las imágenes de presets y tags se sirven desde el
+    archivo empaquetado (ui/thumbnail_archive.py) sin tocar los archivos
+    sueltos; el archivo se actualiza en segundo plano al arrancar y cuando se
+    pide una imagen que todavía no contiene."""
+
+    thumbnail_ready = pyqtSignal(str, int)
+
+    def __init__(self, parent=None, budget_bytes=MEMORY_BUDGET_BYTES, use_archive=False):
+        super().__init__(parent)
+        self.budget_bytes = budget_bytes
+        self.bytes_used = 0
+        self._memory = OrderedDict()  # (firma, lado) -> QPixmap
+        self._pending = {}  # (firma, lado) -> [(ruta, callback)]
+        self._placeholders = {}
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(1, min(4, QThreadPool.globalInstance().maxThreadCount())))
+        self._signals = _JobSignals(self)
+        self._signals.done.connect(self._on_done)
+        self._signals.archive_scanned.connect(self._on_archive_scanned)
+        self.archive = None
+        self._archive_busy = False
+        self._archive_again = False
+        self._archive_timer = QTimer(self)
+        self._archive_timer.setSingleShot(True)
+        self._archive_timer.setInterval(ARCHIVE_UPDATE_DELAY_MS)
+        self._archive_timer.timeout.connect(self.update_archive)
+        if use_archive:
+            from .thumbnail_archive import ThumbnailArchive
+            self.archive = ThumbnailArchive()
+            self.update_archive()
+
+    def cached(self, path, size):
+        """Miniatura ya disponible (memoria o archivo empaquetado) o None, sin lanzar trabajo."""
+        if self.archive is not None:
+            pixmap = self._from_archive(path, size)
+            if pixmap is not None:
+                return pixmap
+        signature = _file_signature(path)
+        if signature is None:
+            return None
+        key = (signature, size)
+        pixmap = self._memory.get(key)
+        if pixmap is not None:
+            self._memory.move_to_end(key)
+        return pixmap
+
+    def request(self, path, size, callback=None):
+        """Miniatura de `path` para size x size.
+
+        Si está en memoria (o en el archivo empaquetado) la devuelve; si no,
+        retorna None y al terminar llama a `callback(pixmap)` (pixmap nulo si
+        no se pudo leer)."""
+        if self.archive is not None:
+            pixmap = self._from_archive(path, size)
+            if pixmap is not None:
+                return pixmap
+        signature = _file_signature(path)
+        if signature is None:
+            return None
+        key = (signature, size)
+        pixmap = self._memory.get(key)
+        if pixmap is not None:
+            self._memory.move_to_end(key)
+            return pixmap
+        waiting = self._pending.get(key)
+        if waiting is not None:
+            waiting.append((path, callback))
+            return None
+        self._pending[key] = [(path, callback)]
+        self._pool.start(_ThumbnailJob(key, path, size, _cache_path(signature, size), self._signals))
+        return None
+
+    def _from_archive(self, path, size):
+        from .thumbnail_archive import ARCHIVE_SIDE, archive_key, is_source_image
+        key = archive_key(path)
+        if key is None or size > ARCHIVE_SIDE:
+            return None
+        entry = self.archive.entries.get(key)
+        signature = _file_signature(path) if entry is not None else None
+        if entry is None or signature is None or (entry[2], entry[3]) != signature[1:]:
+            # Falta o es de una versión anterior del archivo (p. ej. preset guardado otra vez
+            # con los mismos nombres): se genera aparte mientras el archivo se pone al día
+            if is_source_image(path):
+                self.schedule_archive_update()
+            return None
+        memory_key = ("archive", key, size)
+        pixmap = self._memory.get(memory_key)
+        if pixmap is not None:
+            self._memory.move_to_end(memory_key)
+            return pixmap
+        image = self.archive.image(path)
+        if image is None:
+            return None
+        if image.width() > size or image.height() > size:
+            image = image.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        pixmap = QPixmap.fromImage(image)
+        self._store(memory_key, pixmap)
+        return pixmap
+
+    def schedule_archive_update(self):
+        if self.archive is not None:
+            self._archive_timer.start()
+
+    def update_archive(self):
+        """Revisa en segundo plano las imágenes de presets y tags contra el archivo."""
+        if self.archive is None:
+            return
+        if self._archive_busy:
+            self._archive_again = True
+            return
+        self._archive_busy = True
+        self._pool.start(_ArchiveUpdateJob(dict(self.archive.entries), self._signals))
+
+    def _on_archive_scanned(self, blobs, removed):
+        self.archive.apply(blobs, removed)
+        stale = {key for key, _m, _s, _d in blobs} | set(removed)
+        if stale:
+            for memory_key in [k for k in self._memory if k[0] == "archive" and k[1] in stale]:
+                self.bytes_used -= _pixmap_bytes(self._memory.pop(memory_key))
+        self._archive_busy = False
+        if self._archive_again:
+            self._archive_again = False
+            self.update_archive()
+
+    def placeholder(self, size):
+        pixmap = self._placeholders.get(size)
+        if pixmap is None:
+            pixmap = QPixmap(size, size)
+            pixmap.fill(QColor("#2f2f2f"))
+            self._placeholders[size] = pixmap
+        return pixmap
+
+    def _on_done(self, key, image):
+        pixmap = QPixmap.fromImage(image) if not image.isNull() else QPixmap()
+        if not pixmap.isNull():
+            self._store(key, pixmap)
+        size = key[1]
+        for path, callback in self._pending.pop(key, []):
+            if callback is not None:
+                try:
+                    callback(pixmap)
+                except RuntimeError:
+                    # El widget que pidió la miniatura ya no existe
+                    pass
+                except Exception as e:
+                    print(f"Error aplicando miniatura de {path}: {e}")
+            self.thumbnail_ready.emit(path, size)
+
+    def _store(self, key, pixmap):
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self.bytes_used -= _pixmap_bytes(old)
+        self._memory[key] = pixmap
+        self.bytes_used += _pixmap_bytes(pixmap)
+        self._evict()
+
+    def _evict(self):
+        while self.bytes_used > self.budget_bytes and len(self._memory) > 1:
+            _, pixmap = self._memory.popitem(last=False)
+            self.bytes_used -= _pixmap_bytes(pixmap)
+
+    def wait_for_done(self, msecs=-1):
+        return self._pool.waitForDone(msecs)
+
+
+_service = None
+
+
+def get_thumbnail_service():
+    global _service
+    if _service is None:
+        from .components.negative_prompt_store import NegativePromptStore
+        try:
+            use_archive = bool(NegativePromptStore().get_setting("thumbnail_archive", True))
+        except Exception:
+            use_archive = True
+        _service = ThumbnailService(use_archive=use_archive)
+    return _service
@@ -4,6 +4,7 @@ from .category_utils import (
     update_categories_json,
     update_tags_json,
     rename_category_in_files,
+    category_id_for,
     DEFAULT_CARD_COLOR,
     CATEGORIES_PATH,
     TAGS_PATH,
@@ -17,6 +18,7 @@ __all__ = [
     'update_categories_json',
     'update_tags_json',
     'rename_category_in_files',
+    'category_id_for',
     'DEFAULT_CARD_COLOR',
     'CATEGORIES_PATH',
     'TAGS_PATH',